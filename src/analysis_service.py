@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Analysis service
+Local HTTP/JSON server that analyzes submitted source text with a warm engine
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from detector_cli import parse_detector_list, validate_detectors
+from detector_engine import CodeSmellDetector, _analyze_content_in_worker, _init_worker
+from detectors.base_detector import CodeSmell
+from result_cache import ResultCache
+
+
+class QueueFull(Exception):
+    """Admitting a batch would exceed the pending-file limit; retry later"""
+
+
+class LatencyWindow:
+    """Durations of the most recent requests, for percentile reporting"""
+
+    def __init__(self, size: int = 1024):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def summary(self) -> Dict[str, float]:
+        """p50/p90/p99/max in milliseconds (nearest rank) over the window"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+        def rank(percent):
+            return round(samples[max(0, -(-len(samples) * percent // 100) - 1)] * 1000, 3)
+        return {'p50': rank(50), 'p90': rank(90), 'p99': rank(99), 'max': round(samples[-1] * 1000, 3)}
+
+
+class AnalysisService:
+    """Analyzes batches of (path, content) on a bounded worker pool
+
+    At most queue_size files are pending (queued or running) at any time; a
+    batch that would exceed the limit is rejected as a whole with QueueFull
+    rather than left waiting, so callers feel backpressure at once. Results
+    are kept in an LRU keyed by content hash and configuration key, and
+    content already being analyzed for another request is waited for, not
+    analyzed twice. With workers > 1 files run in a process pool, otherwise
+    on one background thread of this process. Paths only label the results;
+    nothing is read from disk.
+    """
+
+    def __init__(self, detector: CodeSmellDetector, workers: int = 1, queue_size: int = 256,
+                 cache_entries: int = 1024):
+        self.detector = detector
+        self.workers = workers
+        self.queue_size = queue_size
+        self.cache_entries = cache_entries
+        self.config_key = detector.config_key()
+        if workers > 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                initargs=(detector.config, detector.active_detectors))
+            self._run = _analyze_content_in_worker
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._run = self._analyze_here
+        # Reentrant: a done callback runs at once, under the lock, if its future already finished
+        self._lock = threading.RLock()
+        self._cache: 'OrderedDict[Tuple[str, str], List[tuple]]' = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], Future] = {}
+        self.pending = 0
+        self.requests = 0
+        self.rejected = 0
+        self.files = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.latency = LatencyWindow()
+
+    def _analyze_here(self, task: Tuple[str, str]) -> List[tuple]:
+        file_path, content = task
+        return [smell.to_tuple() for smell in self.detector.analyze_content(file_path, content)]
+
+    def analyze(self, files: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Per file, in order: {'path', 'smells', 'cached'} or {'path', 'error'}
+
+        Raises QueueFull, without starting any of the batch, when its new
+        files do not fit in the queue.
+        """
+        started = time.perf_counter()
+        planned = []
+        with self._lock:
+            new_keys = set()
+            for path, content in files:
+                key = (ResultCache.hash_content(content), self.config_key)
+                if key not in self._cache and key not in self._in_flight:
+                    new_keys.add(key)
+                planned.append((path, content, key))
+            if self.pending + len(new_keys) > self.queue_size:
+                self.rejected += 1
+                raise QueueFull(f"{self.pending} files pending, {len(new_keys)} more would exceed "
+                                f"the queue size of {self.queue_size}")
+            self.requests += 1
+            self.files += len(files)
+            outcomes = []
+            for path, content, key in planned:
+                packed = self._cache.get(key)
+                if packed is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    outcomes.append((path, packed, True))
+                    continue
+                future = self._in_flight.get(key)
+                if future is not None:
+                    self.coalesced += 1
+                else:
+                    self.misses += 1
+                    self.pending += 1
+                    future = self._executor.submit(self._run, (path, content))
+                    self._in_flight[key] = future
+                    future.add_done_callback(lambda done, key=key: self._finished(key, done))
+                outcomes.append((path, future, False))
+
+        results = []
+        for path, outcome, cached in outcomes:
+            if isinstance(outcome, Future):
+                try:
+                    outcome = outcome.result()
+                except Exception as e:
+                    results.append({'path': path, 'error': str(e) or type(e).__name__})
+                    continue
+            smells = [CodeSmell.from_tuple(path, values).to_dict() for values in outcome]
+            results.append({'path': path, 'smells': smells, 'cached': cached})
+        self.latency.add(time.perf_counter() - started)
+        return results
+
+    def _finished(self, key: Tuple[str, str], future: Future):
+        with self._lock:
+            self.pending -= 1
+            self._in_flight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._cache[key] = future.result()
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue, cache and latency counters"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'pending': self.pending,
+                # Pending files not yet picked up by a worker
+                'queue_depth': max(0, self.pending - self.workers),
+                'requests': self.requests,
+                'rejected': self.rejected,
+                'files': self.files,
+                'cache': {'entries': len(self._cache), 'capacity': self.cache_entries, 'hits': self.hits,
+                          'misses': self.misses, 'coalesced': self.coalesced},
+                'latency_ms': self.latency.summary(),
+                'detectors': list(self.detector.active_detectors),
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """HTTP front end: POST /analyze, GET /metrics and GET /health"""
+
+    # Largest accepted request body
+    MAX_BODY_BYTES = 64 * 1024 * 1024
+    server_version = 'CodeSmellDetector'
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self._reply(200, self.server.service.metrics())
+        elif self.path == '/health':
+            self._reply(200, {'status': 'ok'})
+        else:
+            self._reply(404, {'error': f"unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/analyze':
+            self._reply(404, {'error': f"unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self._reply(411, {'error': "Content-Length required"})
+            return
+        if length < 0:
+            # rfile.read() of a negative length would wait for the client to close
+            self._reply(400, {'error': f"invalid Content-Length: {length}"})
+            return
+        if length > self.MAX_BODY_BYTES:
+            self._reply(413, {'error': f"request body larger than {self.MAX_BODY_BYTES} bytes"})
+            return
+        try:
+            request = json.loads(self.rfile.read(length))
+            files = [(entry['path'], entry['content']) for entry in request['files']]
+            if not all(isinstance(path, str) and isinstance(content, str) for path, content in files):
+                raise TypeError("path and content must be strings")
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {'error': f"expected {{\"files\": [{{\"path\": ..., \"content\": ...}}]}}: {e}"})
+            return
+        try:
+            results = self.server.service.analyze(files)
+        except QueueFull as e:
+            self._reply(503, {'error': str(e)}, {'Retry-After': '1'})
+            return
+        self._reply(200, {'results': results})
+
+    def _reply(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(service: AnalysisService, host: str = '127.0.0.1', port: int = 8765,
+                  verbose: bool = False) -> ThreadingHTTPServer:
+    """HTTP server for a service; port 0 picks a free port (see server.server_address)"""
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Serve code smell analysis over local HTTP/JSON",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Endpoints:
+  POST /analyze   {"files": [{"path": "A.java", "content": "..."}]} -> {"results": [...]}
+  GET  /metrics   queue depth, cache counters and latency percentiles
+  GET  /health    liveness check
+        """
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Address to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on, 0 for any free one (default: 8765)')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help='Analyze in N processes (default: 1, a thread of the server)')
+    parser.add_argument('--queue-size', type=int, default=256, metavar='N',
+                        help='Most files pending at once; larger batches get 503 (default: 256)')
+    parser.add_argument('--cache-entries', type=int, default=1024, metavar='N',
+                        help='Results kept for repeated content (default: 1024)')
+    parser.add_argument('--only', type=str, help='Only run specified detectors (comma-separated)')
+    parser.add_argument('--exclude', type=str, help='Exclude specified detectors (comma-separated)')
+    parser.add_argument('--config', type=str, help='Path to configuration file (default: config/config.yaml)')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    return parser.parse_args()
+
+
+def main():
+    """Run the service until interrupted"""
+    args = parse_arguments()
+    if args.workers < 1 or args.queue_size < 1 or args.cache_entries < 0:
+        print("Error: --workers and --queue-size must be positive, --cache-entries not negative")
+        return 1
+
+    detector = CodeSmellDetector(args.config)
+    only_detectors = parse_detector_list(args.only)
+    exclude_detectors = parse_detector_list(args.exclude)
+    available_detectors = detector.get_available_detectors()
+    if not validate_detectors(only_detectors, available_detectors):
+        return 1
+    if not validate_detectors(exclude_detectors, available_detectors):
+        return 1
+    detector.configure_active_detectors(only=only_detectors, exclude=exclude_detectors)
+
+    service = AnalysisService(detector, workers=args.workers, queue_size=args.queue_size,
+                              cache_entries=args.cache_entries)
+    try:
+        server = create_server(service, args.host, args.port, args.verbose)
+    except OSError as e:
+        print(f"Error: cannot listen on {args.host}:{args.port}: {e}")
+        service.close()
+        return 1
+    host, port = server.server_address[:2]
+    print(f"Serving on http://{host}:{port} (Ctrl+C to stop)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
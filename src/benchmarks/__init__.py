@@ -0,0 +1 @@
+# Benchmark suite: synthetic corpora and throughput/memory runner
\ No newline at end of file
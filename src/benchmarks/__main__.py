@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark CLI
+Generates a synthetic corpus and measures every detector on it
+
+Run from the src/ directory:  python -m benchmarks --files 200 --output results.json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+
+from .corpus import CorpusSpec, generate_corpus
+from .runner import BenchmarkRunner, benchmark_report, format_results
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser):
+    """Corpus knobs shared by the benchmark commands"""
+    defaults = CorpusSpec()
+    parser.add_argument('--files', type=int, default=defaults.files, help='Number of generated files')
+    parser.add_argument('--lines', type=int, default=defaults.lines_per_file, help='Target lines per file')
+    parser.add_argument('--methods', type=int, default=defaults.methods_per_class, help='Methods per class')
+    parser.add_argument('--nesting', type=int, default=defaults.nesting, help='Maximum block nesting in methods')
+    parser.add_argument('--duplication', type=float, default=defaults.duplication_ratio,
+                        help='Share of methods copied from a corpus-wide pool (0-1)')
+    parser.add_argument('--literals', type=float, default=defaults.literal_density,
+                        help='Chance that a statement uses a magic number (0-1)')
+    parser.add_argument('--seed', type=int, default=defaults.seed, help='Random seed (same seed, same corpus)')
+
+
+def spec_from_arguments(args: argparse.Namespace) -> CorpusSpec:
+    return CorpusSpec(files=args.files, lines_per_file=args.lines, methods_per_class=args.methods,
+                      nesting=args.nesting, duplication_ratio=args.duplication,
+                      literal_density=args.literals, seed=args.seed)
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the code smell detectors on a synthetic Java corpus")
+    add_corpus_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark; the best one is reported')
+    parser.add_argument('--detectors', type=str, help='Comma-separated detectors to run (default: all)')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the peak memory measurement')
+    parser.add_argument('--corpus-dir', type=str, help='Write the corpus here and keep it (default: temporary)')
+    parser.add_argument('--config', type=str, help='Path to configuration file (default: config/config.yaml)')
+    parser.add_argument('--output', type=str, help='Write the results as JSON to this file')
+    return parser.parse_args()
+
+
+def main():
+    """Main benchmark function"""
+    args = parse_arguments()
+    spec = spec_from_arguments(args)
+    runner = BenchmarkRunner(args.config, repeat=args.repeat, measure_memory=not args.no_memory)
+
+    detector_names = [name.strip() for name in args.detectors.split(',')] if args.detectors else None
+    invalid = [name for name in detector_names or [] if name not in runner.engine.detectors]
+    if invalid:
+        print(f"Error: Invalid detector names: {', '.join(invalid)}")
+        return 1
+
+    if args.corpus_dir:
+        results = runner.run(generate_corpus(spec, args.corpus_dir), detector_names)
+    else:
+        with tempfile.TemporaryDirectory(prefix='smell-bench-') as corpus_dir:
+            results = runner.run(generate_corpus(spec, corpus_dir), detector_names)
+
+    print(format_results(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(benchmark_report(spec, results), f, indent=2)
+        print(f"Results written to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
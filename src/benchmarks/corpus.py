@@ -0,0 +1,150 @@
+"""
+Synthetic Java corpus generator
+Produces reproducible Java sources with controllable size and smell density
+"""
+
+import os
+import random
+from typing import Any, Dict, List
+
+
+class CorpusSpec:
+    """Knobs of a generated corpus
+
+    lines_per_file is a target; the generated files land close to it.
+    duplication_ratio is the share of methods whose body is copied from a
+    pool shared by the whole corpus, so duplicates occur both within and
+    across files. literal_density is the chance that a statement uses a
+    bare numeric literal instead of a named constant.
+    """
+
+    def __init__(self, files: int = 100, lines_per_file: int = 300, methods_per_class: int = 12,
+                 nesting: int = 2, duplication_ratio: float = 0.2, literal_density: float = 0.3,
+                 seed: int = 1):
+        self.files = files
+        self.lines_per_file = lines_per_file
+        self.methods_per_class = max(1, methods_per_class)
+        self.nesting = max(0, nesting)
+        self.duplication_ratio = duplication_ratio
+        self.literal_density = literal_density
+        self.seed = seed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> 'CorpusSpec':
+        return cls(**values)
+
+    def scaled(self, factor: float) -> 'CorpusSpec':
+        """Copy of this spec with factor times longer files"""
+        values = self.to_dict()
+        values['lines_per_file'] = max(20, int(self.lines_per_file * factor))
+        return CorpusSpec(**values)
+
+
+class CorpusGenerator:
+    """Writes the Java files described by a CorpusSpec"""
+
+    TYPES = ['int', 'long', 'double', 'String', 'boolean', 'List<String>', 'Map<String, Integer>']
+    COLLABORATORS = ['repository', 'validator', 'formatter', 'cache', 'logger']
+    COLLABORATOR_METHODS = ['find', 'save', 'check', 'render', 'lookup', 'update', 'count']
+    # Lines of a class outside its methods (header, fields, closing brace)
+    CLASS_OVERHEAD = 12
+    # Lines of a method outside its statements (signature, closing brace, blank line)
+    METHOD_OVERHEAD = 3
+
+    def __init__(self, spec: CorpusSpec):
+        self.spec = spec
+        self.random = random.Random(spec.seed)
+        self._shared_bodies: List[List[str]] = []
+
+    def generate(self, output_dir: str) -> List[str]:
+        """Write the corpus into output_dir; returns the file paths"""
+        os.makedirs(output_dir, exist_ok=True)
+        spec = self.spec
+        statements = max(3, (spec.lines_per_file - self.CLASS_OVERHEAD) // spec.methods_per_class
+                         - self.METHOD_OVERHEAD)
+        self._shared_bodies = [self._method_body(statements) for _ in range(8)]
+
+        paths = []
+        for index in range(spec.files):
+            path = os.path.join(output_dir, f"Generated{index}.java")
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(self.java_class(f"Generated{index}", statements))
+            paths.append(path)
+        return paths
+
+    def java_class(self, name: str, statements: int) -> str:
+        """Source of one class with spec.methods_per_class methods"""
+        rnd = self.random
+        lines = ["package bench.generated;", "", "import java.util.*;", "",
+                 f"public class {name} {{",
+                 "    private static final int LIMIT = 100;",
+                 "    private static final double RATE = 0.25;"]
+        for collaborator in self.COLLABORATORS:
+            lines.append(f"    private {collaborator.capitalize()} {collaborator};")
+        lines.append("")
+
+        for index in range(self.spec.methods_per_class):
+            if self._shared_bodies and rnd.random() < self.spec.duplication_ratio:
+                body = rnd.choice(self._shared_bodies)
+            else:
+                body = self._method_body(statements)
+            parameters = ", ".join(f"{rnd.choice(self.TYPES)} p{i}" for i in range(rnd.randint(0, 8)))
+            lines.append(f"    public {rnd.choice(self.TYPES)} method{index}({parameters}) {{")
+            lines.extend("        " + line for line in body)
+            lines.append("    }")
+            lines.append("")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def _method_body(self, statements: int) -> List[str]:
+        """Statements of one method, nested up to spec.nesting levels deep"""
+        rnd = self.random
+        body = ["int total = 0;"]
+        depth = 0
+        while len(body) < statements - depth - 1:
+            if depth < self.spec.nesting and rnd.random() < 0.15:
+                body.append("    " * depth + self._block_header(depth))
+                depth += 1
+            elif depth and rnd.random() < 0.1:
+                depth -= 1
+                body.append("    " * depth + "}")
+            else:
+                body.append("    " * depth + self._statement(len(body)))
+        while depth:
+            depth -= 1
+            body.append("    " * depth + "}")
+        body.append("return null;" if rnd.random() < 0.1 else "// done")
+        return body
+
+    def _block_header(self, depth: int) -> str:
+        rnd = self.random
+        variable = "ijk"[depth % 3]
+        if rnd.random() < 0.5:
+            return f"for (int {variable} = 0; {variable} < {self._number()}; {variable}++) {{"
+        return f"if (total > {self._number()}) {{"
+
+    def _statement(self, index: int) -> str:
+        rnd = self.random
+        choice = rnd.random()
+        if choice < 0.4:
+            return f"total += {self._number()} * {index};"
+        if choice < 0.7:
+            collaborator = rnd.choice(self.COLLABORATORS)
+            return f"{collaborator}.{rnd.choice(self.COLLABORATOR_METHODS)}(\"v{index}\", total);"
+        if choice < 0.85:
+            return f"String s{index} = \"value\" + total + {self._number()};"
+        return f"total = Math.max(total, {self._number()});"
+
+    def _number(self) -> str:
+        rnd = self.random
+        if rnd.random() < self.spec.literal_density:
+            return str(rnd.choice([3, 7, 42, 250, 1000, 3600, 86400]))
+        return rnd.choice(["LIMIT", "total", "1"])
+
+
+def generate_corpus(spec: CorpusSpec, output_dir: str) -> List[str]:
+    """Write the corpus described by spec into output_dir; returns the file paths"""
+    return CorpusGenerator(spec).generate(output_dir)
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Performance regression gate
+Runs a fixed benchmark matrix, stores baselines and compares later runs against them
+
+Run from the src/ directory:
+  python -m benchmarks.regression --save baseline.json
+  python -m benchmarks.regression --compare baseline.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from .corpus import CorpusSpec, generate_corpus
+from .runner import BenchmarkRunner, environment
+
+BASELINE_VERSION = 1
+
+# Fixed benchmark matrix: changing it invalidates stored baselines
+MATRIX = [
+    ('mixed', CorpusSpec(files=30, lines_per_file=300, methods_per_class=12, nesting=2,
+                         duplication_ratio=0.2, literal_density=0.3, seed=1)),
+    ('dense', CorpusSpec(files=10, lines_per_file=600, methods_per_class=25, nesting=4,
+                         duplication_ratio=0.5, literal_density=0.8, seed=2)),
+]
+# Corpus used by the scaling check; file length grows by each factor
+SCALING_SPEC = CorpusSpec(files=6, lines_per_file=100, methods_per_class=8, nesting=2,
+                          duplication_ratio=0.2, literal_density=0.3, seed=3)
+SCALING_FACTORS = [1, 2, 4, 8]
+
+# Exponent increase over the baseline that is still attributed to noise
+EXPONENT_NOISE = 0.2
+# Median absolute deviation to standard deviation, for normally distributed noise
+MAD_TO_SIGMA = 1.4826
+
+
+def best_seconds(result: Dict[str, Any]) -> float:
+    # Interference from other processes only ever adds time, so the fastest
+    # run is the most stable estimate of a benchmark's cost
+    return min(result['samples'])
+
+
+def relative_noise(samples: List[float]) -> float:
+    """Robust spread of timing samples relative to their median"""
+    if len(samples) < 2:
+        return 0.0
+    median = statistics.median(samples)
+    if median <= 0:
+        return 0.0
+    mad = statistics.median(abs(sample - median) for sample in samples)
+    return MAD_TO_SIGMA * mad / median
+
+
+def slower_p_value(base: List[float], current: List[float]) -> float:
+    """One-sided Mann-Whitney U test: chance of current looking this much slower by luck alone
+
+    Exact for the small sample counts benchmarks use; ties count half.
+    """
+    n, m = len(current), len(base)
+    if not n or not m:
+        return 1.0
+    u = sum(1.0 if c > b else 0.5 if c == b else 0.0 for c in current for b in base)
+    # ways[k] = number of orderings of the pooled samples whose U statistic is k
+    ways = [[1] + [0] * (n * m) for _ in range(m + 1)]
+    for i in range(1, n + 1):
+        previous = ways
+        ways = [[1 if k == 0 else 0 for k in range(n * m + 1)]]
+        for j in range(1, m + 1):
+            row = [0] * (n * m + 1)
+            for k in range(i * j + 1):
+                row[k] = ways[j - 1][k] + (previous[j][k - j] if k >= j else 0)
+            ways.append(row)
+    total = sum(ways[m])
+    return sum(ways[m][k] for k in range(n * m + 1) if k >= u) / total
+
+
+def min_p_value(n: int, m: int) -> float:
+    """Smallest p-value slower_p_value can return for n current and m baseline samples"""
+    return math.factorial(n) * math.factorial(m) / math.factorial(n + m)
+
+
+def scaling_exponent(points: List[Tuple[float, float]]) -> Optional[float]:
+    """Least-squares slope of log(time) over log(size): ~1 is linear, ~2 quadratic"""
+    points = [(size, seconds) for size, seconds in points if size > 0 and seconds > 0]
+    if len(points) < 2:
+        return None
+    xs = [math.log(size) for size, _ in points]
+    ys = [math.log(seconds) for _, seconds in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+class RegressionGate:
+    """Runs the benchmark matrix and the scaling check, and judges a run against a baseline
+
+    Timings are compared by their best runs. A slowdown only counts as a
+    regression when it exceeds both the configured tolerance and three
+    times the measured noise of either run, and when a rank test over all
+    samples says it is unlikely to be chance, so a noisy machine widens
+    the band instead of failing the gate at random. Peak memory is
+    deterministic enough to be compared against its own tolerance.
+    """
+
+    def __init__(self, config_path: Optional[str] = None, repeat: int = 5,
+                 detector_names: Optional[List[str]] = None):
+        self.config_path = config_path
+        self.runner = BenchmarkRunner(config_path, repeat=repeat)
+        self.detector_names = detector_names
+
+    def run(self) -> Dict[str, Any]:
+        """Measure the whole matrix and the scaling check; returns a baseline document"""
+        cases = {}
+        with tempfile.TemporaryDirectory(prefix='smell-gate-') as work_dir:
+            for case_name, spec in MATRIX:
+                paths = generate_corpus(spec, os.path.join(work_dir, case_name))
+                cases[case_name] = {
+                    'corpus': spec.to_dict(),
+                    'results': self.runner.run(paths, self.detector_names),
+                }
+
+            # The sizes are timed in turns, one run each, so that a slow spell
+            # of the machine does not fall on one size and tilt the slope
+            scaling_runner = BenchmarkRunner(self.config_path, repeat=1, measure_memory=False)
+            corpora = [generate_corpus(SCALING_SPEC.scaled(factor), os.path.join(work_dir, f'scaling-{factor}'))
+                       for factor in SCALING_FACTORS]
+            timings: Dict[str, List[Tuple[int, float]]] = {}
+            for _ in range(self.runner.repeat):
+                for position, paths in enumerate(corpora):
+                    for result in scaling_runner.run(paths, self.detector_names):
+                        points = timings.setdefault(result['name'], [])
+                        if position == len(points):
+                            points.append((result['lines'], result['seconds']))
+                        else:
+                            points[position] = (result['lines'], min(points[position][1], result['seconds']))
+
+        scaling = {name: {'points': points, 'exponent': scaling_exponent(points)}
+                   for name, points in timings.items()}
+        return {
+            'version': BASELINE_VERSION,
+            'environment': environment(),
+            'cases': cases,
+            'scaling': scaling,
+        }
+
+    @staticmethod
+    def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float,
+                memory_tolerance: float, max_exponent: float,
+                significance: float = 0.05) -> Tuple[List[str], List[str]]:
+        """Return (report lines, failures) of current measured against baseline"""
+        report = []
+        failures = []
+
+        if baseline.get('version') != BASELINE_VERSION:
+            failures.append(f"Baseline format {baseline.get('version')} is not supported (expected {BASELINE_VERSION})")
+            return report, failures
+        for key in ('python', 'platform'):
+            if baseline['environment'].get(key) != current['environment'].get(key):
+                report.append(f"Warning: baseline {key} {baseline['environment'].get(key)} "
+                              f"differs from {current['environment'].get(key)}")
+
+        report.append(f"{'Case':<8} {'Benchmark':<20} {'Base (s)':>9} {'Now (s)':>9} {'Change':>8} "
+                      f"{'Allowed':>8} {'p':>6} {'Memory':>8}  Status")
+        for case_name, case in current['cases'].items():
+            base_case = baseline['cases'].get(case_name)
+            if base_case is None:
+                report.append(f"{case_name:<8} (not in baseline)")
+                continue
+            if base_case['corpus'] != case['corpus']:
+                failures.append(f"{case_name}: corpus differs from the baseline; save a new baseline")
+                continue
+            base_results = {result['name']: result for result in base_case['results']}
+            for result in case['results']:
+                base = base_results.get(result['name'])
+                if base is None:
+                    report.append(f"{case_name:<8} {result['name']:<20} (not in baseline)")
+                    continue
+                base_seconds = best_seconds(base)
+                seconds = best_seconds(result)
+                change = seconds / base_seconds - 1 if base_seconds else 0.0
+                allowed = max(tolerance, 3 * relative_noise(base['samples']),
+                              3 * relative_noise(result['samples']))
+                p_value = slower_p_value(base['samples'], result['samples'])
+                status = []
+                if change > allowed and p_value < significance:
+                    status.append('SLOWER')
+                    failures.append(f"{case_name}/{result['name']}: {change:+.1%} time "
+                                    f"({base_seconds:.3f}s -> {seconds:.3f}s, allowed {allowed:.1%}, p = {p_value:.3f})")
+                memory_change = None
+                if base.get('peak_memory_bytes') and result.get('peak_memory_bytes') is not None:
+                    memory_change = result['peak_memory_bytes'] / base['peak_memory_bytes'] - 1
+                    if memory_change > memory_tolerance:
+                        status.append('MEMORY')
+                        failures.append(f"{case_name}/{result['name']}: {memory_change:+.1%} peak memory "
+                                        f"(allowed {memory_tolerance:.1%})")
+                memory = f"{memory_change:+8.1%}" if memory_change is not None else f"{'-':>8}"
+                report.append(f"{case_name:<8} {result['name']:<20} {base_seconds:>9.3f} {seconds:>9.3f} "
+                              f"{change:>+8.1%} {allowed:>8.1%} {p_value:>6.3f} {memory}  {' '.join(status) or 'ok'}")
+
+        report.extend(RegressionGate.scaling_report(current, max_exponent, failures, baseline))
+        return report, failures
+
+    @staticmethod
+    def scaling_report(current: Dict[str, Any], max_exponent: float, failures: List[str],
+                       baseline: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Report lines of the scaling check
+
+        Every detector above max_exponent is flagged; it only fails the gate
+        (is appended to failures) when it also grows clearly faster than in
+        the baseline, so noise around a baseline exponent does not fail runs.
+        Without a baseline every flagged detector fails.
+        """
+        report = ["", f"Scaling (runtime ~ size^k, flagged above k = {max_exponent:.2f})"]
+        base_scaling = baseline.get('scaling', {}) if baseline else {}
+        for name, scaling in current['scaling'].items():
+            exponent = scaling['exponent']
+            if exponent is None:
+                report.append(f"  {name:<20} too fast to measure")
+                continue
+            base_exponent = base_scaling.get(name, {}).get('exponent')
+            previous = f" (baseline {base_exponent:.2f})" if base_exponent is not None else ""
+            status = ""
+            if exponent > max_exponent:
+                status = "  SUPERLINEAR"
+                if base_exponent is None or exponent > base_exponent + EXPONENT_NOISE:
+                    status += " (regression)"
+                    failures.append(f"{name}: runtime grows as size^{exponent:.2f}{previous}")
+            report.append(f"  {name:<20} k = {exponent:.2f}{previous}{status}")
+        return report
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark regression gate for the code smell detectors")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument('--save', type=str, metavar='FILE', help='Run the matrix and store the results as a baseline, unless a detector is superlinear')
+    action.add_argument('--compare', type=str, metavar='FILE', help='Run the matrix and compare against a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed slowdown of the best time, as a fraction (default: 0.10)')
+    parser.add_argument('--significance', type=float, default=0.05,
+                        help='Slowdowns must also be significant at this level (default: 0.05); '
+                             'needs enough --repeat runs to be reachable')
+    parser.add_argument('--memory-tolerance', type=float, default=0.10,
+                        help='Allowed growth of peak memory, as a fraction (default: 0.10)')
+    parser.add_argument('--max-exponent', type=float, default=1.3,
+                        help='Fail when runtime grows faster than size^k (default: 1.3)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark (default: 5)')
+    parser.add_argument('--detectors', type=str, help='Comma-separated detectors to run (default: all)')
+    parser.add_argument('--config', type=str, help='Path to configuration file (default: config/config.yaml)')
+    parser.add_argument('--output', type=str, help='Also write the results of a --compare run to this file')
+    return parser.parse_args()
+
+
+def main():
+    """Main gate function; exits non-zero on regressions"""
+    args = parse_arguments()
+    # The rank test cannot reject chance below 1 / C(2n, n) with n runs on each side
+    if min_p_value(args.repeat, args.repeat) >= args.significance:
+        print(f"Error: with --repeat {args.repeat} no slowdown can reach --significance {args.significance} "
+              f"(smallest p-value {min_p_value(args.repeat, args.repeat):.3f}); use a larger --repeat")
+        return 2
+    detector_names = [name.strip() for name in args.detectors.split(',')] if args.detectors else None
+    gate = RegressionGate(args.config, repeat=args.repeat, detector_names=detector_names)
+    invalid = [name for name in detector_names or [] if name not in gate.runner.engine.detectors]
+    if invalid:
+        print(f"Error: Invalid detector names: {', '.join(invalid)}")
+        return 2
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading baseline: {e}")
+            return 2
+
+    current = gate.run()
+    if baseline is None:
+        # A superlinear detector is not stored as a baseline, or later runs would accept its growth
+        failures = []
+        report = RegressionGate.scaling_report(current, args.max_exponent, failures)
+        output = None if failures else args.save
+    else:
+        output = args.output
+        report, failures = RegressionGate.compare(baseline, current, args.tolerance,
+                                                  args.memory_tolerance, args.max_exponent,
+                                                  args.significance)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Results written to: {output}")
+    elif args.save:
+        print(f"No baseline written to: {args.save}")
+    print("\n".join(report))
+
+    if failures:
+        print()
+        print(f"FAILED: {len(failures)} regression(s)")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print()
+    print("PASSED")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Benchmark runner
+Measures throughput and peak memory of each detector and of the full engine
+"""
+
+import gc
+import os
+import sys
+import time
+import platform
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from detector_engine import CodeSmellDetector
+from .corpus import CorpusSpec
+
+# Name under which the whole engine (all detectors, file reading included) is reported
+ENGINE = 'engine'
+
+
+def load_corpus(file_paths: List[str]) -> List[Tuple[str, str]]:
+    """(path, content) of every corpus file"""
+    sources = []
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            sources.append((file_path, file.read()))
+    return sources
+
+
+def time_runs(run: Callable[[], Any], repeat: int) -> Tuple[List[float], Any]:
+    """Wall time of each of repeat runs, and the result of the last one"""
+    samples = []
+    result = None
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        start = time.perf_counter()
+        result = run()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def peak_memory(run: Callable[[], Any]) -> int:
+    """Peak bytes allocated through Python while run() executes (one untimed run)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class BenchmarkRunner:
+    """Runs detectors and the engine over a corpus and collects their metrics
+
+    Detectors are measured through detect() on preloaded sources, so their
+    numbers exclude file I/O; the engine entry is an end-to-end
+    analyze_files() run with every detector enabled. Every timed run is
+    kept, so later comparisons can reason about noise.
+    """
+
+    def __init__(self, config_path: Optional[str] = None, repeat: int = 3, measure_memory: bool = True):
+        self.engine = CodeSmellDetector(config_path)
+        self.repeat = repeat
+        self.measure_memory = measure_memory
+
+    def run(self, file_paths: List[str], detector_names: Optional[List[str]] = None,
+            include_engine: bool = True) -> List[Dict[str, Any]]:
+        """One result entry per detector (and the engine) over the given files"""
+        sources = load_corpus(file_paths)
+        size = sum(len(content.encode('utf-8')) for _, content in sources)
+        lines = sum(content.count('\n') + 1 for _, content in sources)
+        names = detector_names or self.engine.get_available_detectors()
+
+        results = []
+        for name in names:
+            detector = self.engine.detectors[name]
+
+            def run_detector(detector=detector):
+                return sum(len(detector.detect(path, content)) for path, content in sources)
+            results.append(self._measure(name, run_detector, len(sources), lines, size))
+
+        if include_engine:
+            self.engine.configure_active_detectors(only=names)
+
+            def run_engine():
+                return len(self.engine.analyze_files(file_paths))
+            results.append(self._measure(ENGINE, run_engine, len(sources), lines, size))
+        return results
+
+    def _measure(self, name: str, run: Callable[[], int], files: int, lines: int, size: int) -> Dict[str, Any]:
+        samples, findings = time_runs(run, self.repeat)
+        best = min(samples)
+        return {
+            'name': name,
+            'files': files,
+            'lines': lines,
+            'bytes': size,
+            'findings': findings,
+            'samples': samples,
+            'seconds': best,
+            'files_per_second': files / best if best else None,
+            'lines_per_second': lines / best if best else None,
+            'peak_memory_bytes': peak_memory(run) if self.measure_memory else None,
+        }
+
+
+def environment() -> Dict[str, Any]:
+    """Description of the machine and interpreter a benchmark ran on"""
+    return {
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def benchmark_report(spec: CorpusSpec, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Machine-readable document of one benchmark run"""
+    return {
+        'environment': environment(),
+        'corpus': spec.to_dict(),
+        'results': results,
+    }
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Human-readable table of benchmark results"""
+    report = []
+    report.append(f"{'Benchmark':<22} {'Best (s)':>9} {'Files/s':>10} {'Lines/s':>11} {'Peak MB':>9} {'Findings':>9}")
+    report.append("-" * 75)
+    for result in results:
+        memory = result['peak_memory_bytes']
+        memory = f"{memory / 1e6:9.1f}" if memory is not None else f"{'-':>9}"
+        report.append(f"{result['name']:<22} {result['seconds']:>9.3f} {result['files_per_second']:>10.1f} "
+                      f"{result['lines_per_second']:>11.0f} {memory} {result['findings']:>9}")
+    return "\n".join(report)
@@ -8,7 +8,11 @@ import argparse
 import sys
 import os
 from pathlib import Path
+import metrics_store
 from detector_engine import CodeSmellDetector
+from git_changes import ChangeSet, GitError
+from smell_table import SmellTable
+from watch_mode import WatchSession, create_watcher
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -22,6 +26,16 @@ Examples:
   python detector_cli.py src/ --only LongMethod     # Only detect long methods
   python detector_cli.py src/ --exclude MagicNumbers # Exclude magic number detection
   python detector_cli.py src/ --format json         # Output in JSON format
+  python detector_cli.py src/ --format jsonl        # Stream one JSON object per line
+  python detector_cli.py src/ --cross-file          # Also find duplicates across files
+  python detector_cli.py src/ --jobs 8              # Analyze files in 8 processes
+  python detector_cli.py src/ --cache-dir .smells   # Reuse results of unchanged files
+  python detector_cli.py src/ --changed-since origin/main # Only files changed since a branch
+  python detector_cli.py . --staged --changed-lines  # Smells in staged hunks only
+  python detector_cli.py src/ --watch --format summary # Re-report on every save
+  python detector_cli.py src/ --profile             # Time each detector and file
+  python detector_cli.py src/ --trace-out trace.json # Chrome trace of the run
+  python detector_cli.py src/ --metrics-out metrics.csv # Per-method and per-class metrics
   python detector_cli.py src/ --config my_config.yaml # Use custom config
         """
     )
@@ -52,9 +66,91 @@ Examples:
     
     parser.add_argument(
         '--format',
-        choices=['detailed', 'summary', 'json'],
+        choices=['detailed', 'summary', 'json', 'jsonl'],
         default='detailed',
-        help='Output format (default: detailed)'
+        help='Output format (default: detailed); jsonl streams each finding as soon as its file is analyzed'
+    )
+    
+    parser.add_argument(
+        '--cross-file',
+        action='store_true',
+        help='Also detect code duplicated between different files (directory analysis only)'
+    )
+    
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Analyze files in N parallel processes (0 = one per CPU, default: 1)'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        metavar='DIR',
+        help='Cache results in DIR and skip files unchanged since the last run'
+    )
+    
+    changes = parser.add_mutually_exclusive_group()
+    changes.add_argument(
+        '--changed-since',
+        type=str,
+        metavar='REF',
+        help='Only analyze files changed (or added) since the merge base of REF and HEAD, per git'
+    )
+    
+    changes.add_argument(
+        '--staged',
+        action='store_true',
+        help='Only analyze files with changes staged in the git index'
+    )
+    
+    parser.add_argument(
+        '--changed-lines',
+        action='store_true',
+        help='With --changed-since or --staged, only report smells that overlap a changed hunk'
+    )
+    
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running: re-analyze changed files and print (or rewrite --output) the updated report; '
+             'config edits are picked up without a restart'
+    )
+    
+    parser.add_argument(
+        '--poll-interval',
+        type=float,
+        default=1.0,
+        metavar='SECONDS',
+        help='With --watch, how often to check the tree and config for changes (default: 1.0)'
+    )
+    
+    parser.add_argument(
+        '--polling',
+        action='store_true',
+        help='With --watch, find changes by walking the tree instead of using inotify'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Print time, calls, bytes and findings per detector and the slowest files'
+    )
+    
+    parser.add_argument(
+        '--trace-out',
+        type=str,
+        metavar='FILE',
+        help='Write a Chrome trace-event JSON file with one span per file and detector'
+    )
+    
+    parser.add_argument(
+        '--metrics-out',
+        type=str,
+        metavar='FILE',
+        help='Write the size metrics of every method and class; .npz needs NumPy, any other name gives CSV'
     )
     
     parser.add_argument(
@@ -95,6 +191,70 @@ def validate_detectors(detector_names, available_detectors):
         return False
     return True
 
+def print_cache_stats(detector, verbose, stream):
+    """Print result cache statistics in verbose mode"""
+    if verbose and detector.cache is not None:
+        print(f"Cache: {detector.cache.hits} hits, {detector.cache.misses} misses, "
+              f"{detector.cache.methods_reused} unchanged methods reused", file=stream)
+        print(file=stream)
+
+def finish_profile(detector, args, stream):
+    """Print the profile summary and write the trace file, if requested; returns the exit code"""
+    if detector.profiler is None:
+        return 0
+    if args.profile:
+        print(file=stream)
+        print(detector.profiler.summary(), file=stream)
+    if args.trace_out:
+        try:
+            detector.profiler.write_trace(args.trace_out)
+        except OSError as e:
+            print(f"Error writing trace file: {e}", file=stream)
+            return 1
+        print(f"Trace written to: {args.trace_out}", file=stream)
+    return 0
+
+def finish_metrics(detector, args, stream):
+    """Write the metrics file, if requested; returns the exit code"""
+    if not args.metrics_out:
+        return 0
+    store = detector.metrics_store()
+    try:
+        store.save(args.metrics_out)
+    except OSError as e:
+        print(f"Error writing metrics file: {e}", file=stream)
+        return 1
+    print(f"Metrics written to: {args.metrics_out} ({len(store.methods)} methods, "
+          f"{len(store.classes)} classes)", file=stream)
+    return 0
+
+def print_generated_skipped(detector):
+    """Tell which files were left out as generated (on stderr, keeping reports parseable)"""
+    if detector.generated_skipped:
+        print(f"Skipped {detector.generated_skipped} generated files (analysis.skip_generated)", file=sys.stderr)
+
+def run_watch(args, only_detectors, exclude_detectors, info):
+    """Analyze the target again whenever it changes, until interrupted; returns the exit code"""
+    def build_detector():
+        # Called again on every configuration change
+        detector = CodeSmellDetector(args.config)
+        detector.configure_active_detectors(only=only_detectors, exclude=exclude_detectors)
+        detector.enable_cache(args.cache_dir)
+        detector.config.setdefault('output', {})['format'] = args.format
+        return detector
+    
+    watcher = create_watcher(args.poll_interval, polling=args.polling)
+    if args.verbose:
+        print(f"Watching with {type(watcher).__name__} (Ctrl+C to stop)", file=info)
+        print(file=info)
+    session = WatchSession(args.target, build_detector, watcher, cross_file=args.cross_file or None,
+                           jobs=args.jobs, output=args.output, info=info)
+    try:
+        session.run()
+    except KeyboardInterrupt:
+        print("\nStopped watching", file=info)
+    return 0
+
 def main():
     """Main CLI function"""
     args = parse_arguments()
@@ -120,6 +280,27 @@ def main():
             print("Error: Target file or directory is required for analysis")
             return 1
         
+        if args.changed_lines and not (args.changed_since or args.staged):
+            print("Error: --changed-lines requires --changed-since or --staged")
+            return 1
+        
+        if args.watch and (args.changed_since or args.staged or args.profile or args.trace_out or args.metrics_out):
+            print("Error: --watch cannot be combined with --changed-since, --staged, --profile, --trace-out "
+                  "or --metrics-out")
+            return 1
+        
+        if args.metrics_out and args.metrics_out.endswith('.npz') and metrics_store.numpy is None:
+            print("Error: --metrics-out with a .npz file requires NumPy; use a .csv file instead")
+            return 1
+        
+        if args.poll_interval <= 0:
+            print("Error: --poll-interval must be a positive number of seconds")
+            return 1
+        
+        if args.jobs < 0:
+            print("Error: --jobs must be 0 (one per CPU) or a positive number")
+            return 1
+        
         # Validate target exists
         if not os.path.exists(args.target):
             print(f"Error: Target '{args.target}' does not exist")
@@ -139,16 +320,63 @@ def main():
         # Configure active detectors
         detector.configure_active_detectors(only=only_detectors, exclude=exclude_detectors)
         
+        # Keep stdout clean for machine-readable reports
+        info = sys.stderr if args.format in ('json', 'jsonl') else sys.stdout
+        
         if args.verbose:
-            print(f"Analyzing: {args.target}")
-            print(f"Active detectors: {', '.join(detector.active_detectors)}")
-            print()
+            print(f"Analyzing: {args.target}", file=info)
+            print(f"Active detectors: {', '.join(detector.active_detectors)}", file=info)
+            print(file=info)
         
-        # Analyze target
-        if os.path.isfile(args.target):
-            smells = detector.analyze_file(args.target)
+        if args.watch:
+            return run_watch(args, only_detectors, exclude_detectors, info)
+        
+        detector.enable_cache(args.cache_dir)
+        if args.profile or args.trace_out:
+            detector.enable_profiler(trace=bool(args.trace_out))
+        if args.metrics_out:
+            detector.enable_measurements(every_file=True)
+        
+        if args.changed_since or args.staged:
+            # Scale with the size of the diff: only changed files are read at all
+            target_dir = args.target if os.path.isdir(args.target) else os.path.dirname(args.target) or '.'
+            try:
+                changes = ChangeSet.from_git(target_dir, since=args.changed_since, staged=args.staged)
+            except GitError as e:
+                print(f"Error: {e}")
+                return 1
+            file_paths = detector.find_changed_files(args.target, changes)
+            if args.verbose:
+                print(f"Changed files: {len(file_paths)}", file=info)
+                print(file=info)
+            smells = detector.iter_file_smells(file_paths, cross_file=args.cross_file or None, jobs=args.jobs)
+            if args.changed_lines:
+                smells = changes.filter_smells(smells)
         else:
-            smells = detector.analyze_directory(args.target)
+            smells = detector.iter_smells(args.target, cross_file=args.cross_file or None, jobs=args.jobs)
+        
+        if args.format == 'jsonl':
+            if args.output:
+                try:
+                    with open(args.output, 'w') as f:
+                        count = detector.write_jsonl_report(smells, f)
+                    print(f"Report written to: {args.output} ({count} smells)", file=info)
+                except OSError as e:
+                    print(f"Error writing to file: {e}")
+                    return 1
+            else:
+                detector.write_jsonl_report(smells, sys.stdout)
+            print_generated_skipped(detector)
+            print_cache_stats(detector, args.verbose, info)
+            if finish_metrics(detector, args, info):
+                return 1
+            return finish_profile(detector, args, info)
+        
+        # Other formats need every finding before the report can be built; keep them columnar
+        smells = SmellTable(smells)
+        
+        print_generated_skipped(detector)
+        print_cache_stats(detector, args.verbose, info)
         
         # Override output format if specified
         if args.format:
@@ -162,14 +390,16 @@ def main():
             try:
                 with open(args.output, 'w') as f:
                     f.write(report)
-                print(f"Report written to: {args.output}")
+                print(f"Report written to: {args.output}", file=info)
             except Exception as e:
                 print(f"Error writing to file: {e}")
                 return 1
         else:
             print(report)
         
-        return 0
+        if finish_metrics(detector, args, info):
+            return 1
+        return finish_profile(detector, args, info)
         
     except KeyboardInterrupt:
         print("\nOperation cancelled by user")
@@ -1,21 +1,50 @@
 import os
 import yaml
 import json
-from typing import List, Dict, Any, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, TextIO, Tuple
 from pathlib import Path
 
-from detectors.base_detector import CodeSmell
+from detectors.base_detector import BaseDetector, CodeSmell
+from detectors.clone_index import CloneIndex
+from detectors.symbol_index import FileSymbols, SymbolIndex
+from detectors.source_model import (SourceModel, TOKEN_STREAM, SIGNATURES, LINE_COUNTS, CLASS_SUMMARIES,
+                                     NORMALIZED_LINES, resolve_analyses)
+from detectors.token_rules import TokenScanner
 from detectors.structure_detectors import LongMethodDetector, GodClassDetector
 from detectors.parameter_detectors import LargeParameterListDetector, MagicNumberDetector
 from detectors.duplication_detectors import DuplicatedCodeDetector, FeatureEnvyDetector
+from file_discovery import FileDiscovery
+from git_changes import ChangeSet
+from metrics_store import METRICS, MetricsStore, file_metrics
+from profiler import Profiler
+from result_cache import ResultCache, MethodResults
+from smell_table import SmellTable
 
 class CodeSmellDetector:
     """Main code smell detection engine"""
     
-    def __init__(self, config_path: Optional[str] = None):
-        self.config = self._load_config(config_path)
+    def __init__(self, config_path: Optional[str] = None, config: Optional[Dict[str, Any]] = None):
+        # An already loaded config (e.g. handed to worker processes) wins over config_path
+        self.config_path: Optional[str] = None
+        self.config = config if config is not None else self._load_config(config_path)
         self.detectors = self._initialize_detectors()
         self.active_detectors = []
+        self._analysis_plans: Dict[Tuple[Tuple[str, ...], bool], frozenset] = {}
+        self._token_scanners: Dict[tuple, TokenScanner] = {}
+        self.cache: Optional[ResultCache] = None
+        self.profiler: Optional[Profiler] = None
+        # File path -> detector name (or METRICS) -> measurements, while enable_measurements is on
+        self.measurements: Optional[Dict[str, Dict[str, Any]]] = None
+        # Measure files even if the cache has their results (see enable_measurements)
+        self.measure_every_file = False
+        # Generated files left out of the last completed file listing
+        self.generated_skipped = 0
+        # Set to keep the process pool alive between runs (see close_workers)
+        self.keep_workers = False
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_key: Optional[tuple] = None
     
     def _load_config(self, config_path: Optional[str]) -> Dict[str, Any]:
         """Load configuration from YAML file"""
@@ -23,6 +52,7 @@ class CodeSmellDetector:
             # Default config path
             current_dir = Path(__file__).parent.parent
             config_path = current_dir / "config" / "config.yaml"
+        self.config_path = str(config_path)
         
         try:
             with open(config_path, 'r') as file:
@@ -40,7 +70,7 @@ class CodeSmellDetector:
             'code_smells': {
                 'LongMethod': {'enabled': True, 'threshold_lines': 30},
                 'GodClass': {'enabled': True, 'threshold_methods': 15, 'threshold_lines': 200},
-                'DuplicatedCode': {'enabled': True, 'min_duplicate_lines': 3, 'similarity_threshold': 0.8},
+                'DuplicatedCode': {'enabled': True, 'min_duplicate_lines': 3, 'similarity_threshold': 0.8, 'cross_file': False},
                 'LargeParameterList': {'enabled': True, 'threshold_parameters': 5},
                 'MagicNumbers': {'enabled': True, 'exclude_common': True, 'exclude_constants': True},
                 'FeatureEnvy': {'enabled': True, 'external_calls_threshold': 5}
@@ -53,7 +83,9 @@ class CodeSmellDetector:
             'analysis': {
                 'file_extensions': ['.java'],
                 'exclude_patterns': ['*Test.java', '*test.java'],
-                'include_patterns': ['*.java']
+                'include_patterns': ['*.java'],
+                'exclude_dirs': ['.git', '.hg', '.svn', '.idea', '.gradle', 'build', 'target', 'out', 'node_modules'],
+                'skip_generated': True
             }
         }
     
@@ -90,104 +122,647 @@ class CodeSmellDetector:
                 if detector.is_enabled()
             ]
     
+    def required_analyses(self, with_fingerprint: bool = False) -> frozenset:
+        """Source model analyses needed by the active detectors (and the cross-file fingerprint)"""
+        measuring = self.measurements is not None or bool(self.percentile_detectors())
+        key = (tuple(self.active_detectors), with_fingerprint, measuring)
+        plan = self._analysis_plans.get(key)
+        if plan is None:
+            names = set()
+            for detector_name in self.active_detectors:
+                names.update(self.detectors[detector_name].requires)
+            if with_fingerprint:
+                names.update(self.detectors['DuplicatedCode'].fingerprint_requires)
+            if measuring:
+                # The metrics kept with the measurements (see metrics_store.file_metrics)
+                names.update((SIGNATURES, LINE_COUNTS, CLASS_SUMMARIES))
+            plan = self._analysis_plans[key] = resolve_analyses(names)
+        return plan
+    
+    def percentile_detectors(self) -> List[str]:
+        """Active detectors with a percentile threshold ("p95"), judged once every file is measured"""
+        return [name for name in self.active_detectors if self.detectors[name].percentiles()]
+    
+    def token_scanner(self) -> TokenScanner:
+        """Scanner for the token rules of every active detector, shared by all files"""
+        rules = tuple(rule for name in self.active_detectors for rule in self.detectors[name].token_rules)
+        scanner = self._token_scanners.get(rules)
+        if scanner is None:
+            scanner = self._token_scanners[rules] = TokenScanner(rules)
+        return scanner
+    
+    def _new_model(self, file_path: str, content: str, with_fingerprint: bool = False,
+                   method_results: Optional[MethodResults] = None) -> SourceModel:
+        """Source model planned for the active detectors (skipping the bodies method_results knows)"""
+        model = SourceModel(file_path, content, self.required_analyses(with_fingerprint), self.token_scanner(),
+                            method_results.lookup if method_results is not None else None,
+                            method_results.code_lines if method_results is not None else None)
+        if method_results is not None:
+            method_results.model = model
+        return model
+    
     def analyze_file(self, file_path: str) -> List[CodeSmell]:
         """Analyze a single file for code smells"""
+        model = self._load_model(file_path)
+        if model is None:
+            return []
+        return self.analyze_model(model)
+    
+    def analyze_content(self, file_path: str, content: str) -> List[CodeSmell]:
+        """Analyze source text as the content of file_path (which is not read)"""
+        return self.analyze_model(self._new_model(file_path, content))
+    
+    def analyze_model(self, model: SourceModel) -> List[CodeSmell]:
+        """Run every active detector on an already built source model
+        
+        Percentile thresholds are taken over the methods and classes of this
+        file alone.
+        """
+        kept = self.measurements is not None
+        smells = self._analyze(model, False)[0]
+        deferred = self.percentile_detectors()
+        if deferred:
+            smells.extend(self._judge_deferred([model.file_path], deferred))
+        if not kept:
+            self.measurements = None
+        return smells
+    
+    def _analyze(self, model: SourceModel, with_fingerprint: bool, with_symbols: bool = False,
+                 method_results: Optional[MethodResults] = None
+                 ) -> Tuple[List[CodeSmell], Optional[tuple], Optional[FileSymbols]]:
+        """Smells of the active detectors, plus the cross-file fingerprint and symbols of a model if requested
+        
+        With with_symbols, FeatureEnvy only summarizes the file; its findings
+        are reported from the project's SymbolIndex once every file is known.
+        With method_results (the model's skip_body), the findings of skipped
+        methods are filled in from the cache, and the results of the analyzed
+        methods are left in method_results.fresh.
+        """
+        deferred = self.percentile_detectors()
+        if deferred and self.measurements is None:
+            # Percentile thresholds are judged from the measurements of every file
+            self.measurements = {}
+        # A cancelled run may still be finishing this file while the next run
+        # reconfigures the engine; it keeps what it started with
+        active_detectors = self.active_detectors
+        measurements = self.measurements
+        if measurements is not None:
+            measurements[model.file_path] = {METRICS: file_metrics(model)}
+        steps = self._detector_steps(model, active_detectors, measurements, with_symbols, method_results, deferred)
+        if with_fingerprint:
+            steps.append(('(cross-file fingerprint)', lambda: self.detectors['DuplicatedCode'].fingerprint(model)))
+        
+        if self.profiler is not None:
+            # The shared token stream is built up front so that no detector is charged for it
+            results = self.profiler.profile_file(model.file_path, model.content,
+                                                 [('(lexer)', model.lex)] + steps)[1:]
+        else:
+            results = [step() for _, step in steps]
+        
+        all_smells = []
+        symbols = None
+        scoped_smells = {}
+        for detector_name, result in zip(active_detectors, results):
+            if with_symbols and detector_name == 'FeatureEnvy':
+                symbols = result
+                continue
+            all_smells.extend(result)
+            if method_results is not None and self.detectors[detector_name].method_scoped:
+                scoped_smells[detector_name] = result
+        
+        if method_results is not None:
+            calls = None
+            if symbols is not None:
+                first_tokens = [method.first_token for cls in model.classes for method in cls.methods]
+                calls = dict(zip(first_tokens, (entry[4] for entry in symbols.methods)))
+            method_results.fresh = method_results.collect(scoped_smells, calls)
+        return all_smells, results[-1] if with_fingerprint else None, symbols
+    
+    def _detector_steps(self, model: SourceModel, active_detectors: List[str],
+                        measurements: Optional[Dict[str, Dict[str, Any]]], with_symbols: bool,
+                        method_results: Optional[MethodResults],
+                        deferred: List[str]) -> List[Tuple[str, Callable[[], Any]]]:
+        """(detector name, step) for every active detector; see _analyze
+        
+        Deferred detectors only measure; see _judge_deferred.
+        """
+        steps = []
+        for detector_name in active_detectors:
+            detector = self.detectors[detector_name]
+            if with_symbols and detector_name == 'FeatureEnvy':
+                if method_results is not None:
+                    step = lambda detector=detector: detector.symbols(model, method_results.known_calls())
+                else:
+                    step = lambda detector=detector: detector.symbols(model)
+            elif method_results is not None and detector.method_scoped:
+                step = lambda detector=detector, name=detector_name: method_results.merge(
+                    name, detector, detector.analyze(model))
+            elif measurements is not None and detector.thresholds:
+                step = lambda detector=detector, name=detector_name: self._measure(
+                    name, detector, model, measurements, judge=name not in deferred)
+            else:
+                step = lambda detector=detector: detector.analyze(model)
+            steps.append((detector_name, step))
+        return steps
+    
+    def _measure(self, detector_name: str, detector: BaseDetector, model: SourceModel,
+                 measurements: Dict[str, Dict[str, Any]], judge: bool = True) -> List[CodeSmell]:
+        """analyze() of a threshold detector, keeping its measurements of the file (judged later unless judge)"""
+        measured = detector.measure(model)
+        measurements[model.file_path][detector_name] = measured
+        if not judge:
+            return []
+        return detector.judge(model.file_path, measured)
+    
+    def _judge_deferred(self, file_paths: List[str], deferred: List[str]) -> List[CodeSmell]:
+        """Findings of the percentile detectors, their percentiles taken over the metrics of file_paths"""
+        store = self.metrics_store(file_paths)
+        for detector_name in deferred:
+            self.detectors[detector_name].resolve_percentiles(store)
+        smells = []
+        for file_path in file_paths:
+            measured = self.measurements[file_path]
+            for detector_name in deferred:
+                smells.extend(self.detectors[detector_name].judge(file_path, measured.get(detector_name, [])))
+        return smells
+    
+    def metrics_store(self, file_paths: Optional[Iterable[str]] = None) -> MetricsStore:
+        """Method and class metrics of measured files (default: all of them, in analysis order)"""
+        store = MetricsStore()
+        measurements = self.measurements or {}
+        for file_path in (measurements if file_paths is None else file_paths):
+            store.add(file_path, measurements[file_path][METRICS])
+        return store
+    
+    def _method_results(self, with_fingerprint: bool, with_symbols: bool,
+                        config_key: Optional[str]) -> Optional[MethodResults]:
+        """Per-method reuse for a changed file, or None where it cannot apply
+        
+        Every active detector that reads method bodies has to be method-scoped
+        or need no more than the normalized code lines (like DuplicatedCode and
+        the cross-file fingerprint), which are cached per method as well; other
+        token analyses would miss the unchanged bodies left out of the stream.
+        """
+        if self.cache is None or config_key is None:
+            return None
+        line_analyses = resolve_analyses((NORMALIZED_LINES,))
+        with_lines = with_fingerprint
+        reads_bodies = False
+        for detector_name in self.active_detectors:
+            detector = self.detectors[detector_name]
+            analyses = resolve_analyses(detector.requires)
+            if TOKEN_STREAM not in analyses:
+                continue
+            if analyses <= line_analyses:
+                with_lines = True
+            elif not detector.method_scoped or (detector_name == 'FeatureEnvy' and not with_symbols):
+                return None
+            reads_bodies = True
+        if not reads_bodies and not with_lines:
+            return None
+        cache = self.cache
+        return MethodResults(lambda lines_hash: cache.lookup_method(lines_hash, config_key), with_lines)
+    
+    def _load_model(self, file_path: str, with_fingerprint: bool = False,
+                    method_results: Optional[MethodResults] = None) -> Optional[SourceModel]:
+        """Read a file and wrap it in the structural model shared by all detectors"""
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 content = file.read()
         except Exception as e:
             print(f"Error reading file {file_path}: {e}")
-            return []
+            return None
+        return self._new_model(file_path, content, with_fingerprint, method_results)
+    
+    def analyze_directory(self, directory_path: str, cross_file: Optional[bool] = None,
+                          jobs: int = 1) -> List[CodeSmell]:
+        """Analyze all Java files in a directory
         
-        all_smells = []
+        When cross_file is set (default: the DuplicatedCode 'cross_file' option),
+        duplicated blocks shared between different files are reported as well.
+        With jobs > 1 files are spread across a process pool (0 = one per CPU);
+        the result is identical to, and in the same order as, a serial run.
+        """
+        return self.analyze_files(self.find_files(directory_path), cross_file=cross_file, jobs=jobs)
+    
+    def analyze_files(self, file_paths: List[str], cross_file: Optional[bool] = None,
+                      jobs: int = 1) -> List[CodeSmell]:
+        """Analyze the given files, in order (see analyze_directory for the options)"""
+        return list(self.iter_file_smells(file_paths, cross_file=cross_file, jobs=jobs))
+    
+    def iter_smells(self, target: str, cross_file: Optional[bool] = None,
+                    jobs: int = 1) -> Iterator[CodeSmell]:
+        """Yield the smells of a file or of every Java file under a directory
         
-        for detector_name in self.active_detectors:
-            detector = self.detectors[detector_name]
-            smells = detector.detect(file_path, content)
-            all_smells.extend(smells)
+        Streaming counterpart of analyze_directory: findings are yielded as soon
+        as their file is analyzed, so memory does not grow with the number of
+        findings. Cross-file duplicates can only be known once every file has
+        been seen and therefore come last, and so do FeatureEnvy findings, whose
+        receivers are resolved against the declarations of every file.
+        """
+        file_paths = [target] if os.path.isfile(target) else self.find_files(target)
+        return self.iter_file_smells(file_paths, cross_file=cross_file, jobs=jobs)
+    
+    def iter_file_smells(self, file_paths: List[str], cross_file: Optional[bool] = None,
+                         jobs: int = 1) -> Iterator[CodeSmell]:
+        """Yield the smells of the given files, in order (see iter_smells)"""
+        return self.iter_result_smells(self.iter_file_results(file_paths, cross_file, jobs), cross_file)
+    
+    def iter_file_results(self, file_paths: List[str], cross_file: Optional[bool] = None,
+                          jobs: int = 1) -> Iterator[Tuple[str, List[CodeSmell], Any, Optional[FileSymbols]]]:
+        """Yield (file_path, smells, fingerprint, symbols) per readable file, in input order
         
-        return all_smells
+        fingerprint and symbols are only computed when the project-wide steps
+        of iter_result_smells need them. Keeping these results lets a caller
+        redo the project-wide steps after re-analyzing only some files.
+        """
+        with_fingerprints = self._create_clone_index(cross_file) is not None
+        return self._iter_file_results(file_paths, with_fingerprints, 'FeatureEnvy' in self.active_detectors, jobs)
     
-    def analyze_directory(self, directory_path: str) -> List[CodeSmell]:
-        """Analyze all Java files in a directory"""
-        all_smells = []
-        extensions = self.config.get('analysis', {}).get('file_extensions', ['.java'])
+    def iter_result_smells(self, file_results: Iterable[tuple], cross_file: Optional[bool] = None) -> Iterator[CodeSmell]:
+        """Yield the smells of per-file results (see iter_file_results), then those found across files"""
+        clone_index = self._create_clone_index(cross_file)
+        symbol_index = SymbolIndex() if 'FeatureEnvy' in self.active_detectors else None
+        deferred = self.percentile_detectors()
+        measured_paths = []
         
-        for root, dirs, files in os.walk(directory_path):
-            for file in files:
-                if any(file.endswith(ext) for ext in extensions):
-                    file_path = os.path.join(root, file)
-                    smells = self.analyze_file(file_path)
-                    all_smells.extend(smells)
+        for file_path, smells, fingerprint, symbols in file_results:
+            yield from smells
+            if deferred:
+                measured_paths.append(file_path)
+            if clone_index is not None:
+                clone_index.add(file_path, *fingerprint)
+            if symbol_index is not None:
+                symbol_index.add(file_path, symbols)
         
-        return all_smells
+        if deferred:
+            judge = lambda: self._judge_deferred(measured_paths, deferred)
+            if self.profiler is not None:
+                yield from self.profiler.profile_step('(percentile thresholds)', judge)
+            else:
+                yield from judge()
+        if symbol_index is not None:
+            feature_envy = self.detectors['FeatureEnvy']
+            if self.profiler is not None:
+                yield from self.profiler.profile_step('(project symbols)', lambda: feature_envy.report(symbol_index))
+            else:
+                yield from feature_envy.report(symbol_index)
+        if clone_index is not None:
+            if self.profiler is not None:
+                yield from self.profiler.profile_step('(cross-file clones)', clone_index.find_clones)
+            else:
+                yield from clone_index.find_clones()
+    
+    def find_files(self, directory_path: str) -> List[str]:
+        """List the files to analyze under a directory, honoring the 'analysis' settings"""
+        return list(self.iter_files(directory_path))
     
-    def generate_report(self, smells: List[CodeSmell]) -> str:
-        """Generate a report from detected code smells"""
+    def iter_files(self, directory_path: str) -> Iterator[str]:
+        """Yield the files to analyze under a directory as the walk finds them (see find_files)
+        
+        Once the walk is complete, generated_skipped holds the number of
+        generated files left out.
+        """
+        discovery = FileDiscovery.from_config(self.config.get('analysis', {}))
+        yield from discovery.iter_files(directory_path)
+        self.generated_skipped = discovery.generated_skipped
+
+    def find_changed_files(self, target: str, changes: ChangeSet) -> List[str]:
+        """List the files of a target (file or directory) that are part of a git change set"""
+        if os.path.isfile(target):
+            return [target] if target in changes else []
+        discovery = FileDiscovery.from_config(self.config.get('analysis', {}))
+        file_paths = discovery.select(target, changes.files())
+        self.generated_skipped = discovery.generated_skipped
+        return file_paths
+
+    def enable_profiler(self, trace: bool = False) -> Profiler:
+        """Time every detector on every file from now on; trace also keeps each span"""
+        self.profiler = Profiler(trace=trace)
+        return self.profiler
+    
+    def enable_measurements(self, every_file: bool = False):
+        """Keep the measurements of threshold detectors and the metrics of the files analyzed from now on
+        
+        Cached results carry no measurements, so files served from the cache
+        are not measured unless every_file, which bypasses the result cache
+        (as percentile thresholds, which turn measurements on by themselves,
+        do). Calling it again forgets the measurements kept so far.
+        """
+        self.measurements = {}
+        self.measure_every_file = every_file
+    
+    def update_thresholds(self, config: Dict[str, Any], file_paths: Iterable[str]) -> bool:
+        """Adopt config if the kept measurements of file_paths suffice to apply it
+        
+        That is the case when config differs from the current one only in
+        detector thresholds (and output settings) and every file was measured.
+        The detectors are then rebuilt, and rejudge_results() turns the results
+        of the last analysis into those under the new thresholds, without
+        reading or parsing any file. Returns False, changing nothing, when the
+        files have to be analyzed again.
+        """
+        if self.measurements is None or any(path not in self.measurements for path in file_paths):
+            return False
+        if self._without_thresholds(config) != self._without_thresholds(self.config):
+            return False
+        self.config = config
+        self.detectors = self._initialize_detectors()
+        return True
+    
+    def _without_thresholds(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """config without output settings and detector thresholds, for comparison"""
+        stripped = {key: value for key, value in config.items() if key != 'output'}
+        smell_configs = dict(stripped.get('code_smells') or {})
+        for name, detector in self.detectors.items():
+            if detector.thresholds and isinstance(smell_configs.get(name), dict):
+                smell_configs[name] = {key: value for key, value in smell_configs[name].items()
+                                       if key not in detector.thresholds}
+        stripped['code_smells'] = smell_configs
+        return stripped
+    
+    def rejudge_results(self, file_results: Iterable[tuple]) -> Iterator[tuple]:
+        """Per-file results (see iter_file_results) with threshold findings judged again
+        
+        Findings of detectors measured in the file are rebuilt from their
+        measurements under the current thresholds; all others are kept.
+        FeatureEnvy findings and those of percentile thresholds come from
+        iter_result_smells, which reports them from the kept symbols and
+        measurements under the current thresholds.
+        """
+        deferred = self.percentile_detectors()
+        for file_path, smells, fingerprint, symbols in file_results:
+            measured = self.measurements[file_path]
+            by_type: Dict[str, List[CodeSmell]] = {}
+            for smell in smells:
+                by_type.setdefault(smell.smell_type, []).append(smell)
+            rejudged = []
+            for detector_name in self.active_detectors:
+                detector = self.detectors[detector_name]
+                if detector_name in deferred:
+                    continue  # Judged by iter_result_smells over the whole project
+                if detector_name in measured:
+                    rejudged.extend(detector.judge(file_path, measured[detector_name]))
+                else:
+                    rejudged.extend(by_type.get(detector.smell_type, ()))
+            yield file_path, rejudged, fingerprint, symbols
+    
+    def enable_cache(self, cache_dir: Optional[str]):
+        """Reuse results of unchanged files across runs (None disables the cache)"""
+        if self.cache is not None:
+            self.cache.close()
+        self.cache = ResultCache(cache_dir) if cache_dir else None
+    
+    def config_key(self) -> str:
+        """Cache key part covering the active detectors, their versions and settings"""
+        return ResultCache.make_config_key([
+            (name, self.detectors[name].version, self.detectors[name].config)
+            for name in self.active_detectors
+        ])
+    
+    def _iter_file_results(self, file_paths: List[str], with_fingerprints: bool, with_symbols: bool, jobs: int):
+        """Yield (file_path, smells, fingerprint, symbols) per readable file, in input order"""
+        if jobs == 0:
+            jobs = os.cpu_count() or 1
+        if self.measurements is None and self.percentile_detectors():
+            # Percentile thresholds are judged from the measurements of every file
+            self.measurements = {}
+        # Cached results carry no measurements
+        measure_all = self.measurements is not None and (self.measure_every_file or self.percentile_detectors())
+        cache = None if measure_all else self.cache
+        config_key = self.config_key() if cache is not None else None
+        
+        if jobs <= 1 or len(file_paths) <= 1:
+            for file_path in file_paths:
+                content_hash = None
+                if cache is not None:
+                    entry, content_hash, content = cache.lookup(file_path, config_key,
+                                                                with_fingerprints, with_symbols)
+                    if entry is not None:
+                        yield from self._unpack_result(file_path, entry)
+                        continue
+                    method_results = self._method_results(with_fingerprints, with_symbols, config_key)
+                    if content is not None:
+                        model = self._new_model(file_path, content, with_fingerprints, method_results)
+                    else:
+                        model = self._load_model(file_path, with_fingerprints, method_results)
+                else:
+                    method_results = None
+                    model = self._load_model(file_path, with_fingerprints)
+                if model is None:
+                    continue
+                smells, fingerprint, symbols = self._analyze(model, with_fingerprints, with_symbols, method_results)
+                if content_hash is not None:
+                    cache.store(content_hash, config_key, [smell.to_tuple() for smell in smells], fingerprint,
+                                symbols.to_data() if symbols is not None else None)
+                    if method_results is not None:
+                        self._store_methods(config_key, len(method_results.reused), method_results.fresh)
+                yield file_path, smells, fingerprint, symbols
+            if cache is not None:
+                cache.flush()
+            return
+        
+        yield from self._iter_parallel_results(file_paths, with_fingerprints, with_symbols, jobs, cache, config_key)
+    
+    def _store_methods(self, config_key: str, reused: int, fresh: List[Tuple[str, list]]):
+        """Count reused methods and cache the results of analyzed ones"""
+        self.cache.methods_reused += reused
+        for lines_hash, data in fresh:
+            self.cache.store_method(lines_hash, config_key, data)
+    
+    def _iter_parallel_results(self, file_paths: List[str], with_fingerprints: bool, with_symbols: bool,
+                               jobs: int, cache: Optional[ResultCache], config_key: Optional[str]):
+        """_iter_file_results on a process pool, with a bounded number of files in flight
+        
+        Cache misses are sent to the workers in small batches. Files are yielded
+        strictly in input order, and no more than a fixed window of files (hits
+        or misses) is held at any time, so memory stays flat on large projects.
+        """
+        chunksize = max(1, min(64, len(file_paths) // (jobs * 8)))
+        if self.keep_workers:
+            # Interactive runs: small batches leave little work behind a cancel
+            chunksize = min(chunksize, 4)
+        window = jobs * chunksize * 4
+        # Entries are [file_path, content_hash, result, future, slot in the future's batch]
+        pending = deque()
+        batch = []
+        
+        executor = self._worker_pool(jobs)
+        # Kept by this run even if a later run starts over (see enable_measurements)
+        measurements = self.measurements
+        try:
+            def submit_batch():
+                future = executor.submit(_analyze_batch_in_worker,
+                                         [(entry[0], with_fingerprints, with_symbols, config_key) for entry in batch])
+                for slot, entry in enumerate(batch):
+                    entry[3] = future
+                    entry[4] = slot
+                batch.clear()
+            
+            def finish_oldest():
+                entry = pending.popleft()
+                if entry[2] is None and entry[3] is None:
+                    # Still waiting in the unsent batch
+                    submit_batch()
+                file_path, content_hash, result, future, slot = entry
+                if future is not None:
+                    result = future.result()[slot]
+                    if result is not None:
+                        packed_smells, fingerprint, symbols_data, methods, spans, measured = result
+                        result = packed_smells, fingerprint, symbols_data
+                        if spans:
+                            self.profiler.merge(spans)
+                        if measured is not None:
+                            measurements[file_path] = measured
+                        if content_hash is not None:
+                            cache.store(content_hash, config_key, packed_smells, fingerprint, symbols_data)
+                            if methods is not None:
+                                self._store_methods(config_key, *methods)
+                return file_path, result
+            
+            for file_path in file_paths:
+                entry = [file_path, None, None, None, 0]
+                if cache is not None:
+                    result, entry[1], _ = cache.lookup(file_path, config_key, with_fingerprints, with_symbols)
+                    entry[2] = result
+                if entry[2] is None:
+                    batch.append(entry)
+                    if len(batch) >= chunksize:
+                        submit_batch()
+                pending.append(entry)
+                
+                # Hand out finished files right away; block only when the window is full
+                while pending and (len(pending) > window or self._is_finished(pending[0])):
+                    yield from self._unpack_result(*finish_oldest())
+            
+            if batch:
+                submit_batch()
+            while pending:
+                yield from self._unpack_result(*finish_oldest())
+        finally:
+            # A consumer that stops early (e.g. a cancelled run) leaves queued batches behind
+            for entry in pending:
+                if entry[3] is not None:
+                    entry[3].cancel()
+            if executor is not self._pool:
+                executor.shutdown(wait=True, cancel_futures=True)
+        
+        if cache is not None:
+            cache.flush()
+    
+    def _worker_pool(self, jobs: int) -> ProcessPoolExecutor:
+        """Process pool of jobs workers running this engine's current settings
+        
+        Workers rebuild the engine once from the effective config and send back
+        compact tuples. With keep_workers the pool is reused by later runs as
+        long as the settings stay the same.
+        """
+        cache_dir = self.cache.cache_dir if self.cache is not None else None
+        measure = self.measurements is not None
+        key = (jobs, self.config_key(), self.profiler is not None, cache_dir, measure)
+        if self._pool is not None and self._pool_key == key:
+            return self._pool
+        self.close_workers()
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                   initargs=(self.config, self.active_detectors, self.profiler is not None,
+                                             cache_dir, measure))
+        if self.keep_workers:
+            self._pool, self._pool_key = pool, key
+        return pool
+    
+    def close_workers(self):
+        """Shut down the process pool kept by keep_workers, if any"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._pool_key = None
+    
+    @staticmethod
+    def _is_finished(entry: list) -> bool:
+        future = entry[3]
+        return future.done() if future is not None else entry[2] is not None
+    
+    def _unpack_result(self, file_path: str, result: Optional[tuple]):
+        """Turn a (packed smells, fingerprint, symbols data) result into a _iter_file_results item"""
+        if result is not None:
+            packed_smells, fingerprint, symbols_data = result
+            symbols = FileSymbols.from_data(symbols_data) if symbols_data is not None else None
+            yield file_path, self._unpack_smells(file_path, packed_smells), fingerprint, symbols
+    
+    @staticmethod
+    def _unpack_smells(file_path: str, packed_smells: List[tuple]) -> List[CodeSmell]:
+        return [CodeSmell.from_tuple(file_path, values) for values in packed_smells]
+    
+    def _create_clone_index(self, cross_file: Optional[bool]) -> Optional[CloneIndex]:
+        """Return a fresh cross-file clone index, or None if cross-file detection is off"""
+        if 'DuplicatedCode' not in self.active_detectors:
+            return None
+        duplicated_code = self.detectors['DuplicatedCode']
+        if cross_file is None:
+            cross_file = duplicated_code.config.get('cross_file', False)
+        if not cross_file:
+            return None
+        return CloneIndex(min_lines=duplicated_code.config.get('min_duplicate_lines', 3))
+    
+    def generate_report(self, smells: Iterable[CodeSmell]) -> str:
+        """Generate a report from detected code smells (a SmellTable or any iterable of CodeSmell)"""
+        table = smells if isinstance(smells, SmellTable) else SmellTable(smells)
         output_format = self.config.get('output', {}).get('format', 'detailed')
         
         if output_format == 'json':
-            return self._generate_json_report(smells)
+            return self._generate_json_report(table)
+        elif output_format == 'jsonl':
+            return "\n".join(json.dumps(table.to_dict(i)) for i in range(len(table)))
         elif output_format == 'summary':
-            return self._generate_summary_report(smells)
+            return self._generate_summary_report(table)
         else:
-            return self._generate_detailed_report(smells)
+            return self._generate_detailed_report(table)
     
-    def _generate_detailed_report(self, smells: List[CodeSmell]) -> str:
+    def _generate_detailed_report(self, table: SmellTable) -> str:
         """Generate detailed text report"""
-        if not smells:
+        if not table:
             return "No code smells detected! ✓"
         
         report = []
         report.append("=" * 60)
         report.append("CODE SMELL DETECTION REPORT")
         report.append("=" * 60)
-        report.append(f"Total smells detected: {len(smells)}")
+        report.append(f"Total smells detected: {len(table)}")
         report.append(f"Active detectors: {', '.join(self.active_detectors)}")
         report.append("")
         
-        # Group smells by type
-        smells_by_type = {}
-        for smell in smells:
-            if smell.smell_type not in smells_by_type:
-                smells_by_type[smell.smell_type] = []
-            smells_by_type[smell.smell_type].append(smell)
-        
-        for smell_type, type_smells in smells_by_type.items():
-            report.append(f"🔍 {smell_type} ({len(type_smells)} occurrences)")
+        start_lines, end_lines = table.start_lines, table.end_lines
+        for smell_type, rows in table.rows_by_type().items():
+            report.append(f"🔍 {smell_type} ({len(rows)} occurrences)")
             report.append("-" * 40)
             
-            for smell in type_smells:
-                report.append(f"📁 File: {smell.file_path}")
-                if smell.start_line == smell.end_line:
-                    report.append(f"📍 Line: {smell.start_line}")
+            for i in rows:
+                report.append(f"📁 File: {table.file_path(i)}")
+                if start_lines[i] == end_lines[i]:
+                    report.append(f"📍 Line: {start_lines[i]}")
                 else:
-                    report.append(f"📍 Lines: {smell.start_line}-{smell.end_line}")
-                report.append(f"⚠️  {smell.description}")
-                report.append(f"🔧 Severity: {smell.severity}")
-                if smell.suggestion:
-                    report.append(f"💡 Suggestion: {smell.suggestion}")
+                    report.append(f"📍 Lines: {start_lines[i]}-{end_lines[i]}")
+                report.append(f"⚠️  {table.description(i)}")
+                report.append(f"🔧 Severity: {table.severity(i)}")
+                suggestion = table.suggestion(i)
+                if suggestion:
+                    report.append(f"💡 Suggestion: {suggestion}")
                 report.append("")
         
         return "\n".join(report)
     
-    def _generate_summary_report(self, smells: List[CodeSmell]) -> str:
+    def _generate_summary_report(self, table: SmellTable) -> str:
         """Generate summary report"""
-        if not smells:
+        if not table:
             return "No code smells detected! ✓"
         
-        # Count by type and severity
-        type_counts = {}
-        severity_counts = {}
-        
-        for smell in smells:
-            type_counts[smell.smell_type] = type_counts.get(smell.smell_type, 0) + 1
-            severity_counts[smell.severity] = severity_counts.get(smell.severity, 0) + 1
+        # Count by type and severity straight from the code columns
+        type_counts = table.count_by('type')
+        severity_counts = table.count_by('severity')
         
         report = []
         report.append("CODE SMELL SUMMARY")
         report.append("=" * 30)
-        report.append(f"Total: {len(smells)} smells")
+        report.append(f"Total: {len(table)} smells")
         report.append("")
         
         report.append("By Type:")
@@ -201,15 +776,85 @@ class CodeSmellDetector:
         
         return "\n".join(report)
     
-    def _generate_json_report(self, smells: List[CodeSmell]) -> str:
+    def _generate_json_report(self, table: SmellTable) -> str:
         """Generate JSON report"""
         report_data = {
-            "total_smells": len(smells),
+            "total_smells": len(table),
             "active_detectors": self.active_detectors,
-            "smells": [smell.to_dict() for smell in smells]
+            "smells": [table.to_dict(i) for i in range(len(table))]
         }
         return json.dumps(report_data, indent=2)
     
+    def write_jsonl_report(self, smells: Iterable[CodeSmell], stream: TextIO) -> int:
+        """Write one JSON object per smell as it arrives; returns the number written
+        
+        Each line is flushed immediately, so with iter_smells() consumers see
+        findings while the analysis is still running.
+        """
+        count = 0
+        for smell in smells:
+            stream.write(self._jsonl_line(smell) + "\n")
+            stream.flush()
+            count += 1
+        return count
+    
+    @staticmethod
+    def _jsonl_line(smell: CodeSmell) -> str:
+        return json.dumps(smell.to_dict())
+    
     def get_available_detectors(self) -> List[str]:
         """Get list of all available detector names"""
-        return list(self.detectors.keys())
\ No newline at end of file
+        return list(self.detectors.keys())
+
+
+# Engine instance of a worker process in the parallel analysis pool
+_worker_detector: Optional[CodeSmellDetector] = None
+
+
+def _init_worker(config: Dict[str, Any], active_detectors: List[str], profile: bool = False,
+                 cache_dir: Optional[str] = None, measure: bool = False):
+    """Build the per-process engine once, when a pool worker starts"""
+    global _worker_detector
+    _worker_detector = CodeSmellDetector(config=config)
+    _worker_detector.active_detectors = list(active_detectors)
+    if profile:
+        # Spans travel back to the parent's profiler with each result
+        _worker_detector.profiler = Profiler(forward=True)
+    if cache_dir:
+        # Only read, for cached method results; the parent stores everything
+        _worker_detector.enable_cache(cache_dir)
+    if measure:
+        # Measurements travel back to the parent with each result
+        _worker_detector.enable_measurements()
+
+
+def _analyze_batch_in_worker(tasks: List[Tuple[str, bool, bool, Optional[str]]]) -> List[Optional[tuple]]:
+    """Analyze a batch of files in a pool worker, one result per file"""
+    return [_analyze_in_worker(task) for task in tasks]
+
+
+def _analyze_content_in_worker(task: Tuple[str, str]) -> List[tuple]:
+    """Packed smells of (file_path, content) in a pool worker"""
+    file_path, content = task
+    return [smell.to_tuple() for smell in _worker_detector.analyze_content(file_path, content)]
+
+
+def _analyze_in_worker(task: Tuple[str, bool, bool, Optional[str]]):
+    """Analyze one file in a pool worker
+    
+    Returns (packed smells, fingerprint, symbols data, method results, profile
+    spans, measurements) or None, where method results are (number reused,
+    fresh results) when cached method results applied.
+    """
+    file_path, with_fingerprints, with_symbols, config_key = task
+    detector = _worker_detector
+    method_results = detector._method_results(with_fingerprints, with_symbols, config_key)
+    model = detector._load_model(file_path, with_fingerprints, method_results)
+    if model is None:
+        return None
+    smells, fingerprint, symbols = detector._analyze(model, with_fingerprints, with_symbols, method_results)
+    spans = detector.profiler.drain() if detector.profiler is not None else None
+    symbols_data = symbols.to_data() if symbols is not None else None
+    methods = (len(method_results.reused), method_results.fresh) if method_results is not None else None
+    measured = detector.measurements.pop(file_path) if detector.measurements is not None else None
+    return [smell.to_tuple() for smell in smells], fingerprint, symbols_data, methods, spans, measured
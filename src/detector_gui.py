@@ -7,11 +7,17 @@ A user-friendly graphical interface for detecting code smells in Java files
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
+import queue
 import threading
+import time
+from concurrent.futures import CancelledError
 from pathlib import Path
 import yaml
 import json
 from detector_engine import CodeSmellDetector
+from gui_views import VirtualList, VirtualTable
+from smell_index import SEVERITY_ORDER, SORT_KEYS, SmellIndex
+from smell_table import SmellTable
 
 class CodeSmellDetectorGUI:
     def __init__(self, root):
@@ -25,6 +31,32 @@ class CodeSmellDetectorGUI:
         self.config_path = None
         self.selected_files = []
         
+        # Background analysis: events flow from the worker thread to drain_events
+        self.events = queue.Queue()
+        self.run_id = 0
+        self.cancel_event = None
+        self.analysis_thread = None
+        self.run_files = []
+        self.run_smells = None
+        self.files_done = 0
+        # Rows of run_smells per file, and per file of a finished run
+        # (path, first row, end row, fingerprint, symbols), for rejudge_results
+        self.run_rows = []
+        self.run_results = None
+        
+        # Results browser: an index over run_smells and the rows it currently shows
+        self.results_index = None
+        self.results_sort = None
+        self.results_descending = False
+        self.results_report = None
+        self._results_job = None
+        
+        # Background file discovery, drained by drain_discovery
+        self.discovery_events = queue.Queue()
+        self.discovery_id = 0
+        self.discovery_root = None
+        self.discovering = False
+        
         # Configure style
         self.setup_styles()
         
@@ -33,6 +65,7 @@ class CodeSmellDetectorGUI:
         
         # Initialize detector
         self.initialize_detector()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def setup_styles(self):
         """Setup custom styles for the GUI"""
@@ -99,16 +132,19 @@ class CodeSmellDetectorGUI:
         ttk.Button(file_section, text="🗑️ Clear Selection", 
                   command=self.clear_selection, style='Danger.TButton').grid(row=0, column=2)
         
-        # Selected files display
+        # Selected files display; only the visible rows exist as Tk items
         ttk.Label(file_section, text="Selected Files:").grid(row=1, column=0, sticky=tk.W, pady=(10, 5))
         
-        self.files_listbox = tk.Listbox(file_section, height=4, selectmode=tk.EXTENDED)
-        self.files_listbox.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
+        filter_frame = ttk.Frame(file_section)
+        filter_frame.grid(row=1, column=1, columnspan=3, sticky=tk.E, pady=(10, 5))
+        ttk.Label(filter_frame, text="Filter:").grid(row=0, column=0, padx=(0, 5))
+        self.file_filter = tk.StringVar()
+        self.file_filter.trace_add('write', self.schedule_file_filter)
+        self._filter_job = None
+        ttk.Entry(filter_frame, textvariable=self.file_filter, width=30).grid(row=0, column=1)
         
-        # Scrollbar for listbox
-        files_scrollbar = ttk.Scrollbar(file_section, orient=tk.VERTICAL, command=self.files_listbox.yview)
-        files_scrollbar.grid(row=2, column=3, sticky=(tk.N, tk.S))
-        self.files_listbox.configure(yscrollcommand=files_scrollbar.set)
+        self.files_list = VirtualList(file_section, height=6)
+        self.files_list.grid(row=2, column=0, columnspan=4, sticky=(tk.W, tk.E), pady=(0, 10))
         
         # Detection settings section
         settings_section = ttk.LabelFrame(analysis_frame, text="⚙️ Detection Settings", padding="15")
@@ -154,16 +190,20 @@ class CodeSmellDetectorGUI:
                                         command=self.start_analysis, style='Action.TButton')
         self.analyze_button.grid(row=0, column=0, padx=(0, 10))
         
+        self.cancel_button = ttk.Button(controls_frame, text="⏹ Cancel", 
+                                       command=self.cancel_analysis, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=1, padx=(0, 10))
+        
         ttk.Button(controls_frame, text="💾 Save Report", 
-                  command=self.save_report).grid(row=0, column=1, padx=(0, 10))
+                  command=self.save_report).grid(row=0, column=2, padx=(0, 10))
         
         ttk.Button(controls_frame, text="📋 Copy to Clipboard", 
-                  command=self.copy_to_clipboard).grid(row=0, column=2)
+                  command=self.copy_to_clipboard).grid(row=0, column=3)
         
-        # Progress bar
+        # Progress bar (percentage of selected files analyzed)
         self.progress_var = tk.DoubleVar()
         self.progress_bar = ttk.Progressbar(analysis_frame, variable=self.progress_var, 
-                                           mode='indeterminate')
+                                           mode='determinate', maximum=100)
         self.progress_bar.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
         
     def create_smell_selection(self, parent):
@@ -263,7 +303,7 @@ class CodeSmellDetectorGUI:
         self.notebook.add(results_frame, text="📊 Results")
         
         results_frame.columnconfigure(0, weight=1)
-        results_frame.rowconfigure(1, weight=1)
+        results_frame.rowconfigure(2, weight=1)
         
         # Results header
         header_frame = ttk.Frame(results_frame)
@@ -276,14 +316,55 @@ class CodeSmellDetectorGUI:
         self.results_info_label = ttk.Label(header_frame, text="No analysis performed yet")
         self.results_info_label.grid(row=0, column=1, sticky=tk.E)
         
-        # Results display
-        self.results_text = scrolledtext.ScrolledText(results_frame, wrap=tk.WORD, 
-                                                     font=('Consolas', 10))
-        self.results_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        # Result filters; any change re-queries the index once typing pauses
+        filter_frame = ttk.Frame(results_frame)
+        filter_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        self.result_type_filter = tk.StringVar(value="All")
+        self.result_severity_filter = tk.StringVar(value="All")
+        self.result_file_filter = tk.StringVar()
+        self.result_lines_filter = tk.StringVar()
+        
+        ttk.Label(filter_frame, text="Type:").grid(row=0, column=0, padx=(0, 5))
+        self.result_type_box = ttk.Combobox(filter_frame, textvariable=self.result_type_filter,
+                                            values=["All"], state='readonly', width=22)
+        self.result_type_box.grid(row=0, column=1, padx=(0, 15))
+        ttk.Label(filter_frame, text="Severity:").grid(row=0, column=2, padx=(0, 5))
+        self.result_severity_box = ttk.Combobox(filter_frame, textvariable=self.result_severity_filter,
+                                                values=["All"], state='readonly', width=10)
+        self.result_severity_box.grid(row=0, column=3, padx=(0, 15))
+        ttk.Label(filter_frame, text="File contains:").grid(row=0, column=4, padx=(0, 5))
+        ttk.Entry(filter_frame, textvariable=self.result_file_filter, width=25).grid(row=0, column=5, padx=(0, 15))
+        ttk.Label(filter_frame, text="Lines:").grid(row=0, column=6, padx=(0, 5))
+        ttk.Entry(filter_frame, textvariable=self.result_lines_filter, width=10).grid(row=0, column=7)
+        for variable in (self.result_type_filter, self.result_severity_filter,
+                         self.result_file_filter, self.result_lines_filter):
+            variable.trace_add('write', self.schedule_results_query)
+        
+        # Results table: only the visible rows exist as Tk items
+        self.results_view = VirtualTable(
+            results_frame,
+            columns=[('severity', "Severity", 80), ('type', "Type", 150), ('file', "File", 300),
+                     ('line', "Lines", 90), ('description', "Description", 450)],
+            row_values=self.result_row_values, height=20, on_sort=self.sort_results,
+            on_activate=self.show_source, sortable=SORT_KEYS)
+        self.results_view.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.results_view.on_render = self.update_results_page
+        
+        # Paging
+        page_frame = ttk.Frame(results_frame)
+        page_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        page_frame.columnconfigure(2, weight=1)
+        ttk.Button(page_frame, text="◀ Previous", 
+                  command=lambda: self.results_view.scroll(-self.results_view.height)).grid(row=0, column=0)
+        ttk.Button(page_frame, text="Next ▶", 
+                  command=lambda: self.results_view.scroll(self.results_view.height)).grid(row=0, column=1, padx=(5, 0))
+        self.results_page_label = ttk.Label(page_frame, text="")
+        self.results_page_label.grid(row=0, column=2, sticky=tk.E)
         
         # Results controls
         results_controls = ttk.Frame(results_frame)
-        results_controls.grid(row=2, column=0, pady=(15, 0))
+        results_controls.grid(row=4, column=0, pady=(15, 0))
         
         ttk.Button(results_controls, text="🗑️ Clear Results", 
                   command=self.clear_results).grid(row=0, column=0, padx=(0, 10))
@@ -324,7 +405,8 @@ HOW TO USE
 1. FILE SELECTION:
    - Click "Select Java File" to analyze a single .java file
    - Click "Select Directory" to analyze all .java files in a folder
-   - Selected files will appear in the list below
+   - Selected files will appear in the list below as they are found;
+     type in the Filter box to show only matching paths
 
 2. DETECTION SETTINGS:
    - Choose detection mode:
@@ -336,10 +418,20 @@ HOW TO USE
 
 3. ANALYSIS:
    - Click "Analyze Code" to start detection
-   - Progress will be shown in the progress bar
-   - Results will appear in the Results tab
+   - Findings are listed as each file finishes; the progress bar and status
+     bar count the files analyzed so far
+   - Click "Cancel" to stop a running analysis at once
 
-4. CONFIGURATION:
+4. RESULTS:
+   - The Results tab shows one row per finding
+   - Filter by type, severity, file path text or lines ("120" or "100-200")
+   - Click a column heading to sort by it; click again to reverse the order
+   - Double-click a finding (or press Enter) to open its file at the finding's lines
+   - Save Report and Copy produce the report in the selected output format
+   - After changing only thresholds in the Configuration tab, Apply Changes
+     updates the results of the last analysis at once, without analyzing again
+
+5. CONFIGURATION:
    - Use the Configuration tab to adjust detection thresholds
    - Modify YAML configuration directly in the editor
    - Load/save custom configuration files
@@ -400,6 +492,8 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
         """Initialize the code smell detector"""
         try:
             self.detector = CodeSmellDetector()
+            # Worker processes survive between runs, so later analyses start at once
+            self.detector.keep_workers = True
             self.load_current_config()
             self.update_status("Detector initialized successfully")
             self.detector_info_label.config(text=f"Detector: Ready ({len(self.detector.get_available_detectors())} detectors)")
@@ -424,39 +518,119 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
             filetypes=[("Java files", "*.java"), ("All files", "*.*")]
         )
         if filename:
+            self.stop_discovery()
+            self.discovery_root = None
             self.selected_files = [filename]
             self.update_file_list()
             self.update_status(f"Selected file: {os.path.basename(filename)}")
             
     def select_directory(self):
-        """Select a directory containing Java files"""
+        """Select a directory; its Java files are listed in the background as they are found"""
         directory = filedialog.askdirectory(title="Select Directory")
-        if directory:
-            java_files = []
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    if file.endswith('.java'):
-                        java_files.append(os.path.join(root, file))
+        if directory and self.detector:
+            self.start_discovery(directory)
             
-            if java_files:
-                self.selected_files = java_files
-                self.update_file_list()
-                self.update_status(f"Selected {len(java_files)} Java files from directory")
+    def start_discovery(self, directory):
+        """Walk directory on a background thread, streaming the files into the list"""
+        self.stop_discovery()
+        self.selected_files = []
+        self.discovery_root = directory
+        self.discovering = True
+        self.update_file_list()
+        self.update_status("Listing Java files...")
+        thread = threading.Thread(target=self.discover_files, args=(self.discovery_id, directory))
+        thread.daemon = True
+        thread.start()
+        self.root.after(100, self.drain_discovery, self.discovery_id)
+        
+    def stop_discovery(self):
+        """Abandon a running directory walk; its thread stops at its next file"""
+        self.discovery_id += 1
+        self.discovering = False
+        
+    def discover_files(self, discovery_id, directory):
+        """Queue the files found under directory in batches (background thread)"""
+        try:
+            batch = []
+            sent = time.perf_counter()
+            for file_path in self.detector.iter_files(directory):
+                if discovery_id != self.discovery_id:
+                    return
+                batch.append(file_path)
+                if len(batch) >= 2000 or time.perf_counter() - sent > 0.1:
+                    self.discovery_events.put(('files', discovery_id, batch))
+                    batch = []
+                    sent = time.perf_counter()
+            self.discovery_events.put(('files', discovery_id, batch))
+            self.discovery_events.put(('done', discovery_id, None))
+        except Exception as e:
+            self.discovery_events.put(('error', discovery_id, str(e)))
+            
+    def drain_discovery(self, discovery_id):
+        """Move found files into the list on the main thread until the walk is done"""
+        if discovery_id != self.discovery_id:
+            return
+        deadline = time.perf_counter() + 0.03
+        finished = None
+        while finished is None and time.perf_counter() < deadline:
+            try:
+                kind, event_id, payload = self.discovery_events.get_nowait()
+            except queue.Empty:
+                break
+            if event_id != discovery_id:
+                continue
+            if kind == 'files':
+                self.selected_files.extend(payload)
+                self.files_list.append(self.display_name(file_path) for file_path in payload)
             else:
-                messagebox.showwarning("No Java Files", "No Java files found in the selected directory.")
-                
+                finished = (kind, payload)
+        
+        if finished is None:
+            self.update_status(f"Listing Java files... {len(self.selected_files)} found")
+            self.root.after(100, self.drain_discovery, discovery_id)
+            return
+        self.discovering = False
+        if finished[0] == 'error':
+            self.update_status(f"Listing files failed: {finished[1]}")
+            messagebox.showerror("Directory Error", f"Failed to list files:\n{finished[1]}")
+        elif self.selected_files:
+            skipped = self.detector.generated_skipped
+            note = f" ({skipped} generated files skipped)" if skipped else ""
+            self.update_status(f"Selected {len(self.selected_files)} Java files from directory{note}")
+        else:
+            messagebox.showwarning("No Java Files", "No Java files found in the selected directory.")
+            
     def clear_selection(self):
         """Clear file selection"""
+        self.stop_discovery()
         self.selected_files = []
         self.update_file_list()
         self.update_status("File selection cleared")
         
+    def display_name(self, file_path):
+        """List entry for a file: its path below the selected directory, or its name"""
+        if self.discovery_root is not None:
+            prefix = os.path.join(self.discovery_root, '')
+            if file_path.startswith(prefix):
+                return file_path[len(prefix):]
+            return os.path.relpath(file_path, self.discovery_root)
+        return os.path.basename(file_path)
+        
     def update_file_list(self):
         """Update the file list display"""
-        self.files_listbox.delete(0, tk.END)
-        for file_path in self.selected_files:
-            display_name = os.path.basename(file_path)
-            self.files_listbox.insert(tk.END, display_name)
+        self.files_list.set_rows(self.display_name(file_path) for file_path in self.selected_files)
+        
+    def schedule_file_filter(self, *args):
+        """Filter the file list once typing pauses"""
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(150, self.apply_file_filter)
+        
+    def apply_file_filter(self):
+        self._filter_job = None
+        self.files_list.set_filter(self.file_filter.get())
+        if self.file_filter.get():
+            self.update_status(f"{len(self.files_list)} of {len(self.selected_files)} files match the filter")
             
     def select_all_smells(self):
         """Select all code smell checkboxes"""
@@ -469,7 +643,11 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
             var.set(False)
             
     def start_analysis(self):
-        """Start code analysis in a separate thread"""
+        """Start code analysis on a background thread; results arrive through drain_events"""
+        if self.discovering:
+            messagebox.showinfo("Listing Files", "Java files are still being listed; try again when done.")
+            return
+        
         if not self.selected_files:
             messagebox.showwarning("No Files Selected", "Please select Java files to analyze.")
             return
@@ -477,37 +655,116 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
         if not self.detector:
             messagebox.showerror("Detector Error", "Detector not initialized.")
             return
-            
-        # Disable analyze button and start progress
-        self.analyze_button.config(state=tk.DISABLED)
-        self.progress_bar.start()
-        self.update_status("Analyzing code...")
-        
-        # Start analysis in background thread
-        thread = threading.Thread(target=self.run_analysis)
-        thread.daemon = True
-        thread.start()
         
-    def run_analysis(self):
-        """Run the actual analysis (called in background thread)"""
+        # Tk variables are only read here, on the main thread
+        self.configure_detector()
+        # Kept for applying new thresholds without analyzing again
+        self.detector.enable_measurements()
+        
+        self.run_id += 1
+        self.cancel_event = threading.Event()
+        self.run_files = list(self.selected_files)
+        self.run_smells = SmellTable()
+        self.run_rows = []
+        self.run_results = None
+        self.files_done = 0
+        self.progress_var.set(0)
+        self.reset_results()
+        self.analyze_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.update_status(f"Analyzing code... 0/{len(self.run_files)} files")
+        
+        self.analysis_thread = threading.Thread(
+            target=self.run_analysis, args=(self.run_id, self.run_files, self.cancel_event))
+        self.analysis_thread.daemon = True
+        self.analysis_thread.start()
+        self.root.after(50, self.drain_events, self.run_id)
+        
+    def run_analysis(self, run_id, file_paths, cancel_event):
+        """Analyze files on the worker pool and queue an event per file (background thread)
+        
+        Events are ('file', run_id, file_path, smells), then ('done', run_id,
+        project-wide smells, per-file project inputs) or ('error', run_id,
+        message). A set cancel_event stops the run after the current file and
+        drops the queued batches. A cancelled run may still be finishing while
+        the next one starts; drain_events ignores events of any run but the
+        latest.
+        """
         try:
-            # Configure detector based on GUI settings
-            self.configure_detector()
+            project_inputs = []
+            results = self.detector.iter_file_results(file_paths, jobs=0)
+            try:
+                for file_path, smells, fingerprint, symbols in results:
+                    if cancel_event.is_set():
+                        return
+                    self.events.put(('file', run_id, file_path, smells))
+                    project_inputs.append((file_path, [], fingerprint, symbols))
+            finally:
+                results.close()
+            if cancel_event.is_set():
+                return
             
-            # Analyze files
-            all_smells = []
-            for file_path in self.selected_files:
-                smells = self.detector.analyze_file(file_path)
-                all_smells.extend(smells)
+            # Cross-file findings need every file; the per-file ones were already sent
+            project_smells = list(self.detector.iter_result_smells(project_inputs))
+            self.events.put(('done', run_id, project_smells, project_inputs))
             
-            # Generate report
-            report = self.detector.generate_report(all_smells)
+        except CancelledError:
+            return  # Its batches were dropped by cancel_analysis
+        except Exception as e:
+            self.events.put(('error', run_id, str(e)))
             
-            # Update GUI in main thread
-            self.root.after(0, self.analysis_complete, report, len(all_smells))
+    def drain_events(self, run_id):
+        """Apply queued analysis events on the main thread, a short time slice per call"""
+        if run_id != self.run_id:
+            return  # Cancelled or superseded; its events are dropped as they come
+        deadline = time.perf_counter() + 0.03
+        added = False
+        finished = None
+        while finished is None and time.perf_counter() < deadline:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[1] != self.run_id:
+                continue  # Left over from a cancelled run
+            if event[0] == 'file':
+                _, _, file_path, smells = event
+                self.files_done += 1
+                start = len(self.run_smells)
+                self.run_smells.extend(smells)
+                self.run_rows.append((file_path, start, len(self.run_smells)))
+                added |= bool(smells)
+            else:
+                finished = event
+        
+        if added:
+            self.results_grown()
+        total = len(self.run_files)
+        self.progress_var.set(100.0 * self.files_done / total if total else 100.0)
+        
+        if finished is None:
+            self.update_status(f"Analyzing code... {self.files_done}/{total} files, "
+                               f"{len(self.run_smells)} smells")
+            self.root.after(50, self.drain_events, run_id)
+        elif finished[0] == 'done':
+            self.run_results = [(file_path, start, end, fingerprint, symbols) for (file_path, start, end),
+                                (_, _, fingerprint, symbols) in zip(self.run_rows, finished[3])]
+            self.run_smells.extend(finished[2])
+            self.analysis_complete(self.run_smells)
+        else:
+            self.analysis_error(finished[2])
             
-        except Exception as e:
-            self.root.after(0, self.analysis_error, str(e))
+    def cancel_analysis(self):
+        """Stop the running analysis; its remaining events are ignored"""
+        if self.cancel_event is None or self.cancel_event.is_set():
+            return
+        self.cancel_event.set()
+        self.run_id += 1
+        # Drop the queued batches; the next run starts on fresh workers instead of waiting behind them
+        self.detector.close_workers()
+        self.analyze_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        self.update_status(f"Analysis cancelled after {self.files_done}/{len(self.run_files)} files")
             
     def configure_detector(self):
         """Configure detector based on GUI settings"""
@@ -524,31 +781,57 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
         # Set output format
         self.detector.config['output']['format'] = self.output_format.get()
         
-    def analysis_complete(self, report, smell_count):
+    def analysis_complete(self, smells):
         """Handle analysis completion (called in main thread)"""
-        self.progress_bar.stop()
+        self.cancel_event.set()
+        self.progress_var.set(100)
         self.analyze_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        smell_count = len(smells)
         
-        # Update results
-        self.results_text.delete(1.0, tk.END)
-        self.results_text.insert(1.0, report)
+        # Project-wide findings came last; show everything under the current filter and sort
+        self.results_index.update()
+        self.update_result_choices()
+        self.query_results(keep_position=True)
         
-        # Update info
-        file_count = len(self.selected_files)
-        active_detectors = ", ".join(self.detector.active_detectors)
-        self.results_info_label.config(
-            text=f"Files: {file_count} | Smells: {smell_count} | Detectors: {active_detectors}"
-        )
+        self.update_results_info()
         
         # Switch to results tab
         self.notebook.select(2)  # Results tab
         
-        self.update_status(f"Analysis complete: {smell_count} smells found in {file_count} files")
+        self.update_status(f"Analysis complete: {smell_count} smells found in {len(self.run_files)} files")
+        
+    def update_results_info(self):
+        active_detectors = ", ".join(self.detector.active_detectors)
+        self.results_info_label.config(
+            text=f"Files: {len(self.run_files)} | Smells: {len(self.run_smells)} | Detectors: {active_detectors}"
+        )
+        
+    def rejudge_results(self):
+        """Apply new thresholds to the findings of the last run; no file is read or parsed"""
+        table = self.run_smells
+        file_results = ((file_path, [table[i] for i in range(start, end)], fingerprint, symbols)
+                        for file_path, start, end, fingerprint, symbols in self.run_results)
+        smells = SmellTable()
+        run_results = []
+        for file_path, file_smells, fingerprint, symbols in self.detector.rejudge_results(file_results):
+            start = len(smells)
+            smells.extend(file_smells)
+            run_results.append((file_path, start, len(smells), fingerprint, symbols))
+        smells.extend(self.detector.iter_result_smells(
+            (file_path, [], fingerprint, symbols) for file_path, _, _, fingerprint, symbols in run_results))
+        
+        self.run_smells = smells
+        self.run_results = run_results
+        self.reset_results()
+        self.query_results(keep_position=True)
+        self.update_results_info()
         
     def analysis_error(self, error_message):
         """Handle analysis error (called in main thread)"""
-        self.progress_bar.stop()
+        self.cancel_event.set()
         self.analyze_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
         self.update_status(f"Analysis failed: {error_message}")
         messagebox.showerror("Analysis Error", f"Analysis failed:\n{error_message}")
         
@@ -557,9 +840,140 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
         self.status_label.config(text=message)
         self.root.update_idletasks()
         
+    def reset_results(self):
+        """Start the results browser over on run_smells (empty at the start of a run)"""
+        self.results_index = SmellIndex(self.run_smells) if self.run_smells is not None else None
+        self.results_report = None
+        self.update_result_choices()
+        self.results_view.set_keys([])
+        
+    def update_result_choices(self):
+        """Offer the types and severities found so far in the filter boxes"""
+        table = self.run_smells
+        types = sorted(table.types.values) if table is not None else []
+        severities = table.severities.values if table is not None else []
+        ordered = [severity for severity in SEVERITY_ORDER if severity in severities]
+        self.result_type_box.config(values=["All"] + types)
+        self.result_severity_box.config(values=["All"] + ordered + sorted(set(severities) - set(ordered)))
+        
+    def results_grown(self):
+        """Take in findings added to run_smells during a run"""
+        index = self.results_index
+        index.update()
+        self.results_report = None
+        self.update_result_choices()
+        if not self.result_criteria() and self.results_sort is None and not self.results_descending:
+            # Unfiltered table order: the shown rows are simply all rows so far
+            self.results_view.keys = range(index.indexed)
+            self.results_view.refresh()
+        elif self._results_job is None:
+            # Filtered or sorted: re-query at most twice a second while a run streams in
+            self._results_job = self.root.after(500, self.query_results, True)
+        
+    def result_criteria(self):
+        """SmellIndex.select arguments for the filter boxes; empty when nothing is filtered"""
+        criteria = {}
+        if self.result_type_filter.get() != "All":
+            criteria['types'] = [self.result_type_filter.get()]
+        if self.result_severity_filter.get() != "All":
+            criteria['severities'] = [self.result_severity_filter.get()]
+        if self.result_file_filter.get().strip():
+            criteria['file_text'] = self.result_file_filter.get().strip()
+        lines = self.parse_line_range(self.result_lines_filter.get())
+        if lines is not None:
+            criteria['lines'] = lines
+        return criteria
+        
+    @staticmethod
+    def parse_line_range(text):
+        """(first, last) from "120" or "100-200"; None when empty or not a range"""
+        parts = text.replace(' ', '').split('-')
+        if not parts[0] or len(parts) > 2 or not all(part.isdigit() for part in parts):
+            return None
+        first, last = int(parts[0]), int(parts[-1])
+        return (first, last) if first <= last else (last, first)
+        
+    def schedule_results_query(self, *args):
+        """Re-query the results once typing pauses"""
+        if self._results_job is not None:
+            self.root.after_cancel(self._results_job)
+        self._results_job = self.root.after(150, self.query_results)
+        
+    def query_results(self, keep_position=False):
+        """Show the findings matching the filters, in the chosen order"""
+        self._results_job = None
+        if self.results_index is None:
+            return
+        started = time.perf_counter()
+        keys = self.results_index.select(sort=self.results_sort, descending=self.results_descending,
+                                         **self.result_criteria())
+        elapsed = time.perf_counter() - started
+        self.results_view.set_keys(keys, keep_position=keep_position)
+        if not keep_position:
+            self.update_status(f"{len(keys)} of {len(self.run_smells)} findings shown ({elapsed * 1000:.0f} ms)")
+        
+    def sort_results(self, column):
+        """Sort by a column; sorting by the same column again reverses the order"""
+        if self.results_sort == column:
+            self.results_descending = not self.results_descending
+        else:
+            self.results_sort, self.results_descending = column, False
+        self.results_view.mark_sorted(self.results_sort, self.results_descending)
+        self.query_results()
+        
+    def result_row_values(self, row):
+        """Cells of one finding, computed only while it is visible"""
+        table = self.run_smells
+        start, end = table.start_lines[row], table.end_lines[row]
+        return (table.severity(row), table.smell_type(row), self.display_name(table.file_path(row)),
+                str(start) if start == end else f"{start}-{end}", table.description(row))
+        
+    def update_results_page(self):
+        view = self.results_view
+        if len(view):
+            first = view.offset + 1
+            last = min(len(view), view.offset + view.height)
+            self.results_page_label.config(text=f"Rows {first}-{last} of {len(view)}")
+        else:
+            self.results_page_label.config(text="No findings shown")
+            
+    def show_source(self, row):
+        """Open the file of a finding with its lines highlighted, read from disk as it is now"""
+        table = self.run_smells
+        file_path = table.file_path(row)
+        start, end = table.start_lines[row], table.end_lines[row]
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                content = f.read()
+        except OSError as e:
+            messagebox.showerror("Open Error", f"Cannot read {file_path}:\n{e}")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title(f"{self.display_name(file_path)}:{start}-{end}")
+        window.geometry("900x600")
+        ttk.Label(window, text=f"[{table.severity(row)}] {table.smell_type(row)}: {table.description(row)}",
+                  padding="5", wraplength=880).pack(fill=tk.X)
+        source_text = scrolledtext.ScrolledText(window, wrap=tk.NONE, font=('Consolas', 10))
+        source_text.pack(fill=tk.BOTH, expand=True)
+        source_text.insert(1.0, content)
+        source_text.tag_configure('finding', background='#fff2a8')
+        source_text.tag_add('finding', f"{start}.0", f"{end}.end")
+        # A few lines of context above the finding
+        source_text.yview(f"{max(1, start - 5)}.0")
+        source_text.config(state=tk.DISABLED)
+        
+    def report_text(self):
+        """Report of the last run in the selected output format, built on first use"""
+        output_format = self.output_format.get()
+        if self.results_report is None or self.results_report[0] != output_format:
+            self.detector.config['output']['format'] = output_format
+            self.results_report = (output_format, self.detector.generate_report(self.run_smells))
+        return self.results_report[1]
+        
     def save_report(self):
         """Save current analysis report"""
-        if not hasattr(self, 'results_text') or not self.results_text.get(1.0, tk.END).strip():
+        if self.run_smells is None:
             messagebox.showwarning("No Results", "No analysis results to save.")
             return
             
@@ -572,7 +986,7 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
         if filename:
             try:
                 with open(filename, 'w') as f:
-                    f.write(self.results_text.get(1.0, tk.END))
+                    f.write(self.report_text())
                 self.update_status(f"Report saved: {os.path.basename(filename)}")
                 messagebox.showinfo("Success", "Report saved successfully!")
             except Exception as e:
@@ -580,12 +994,12 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
                 
     def copy_to_clipboard(self):
         """Copy results to clipboard"""
-        if not hasattr(self, 'results_text') or not self.results_text.get(1.0, tk.END).strip():
+        if self.run_smells is None:
             messagebox.showwarning("No Results", "No analysis results to copy.")
             return
             
         self.root.clipboard_clear()
-        self.root.clipboard_append(self.results_text.get(1.0, tk.END))
+        self.root.clipboard_append(self.report_text())
         self.update_status("Results copied to clipboard")
         
     def load_config_file(self):
@@ -626,7 +1040,10 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
         """Reset configuration to default"""
         if messagebox.askyesno("Reset Configuration", "Reset configuration to default values?"):
             try:
+                self.detector.close_workers()
                 self.detector = CodeSmellDetector()  # Reload with default config
+                self.detector.keep_workers = True
+                self.run_results = None
                 self.load_current_config()
                 self.update_status("Configuration reset to default")
             except Exception as e:
@@ -642,9 +1059,24 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
             if not isinstance(new_config, dict):
                 raise ValueError("Configuration must be a valid YAML dictionary")
                 
+            # New thresholds alone are applied to the last run's measurements at once
+            running = self.cancel_event is not None and not self.cancel_event.is_set()
+            if (self.run_results is not None and not running
+                    and self.detector.update_thresholds(new_config, (result[0] for result in self.run_results))):
+                started = time.perf_counter()
+                self.rejudge_results()
+                elapsed = time.perf_counter() - started
+                self.update_status(f"Thresholds applied to the last analysis: {len(self.run_smells)} smells "
+                                   f"({elapsed * 1000:.0f} ms, no files re-analyzed)")
+                messagebox.showinfo("Success", "Configuration changes applied successfully!\n"
+                                    "The results were updated for the new thresholds.")
+                return
+            
             # Apply new configuration
             self.detector.config = new_config
-            self.detector._initialize_detectors()
+            self.detector.detectors = self.detector._initialize_detectors()
+            # The last run's measurements no longer match the settings
+            self.run_results = None
             
             self.update_status("Configuration applied successfully")
             messagebox.showinfo("Success", "Configuration changes applied successfully!")
@@ -656,7 +1088,9 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
             
     def clear_results(self):
         """Clear analysis results"""
-        self.results_text.delete(1.0, tk.END)
+        self.cancel_analysis()
+        self.run_smells = None
+        self.reset_results()
         self.results_info_label.config(text="No analysis performed yet")
         self.update_status("Results cleared")
         
@@ -667,6 +1101,15 @@ refer to "Refactoring: Improving the Design of Existing Code" by Martin Fowler.
     def copy_results(self):
         """Copy results to clipboard"""
         self.copy_to_clipboard()  # Reuse copy functionality
+        
+    def on_close(self):
+        """Stop any running analysis and the worker processes, then close the window"""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        self.stop_discovery()
+        if self.detector:
+            self.detector.close_workers()
+        self.root.destroy()
 
 
 def main():
@@ -1,18 +1,51 @@
-from abc import ABC, abstractmethod
-from typing import List, Dict, Any
 import re
+from abc import ABC, abstractmethod
+from sys import intern
+from typing import List, Dict, Any, Optional, Tuple
+
+from .source_model import SourceModel, MethodSpan, ClassSpan, ALL_ANALYSES
+from .token_rules import TokenScanner
+
+PERCENTILE_RE = re.compile(r'[pP](\d+(?:\.\d+)?)')
+
+
+def percentile_threshold(value: Any) -> Optional[float]:
+    """The percent of a percentile threshold such as 'p95', or None"""
+    if isinstance(value, str):
+        match = PERCENTILE_RE.fullmatch(value.strip())
+        if match and float(match.group(1)) <= 100:
+            return float(match.group(1))
+    return None
 
 class CodeSmell:
-    """Represents a detected code smell"""
+    """Represents a detected code smell
+
+    Attributes are slotted, and the strings shared by many findings (type,
+    file, severity, suggestion, description template) are interned. When
+    description_args are given, description is a str.format template that
+    is only filled in when the description is read.
+    """
+    
+    __slots__ = ('smell_type', 'file_path', 'start_line', 'end_line',
+                 'template', 'description_args', 'severity', 'suggestion')
+    
     def __init__(self, smell_type: str, file_path: str, start_line: int, end_line: int, 
-                 description: str, severity: str = "Medium", suggestion: str = ""):
-        self.smell_type = smell_type
-        self.file_path = file_path
+                 description: str, severity: str = "Medium", suggestion: str = "",
+                 description_args: Tuple = ()):
+        self.smell_type = intern(smell_type)
+        self.file_path = intern(file_path)
         self.start_line = start_line
         self.end_line = end_line
-        self.description = description
-        self.severity = severity
-        self.suggestion = suggestion
+        self.template = intern(description) if description_args else description
+        self.description_args = tuple(description_args)
+        self.severity = intern(severity)
+        self.suggestion = intern(suggestion)
+    
+    @property
+    def description(self) -> str:
+        if self.description_args:
+            return self.template.format(*self.description_args)
+        return self.template
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -24,19 +57,110 @@ class CodeSmell:
             "severity": self.severity,
             "suggestion": self.suggestion
         }
+    
+    def to_tuple(self) -> Tuple:
+        """Compact picklable form without the file path (see from_tuple)"""
+        return (self.smell_type, self.start_line, self.end_line,
+                self.template, self.description_args, self.severity, self.suggestion)
+    
+    @classmethod
+    def from_tuple(cls, file_path: str, values: Tuple) -> 'CodeSmell':
+        """Rebuild a smell of file_path from its to_tuple() form"""
+        smell_type, start_line, end_line, template, description_args, severity, suggestion = values
+        return cls(smell_type, file_path, start_line, end_line, template, severity, suggestion,
+                   description_args)
 
 class BaseDetector(ABC):
     """Abstract base class for code smell detectors"""
     
+    # Bump whenever a detector reports different results for the same input,
+    # so that cached results from older versions are not reused
+    version = 1
+    
+    # Analyses of the SourceModel that analyze() uses (see source_model);
+    # the engine computes only those some active detector asks for
+    requires = ALL_ANALYSES
+    # TokenRules whose matches analyze() reads through model.token_sites();
+    # the engine finds the matches of all active detectors in a single pass
+    token_rules = ()
+    # True if the findings inside a method depend on the lines it spans alone
+    # and analyze() reports them in source order: the engine may then leave
+    # the bodies of unchanged methods out of the model and reuse their cached
+    # findings (see result_cache.MethodResults)
+    method_scoped = False
+    # Config keys that only judge() reads. Detectors that have them split
+    # analyze() into measure(), which reads the model, and judge(), which
+    # compares the measurements with the thresholds, so the engine can keep
+    # measurements and apply new thresholds without parsing files again
+    thresholds: Tuple[str, ...] = ()
+    # Thresholds that may also be a percentile of the project ("p95"), mapped
+    # to the MetricsStore (table, column) the percentile is taken over
+    percentile_metrics: Dict[str, Tuple[str, str]] = {}
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.enabled = config.get('enabled', True)
+        # Values of the percentile thresholds, set by resolve_percentiles
+        self.resolved_thresholds: Dict[str, float] = {}
+        for key in self.thresholds:
+            value = config.get(key)
+            if not isinstance(value, str):
+                continue
+            if key not in self.percentile_metrics:
+                raise ValueError(f"{self.smell_type}.{key}: percentile thresholds are not supported")
+            if percentile_threshold(value) is None:
+                raise ValueError(f"{self.smell_type}.{key}: expected a number or a percentile "
+                                 f"such as 'p95', got {value!r}")
     
-    @abstractmethod
     def detect(self, file_path: str, content: str) -> List[CodeSmell]:
         """Detect code smells in the given file content"""
+        return self.analyze(SourceModel(file_path, content, self.requires, TokenScanner(self.token_rules)))
+    
+    @abstractmethod
+    def analyze(self, model: SourceModel) -> List[CodeSmell]:
+        """Detect code smells using the shared structural model of a file"""
         pass
     
+    def measure(self, model: SourceModel) -> Any:
+        """Raw numbers of a file that judge() compares with the thresholds"""
+        raise NotImplementedError
+    
+    def judge(self, file_path: str, measurements: Any) -> List[CodeSmell]:
+        """Findings of a file from its measurements under the current thresholds"""
+        raise NotImplementedError
+    
+    def percentiles(self) -> Dict[str, float]:
+        """Thresholds configured as percentiles: config key -> percent"""
+        percentiles = {}
+        for key in self.thresholds:
+            percent = percentile_threshold(self.config.get(key))
+            if percent is not None:
+                percentiles[key] = percent
+        return percentiles
+    
+    def resolve_percentiles(self, store) -> Dict[str, float]:
+        """Set the percentile thresholds to their values over a project's MetricsStore"""
+        self.resolved_thresholds = {key: store.percentile(*self.percentile_metrics[key], percent)
+                                    for key, percent in self.percentiles().items()}
+        return self.resolved_thresholds
+    
+    def threshold_value(self, key: str, default: Any) -> Any:
+        """Value of a threshold, percentiles as set by resolve_percentiles"""
+        value = self.config.get(key, default)
+        if not isinstance(value, str):
+            return value
+        if key not in self.resolved_thresholds:
+            raise ValueError(f"{self.smell_type}.{key} is a percentile of the project; "
+                             f"it has to be resolved over the project's metrics first")
+        return self.resolved_thresholds[key]
+    
+    def shown_threshold(self, key: str, value: Any) -> Any:
+        """A threshold as descriptions show it: percentiles also name the percentile"""
+        configured = self.config.get(key)
+        if isinstance(configured, str):
+            return f"{value:g} ({configured.strip().lower()})"
+        return value
+    
     @property
     @abstractmethod
     def smell_type(self) -> str:
@@ -46,109 +170,19 @@ class BaseDetector(ABC):
     def is_enabled(self) -> bool:
         return self.enabled
     
+    def moved(self, smell: CodeSmell, lines: int) -> CodeSmell:
+        """A finding as it is reported for the same code moved down by lines"""
+        return CodeSmell(smell.smell_type, smell.file_path, smell.start_line + lines, smell.end_line + lines,
+                         smell.template, smell.severity, smell.suggestion, smell.description_args)
+    
     def _count_lines(self, text: str) -> int:
         """Count non-empty lines in text"""
         return len([line for line in text.split('\n') if line.strip()])
     
-    def _extract_methods(self, content: str) -> List[Dict[str, Any]]:
+    def _extract_methods(self, content: str) -> List[MethodSpan]:
         """Extract method information from Java code"""
-        methods = []
-        lines = content.split('\n')
-        
-        # Improved regex for Java method declarations
-        method_pattern = r'^\s*(public|private|protected)?\s*(static)?\s*(final)?\s*\w+\s+(\w+)\s*\([^)]*\)\s*\{?'
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            if re.search(method_pattern, line):
-                method_match = re.search(method_pattern, line)
-                if method_match:
-                    method_name = method_match.group(4)
-                    start_line = i + 1
-                    
-                    # Find method end by counting braces
-                    brace_count = line.count('{') - line.count('}')
-                    j = i + 1
-                    method_lines = [line]
-                    
-                    while j < len(lines) and brace_count > 0:
-                        current_line = lines[j]
-                        method_lines.append(current_line)
-                        brace_count += current_line.count('{') - current_line.count('}')
-                        j += 1
-                    
-                    end_line = j
-                    method_content = '\n'.join(method_lines)
-                    
-                    # Count parameters
-                    param_match = re.search(r'\(([^)]*)\)', line)
-                    param_count = 0
-                    if param_match and param_match.group(1).strip():
-                        params = param_match.group(1).split(',')
-                        param_count = len([p for p in params if p.strip()])
-                    
-                    methods.append({
-                        'name': method_name,
-                        'start_line': start_line,
-                        'end_line': end_line,
-                        'content': method_content,
-                        'line_count': self._count_lines(method_content),
-                        'parameter_count': param_count
-                    })
-                    
-                    i = j
-                else:
-                    i += 1
-            else:
-                i += 1
-        
-        return methods
-    
-    def _extract_classes(self, content: str) -> List[Dict[str, Any]]:
+        return SourceModel('', content).methods
+    
+    def _extract_classes(self, content: str) -> List[ClassSpan]:
         """Extract class information from Java code"""
-        classes = []
-        lines = content.split('\n')
-        
-        class_pattern = r'^\s*(public|private|protected)?\s*class\s+(\w+)'
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            class_match = re.search(class_pattern, line)
-            if class_match:
-                class_name = class_match.group(2)
-                start_line = i + 1
-                
-                # Find class end by counting braces
-                brace_count = line.count('{') - line.count('}')
-                j = i + 1
-                class_lines = [line]
-                
-                while j < len(lines) and brace_count > 0:
-                    current_line = lines[j]
-                    class_lines.append(current_line)
-                    brace_count += current_line.count('{') - current_line.count('}')
-                    j += 1
-                
-                end_line = j
-                class_content = '\n'.join(class_lines)
-                
-                # Count methods in class
-                methods = self._extract_methods(class_content)
-                
-                classes.append({
-                    'name': class_name,
-                    'start_line': start_line,
-                    'end_line': end_line,
-                    'content': class_content,
-                    'line_count': self._count_lines(class_content),
-                    'method_count': len(methods),
-                    'methods': methods
-                })
-                
-                i = j
-            else:
-                i += 1
-        
-        return classes
\ No newline at end of file
+        return SourceModel('', content).classes
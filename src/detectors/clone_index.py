@@ -0,0 +1,98 @@
+from typing import List, Dict, Tuple
+from array import array
+
+from .base_detector import CodeSmell
+from .fingerprints import window_hashes, winnow
+
+
+class CloneIndex:
+    """Project-wide fingerprint index for cross-file duplicate detection
+
+    Files contribute the hashes of their normalized code lines as they are
+    analyzed. Only hashes and line positions are kept (in compact arrays),
+    never file content; the shared lookup index holds just the winnowed
+    subset of block fingerprints. Once every file has been added,
+    find_clones() reports blocks shared between different files.
+    """
+
+    # Fingerprints found in more places than this are treated as boilerplate
+    MAX_OCCURRENCES = 50
+
+    def __init__(self, min_lines: int = 3, winnow_window: int = 4):
+        self.min_lines = max(1, min_lines)
+        self.winnow_window = winnow_window
+        self.files: List[str] = []
+        self._windows: List[array] = []       # per file: hash of every block of min_lines lines
+        self._line_numbers: List[array] = []  # per file: source line of every hashed line
+        self._index: Dict[int, List[Tuple[int, int]]] = {}
+
+    def add(self, file_path: str, line_hashes: List[int], line_numbers: List[int]):
+        """Register one file by the hashes and source line numbers of its code lines"""
+        file_id = len(self.files)
+        windows = window_hashes(line_hashes, self.min_lines)
+        self.files.append(file_path)
+        self._windows.append(array('q', windows))
+        self._line_numbers.append(array('i', line_numbers))
+
+        index = self._index
+        for window in winnow(windows, self.winnow_window):
+            index.setdefault(windows[window], []).append((file_id, window))
+
+    def find_clones(self) -> List[CodeSmell]:
+        """Report every block that also occurs in another file, once per file pair"""
+        # Window ranges already reported, per file pair and diagonal
+        reported: Dict[Tuple[int, int, int], List[Tuple[int, int]]] = {}
+        clones = []
+
+        for entries in self._index.values():
+            if len(entries) < 2 or len(entries) > self.MAX_OCCURRENCES:
+                continue
+            # Entries are in file order, so file_a <= file_b below
+            for a in range(len(entries)):
+                file_a, window_a = entries[a]
+                for b in range(a + 1, len(entries)):
+                    file_b, window_b = entries[b]
+                    if file_a == file_b:
+                        continue
+                    key = (file_a, file_b, window_a - window_b)
+                    ranges = reported.setdefault(key, [])
+                    if any(start <= window_a <= end for start, end in ranges):
+                        continue
+                    start, end = self._extend(file_a, window_a, file_b, window_b)
+                    ranges.append((start, end))
+                    clones.append((file_a, start, file_b, start - key[2], end - start))
+
+        smells = []
+        for file_a, window_a, file_b, window_b, length in sorted(clones):
+            start_a, end_a = self._line_range(file_a, window_a, length)
+            start_b, end_b = self._line_range(file_b, window_b, length)
+            smells.append(CodeSmell(
+                smell_type="DuplicatedCode",
+                file_path=self.files[file_a],
+                start_line=start_a,
+                end_line=end_a,
+                description="Duplicated code block found (lines {}-{} similar to {} lines {}-{})",
+                description_args=(start_a, end_a, self.files[file_b], start_b, end_b),
+                severity="Medium",
+                suggestion="Extract this duplicated code into a shared reusable method"
+            ))
+        return smells
+
+    def _extend(self, file_a: int, window_a: int, file_b: int, window_b: int) -> Tuple[int, int]:
+        """Grow a matching window pair in both directions; returns the window range in file_a"""
+        windows_a = self._windows[file_a]
+        windows_b = self._windows[file_b]
+        before = 0
+        while (window_a - before > 0 and window_b - before > 0
+               and windows_a[window_a - before - 1] == windows_b[window_b - before - 1]):
+            before += 1
+        after = 0
+        while (window_a + after + 1 < len(windows_a) and window_b + after + 1 < len(windows_b)
+               and windows_a[window_a + after + 1] == windows_b[window_b + after + 1]):
+            after += 1
+        return window_a - before, window_a + after
+
+    def _line_range(self, file_id: int, window: int, length: int) -> Tuple[int, int]:
+        """Source lines covered by windows [window, window + length] of a file"""
+        line_numbers = self._line_numbers[file_id]
+        return line_numbers[window], line_numbers[window + length + self.min_lines - 1]
@@ -1,41 +1,60 @@
-from typing import List, Set, Tuple
-import re
+from typing import Iterator, List, Dict, Optional, Set, Tuple
+from bisect import bisect_left
+import heapq
+from collections import Counter
 from difflib import SequenceMatcher
 from .base_detector import BaseDetector, CodeSmell
+from .fingerprints import line_hash
+from .java_lexer import OPERATOR
+from .source_model import SourceModel, NORMALIZED_LINES, CLASS_SUMMARIES, METHOD_BODIES
+from .symbol_index import FileSymbols, SymbolIndex, NAME, MEMBER, NAME_MEMBER
+from .token_rules import TokenRule
 
 class DuplicatedCodeDetector(BaseDetector):
     """Detects duplicated code blocks"""
     
+    # Upper bound on similarity checks per block, so that very common
+    # fingerprints (e.g. runs of closing braces) cannot make the search quadratic
+    MAX_CANDIDATES = 32
+    # Of these, the most checked against windows whose shapes differ in a line:
+    # common pairs of line shapes fill their buckets with unrelated code
+    MAX_NEIGHBOURS = 8
+    
+    version = 3
+    requires = (NORMALIZED_LINES,)
+    # Analyses used by fingerprint()
+    fingerprint_requires = (NORMALIZED_LINES,)
+    
     @property
     def smell_type(self) -> str:
         return "DuplicatedCode"
     
-    def detect(self, file_path: str, content: str) -> List[CodeSmell]:
+    def analyze(self, model: SourceModel) -> List[CodeSmell]:
         smells = []
         min_lines = self.config.get('min_duplicate_lines', 3)
         similarity_threshold = self.config.get('similarity_threshold', 0.8)
         
-        lines = content.split('\n')
-        # Remove empty lines and comments for comparison
+        # Compare code only: blank and comment-only lines are dropped, trailing comments removed
         code_lines = []
         line_mapping = []
         
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            if stripped and not stripped.startswith('//') and not stripped.startswith('/*') and not stripped.startswith('*'):
-                code_lines.append(stripped)
-                line_mapping.append(i + 1)  # 1-based line numbers
+        for line_num, text in model.code_lines:
+            code_lines.append(text)
+            line_mapping.append(line_num)  # 1-based line numbers
         
         # Find duplicated blocks
-        duplicates = self._find_duplicates(code_lines, line_mapping, min_lines, similarity_threshold)
+        duplicates = self._find_duplicates(code_lines, model.code_line_shapes, line_mapping,
+                                           min_lines, similarity_threshold)
         
         for duplicate in duplicates:
             smell = CodeSmell(
                 smell_type=self.smell_type,
-                file_path=file_path,
+                file_path=model.file_path,
                 start_line=duplicate['start_line'],
                 end_line=duplicate['end_line'],
-                description=f"Duplicated code block found (lines {duplicate['start_line']}-{duplicate['end_line']} similar to lines {duplicate['similar_start']}-{duplicate['similar_end']})",
+                description="Duplicated code block found (lines {}-{} similar to lines {}-{})",
+                description_args=(duplicate['start_line'], duplicate['end_line'],
+                                  duplicate['similar_start'], duplicate['similar_end']),
                 severity="Medium",
                 suggestion="Extract this duplicated code into a reusable method"
             )
@@ -43,114 +62,291 @@ class DuplicatedCodeDetector(BaseDetector):
         
         return smells
     
-    def _find_duplicates(self, lines: List[str], line_mapping: List[int], min_lines: int, threshold: float) -> List[dict]:
+    def fingerprint(self, model: SourceModel) -> Tuple[List[int], List[int]]:
+        """Line hashes and line numbers of the file's code, for cross-file detection (CloneIndex)
+
+        Lines are hashed on their exact code text (whitespace collapsed);
+        import/package lines and lines without any identifier or literal,
+        such as lone braces, are left out so they cannot form clones.
+        """
+        hashes = []
+        line_numbers = []
+        for line_num, text in model.code_lines:
+            if text.startswith(('import ', 'package ')) or not any(c.isalnum() for c in text):
+                continue
+            hashes.append(line_hash(' '.join(text.split())))
+            line_numbers.append(line_num)
+        return hashes, line_numbers
+    
+    def _find_duplicates(self, lines: List[str], shapes: List[str], line_mapping: List[int],
+                         min_lines: int, threshold: float) -> List[dict]:
+        """Find duplicated blocks of at least min_lines code lines
+
+        Every window of min_lines lines is bucketed in a hash index once per
+        line, under the shapes of its other lines: two windows share a bucket
+        when all but one of their lines have the same shape, so a single
+        rewritten line (e.g. a declaration vs an assignment) does not hide a
+        duplicate. Only windows sharing a bucket are compared with the
+        similarity check, nearest first and at most MAX_CANDIDATES per block
+        (MAX_NEIGHBOURS of them with a line of another shape); windows inside
+        a reported duplicate are dropped from their buckets, so the work per
+        block stays bounded.
+        """
         duplicates: List[dict] = []
         processed_blocks: Set[Tuple[str, ...]] = set()
-        covered: List[Tuple[int, int]] = []  # inclusive [s, e] in `lines`
+        n = len(lines)
+        if min_lines <= 0 or n < 2 * min_lines:
+            return duplicates
+        covered = [False] * n  # lines already reported as part of a duplicate
 
-        def overlaps(a: Tuple[int,int], b: Tuple[int,int]) -> bool:
-            return not (a[1] < b[0] or b[1] < a[0])
+        # Hash index: (left-out line, shapes of the other lines) -> window starts, ascending
+        shape_hashes = [line_hash(shape) for shape in shapes]
+        window_keys = []
+        index: Dict[Tuple[int, ...], List[int]] = {}
+        window_shapes = []  # shapes of each window, to tell its neighbours from its equals
+        for start in range(n - min_lines + 1):
+            window = shape_hashes[start:start + min_lines]
+            window_shapes.append(tuple(window))
+            keys = [(offset, *window[:offset], *window[offset + 1:]) for offset in range(min_lines)]
+            window_keys.append(keys)
+            for key in keys:
+                index.setdefault(key, []).append(start)
+        # Per bucket, the next position that may still hold an uncovered window
+        # (union-find with path halving); covered windows never become free again
+        skips = {key: list(range(len(bucket) + 1)) for key, bucket in index.items()}
+
+        def is_covered(start: int) -> bool:
+            return any(covered[start:start + min_lines])
+
+        def next_free(skip: List[int], position: int) -> int:
+            while skip[position] != position:
+                skip[position] = skip[skip[position]]
+                position = skip[position]
+            return position
+
+        def free_windows(key: Tuple[int, ...], first: int) -> Iterator[int]:
+            """Uncovered window starts at or after first in one bucket, ascending"""
+            bucket = index[key]
+            skip = skips[key]
+            position = next_free(skip, bisect_left(bucket, first))
+            while position < len(bucket):
+                start = bucket[position]
+                if is_covered(start):
+                    skip[position] = position + 1
+                else:
+                    yield start
+                position = next_free(skip, position + 1)
+
+        # Ratios are kept per pair of distinct line texts, so repeated lines and
+        # overlapping windows compute each of them once
+        text_ids: Dict[str, int] = {}
+        line_texts = [text_ids.setdefault(line, len(text_ids)) for line in lines]
+        texts = list(text_ids)
+        ratios: Dict[Tuple[int, int], float] = {}
+        # difflib analyses the second text of a pair once per matcher
+        matchers: Dict[int, SequenceMatcher] = {}
+        # A cheaper upper bound of each ratio (as difflib's quick_ratio), kept
+        # the same way, rules out most windows before any ratio is computed
+        bounds: Dict[Tuple[int, int], float] = {}
+        lengths = [len(text) for text in texts]
+        char_bits = self._char_multisets(texts)
+
+        def line_ratio(pair: Tuple[int, int]) -> float:
+            ratio = ratios.get(pair)
+            if ratio is None:
+                a, b = pair
+                if a == b:
+                    ratio = 1.0
+                else:
+                    matcher = matchers.get(b)
+                    if matcher is None:
+                        matcher = matchers[b] = SequenceMatcher(None, b=texts[b])
+                    matcher.set_seq1(texts[a])
+                    ratio = matcher.ratio()
+                ratios[pair] = ratio
+            return ratio
+
+        def line_bound(pair: Tuple[int, int]) -> float:
+            bound = bounds.get(pair)
+            if bound is None:
+                a, b = pair
+                shared = bin(char_bits[a] & char_bits[b]).count('1')
+                bound = bounds[pair] = 2.0 * shared / (lengths[a] + lengths[b])
+            return bound
+
+        def lines_match(a: int, b: int) -> bool:
+            """True if lines a and b are (nearly) identical"""
+            pair = (line_texts[a], line_texts[b])
+            return pair[0] == pair[1] or (line_bound(pair) >= 0.99 and line_ratio(pair) >= 0.99)
+
+        def window_similarity(i: int, j: int) -> float:
+            """Average line similarity of two windows; 0.0 as soon as threshold is out of reach
+
+            The bounds of the line ratios are replaced by the ratios one line
+            at a time, least similar line first.
+            """
+            # Bounds are only compared with some slack, so rounding cannot drop a borderline window
+            required = threshold * min_lines - 1e-9
+            pairs = list(zip(line_texts[i:i + min_lines], line_texts[j:j + min_lines]))
+            estimates = [line_bound(pair) for pair in pairs]
+            total = sum(estimates)
+            if total < required:
+                return 0.0
+            for offset in sorted(range(min_lines), key=estimates.__getitem__):
+                ratio = line_ratio(pairs[offset])
+                total += ratio - estimates[offset]
+                estimates[offset] = ratio
+                if total < required:
+                    return 0.0
+            return sum(estimates) / min_lines
 
-        n = len(lines)
         for i in range(n - min_lines + 1):
-            left_win = (i, i + min_lines - 1)
-            if any(overlaps(left_win, c) for c in covered):
+            keys = [key for key in window_keys[i] if len(index[key]) > 1]
+            if not keys or is_covered(i):
                 continue
 
-            block1 = lines[i:i + min_lines]
-            block1_key = tuple(block1)
+            block1_key = tuple(lines[i:i + min_lines])
             if block1_key in processed_blocks:
                 continue
 
-            j = i + min_lines
-            while j <= n - min_lines:
-                right_win = (j, j + min_lines - 1)
-                if any(overlaps(right_win, c) for c in covered):
-                    j += 1
+            # Candidates at or after i + min_lines (no overlap), nearest first;
+            # a window in several of i's buckets is checked once
+            checked = 0
+            neighbours = 0
+            shape = window_shapes[i]
+            previous = -1
+            for j in heapq.merge(*(free_windows(key, i + min_lines) for key in keys)):
+                if j == previous:
                     continue
-
-                block2 = lines[j:j + min_lines]
-                similarity = self._calculate_similarity(block1, block2)
-                if similarity >= threshold:
-                    # extend without crossing into j (no overlap)
-                    L = min_lines
-                    while (i + L) < j and (j + L) < n:
-                        if SequenceMatcher(None, lines[i + L], lines[j + L]).ratio() >= 0.99:
-                            L += 1
-                        else:
-                            break
-
-                    # clamp if minimal window touches j
-                    if (i + L - 1) >= j:
-                        L = j - i  # keep left strictly before right
-
-                    # -------- tighten start (NEW) ----------
-                    ti, tj, TL = i, j, L
-                    while TL > min_lines and SequenceMatcher(None, lines[ti], lines[tj]).ratio() < 0.99:
-                        ti += 1
-                        tj += 1
-                        TL -= 1
-                        if (ti + TL - 1) >= tj:
-                            break
-
-                    if TL < min_lines or (ti + TL - 1) >= tj:
-                        j += 1
+                previous = j
+                if checked >= self.MAX_CANDIDATES:
+                    break
+                checked += 1
+                if window_shapes[j] != shape:
+                    if neighbours >= self.MAX_NEIGHBOURS:
                         continue
-                    # --------------------------------------
-
-                    duplicates.append({
-                        'start_line': line_mapping[ti],
-                        'end_line': line_mapping[ti + TL - 1],
-                        'similar_start': line_mapping[tj],
-                        'similar_end': line_mapping[tj + TL - 1],
-                        'similarity': similarity
-                    })
-
-                    covered.append((ti, ti + TL - 1))
-                    covered.append((tj, tj + TL - 1))
-                    processed_blocks.add(block1_key)
-                    break  # move to next i
-                j += 1
+                    neighbours += 1
+
+                similarity = window_similarity(i, j)
+                if similarity < threshold:
+                    continue
+
+                # extend without crossing into j (no overlap)
+                L = min_lines
+                while (i + L) < j and (j + L) < n and lines_match(i + L, j + L):
+                    L += 1
+
+                # -------- tighten start ----------
+                ti, tj, TL = i, j, L
+                while TL > min_lines and not lines_match(ti, tj):
+                    ti += 1
+                    tj += 1
+                    TL -= 1
+                    if (ti + TL - 1) >= tj:
+                        break
+
+                if TL < min_lines or (ti + TL - 1) >= tj:
+                    continue
+                # --------------------------------------
+
+                duplicates.append({
+                    'start_line': line_mapping[ti],
+                    'end_line': line_mapping[ti + TL - 1],
+                    'similar_start': line_mapping[tj],
+                    'similar_end': line_mapping[tj + TL - 1],
+                    'similarity': similarity
+                })
+
+                covered[ti:ti + TL] = [True] * TL
+                covered[tj:tj + TL] = [True] * TL
+                processed_blocks.add(block1_key)
+                break  # move to next i
 
         return duplicates
 
-    
-    def _calculate_similarity(self, block1: List[str], block2: List[str]) -> float:
-        """Calculate similarity between two code blocks"""
-        if len(block1) != len(block2):
-            return 0.0
-        
-        total_similarity = 0.0
-        for line1, line2 in zip(block1, block2):
-            similarity = SequenceMatcher(None, line1, line2).ratio()
-            total_similarity += similarity
-        
-        return total_similarity / len(block1)
+    @staticmethod
+    def _char_multisets(texts: List[str]) -> List[int]:
+        """The characters of each text as a bit set, such that a & b holds a's and b's common characters
+
+        Every character has a field as wide as its highest count in any text,
+        and a text with n of them sets the lowest n bits of that field.
+        """
+        counts = [Counter(text) for text in texts]
+        widths: Dict[str, int] = {}
+        for count in counts:
+            for char, n in count.items():
+                if n > widths.get(char, 0):
+                    widths[char] = n
+        offsets = {}
+        position = 0
+        for char, width in widths.items():
+            offsets[char] = position
+            position += width
+        return [sum(((1 << n) - 1) << offsets[char] for char, n in count.items()) for count in counts]
 
 class FeatureEnvyDetector(BaseDetector):
-    """Detects methods that are more interested in other classes than their own"""
+    """Detects methods that are more interested in other classes than their own
+
+    A call counts as external when its receiver's declared type is another
+    class. Receivers are resolved through a SymbolIndex of the classes,
+    fields and imports of the analyzed files: analyze() resolves within one
+    file, while the engine summarizes every file with symbols() and reports
+    once the whole project is indexed.
+    """
+    
+    version = 3
+    requires = (CLASS_SUMMARIES, METHOD_BODIES)
+    # A method's calls (see symbols) depend on its own lines alone
+    method_scoped = True
+    thresholds = ('external_calls_threshold',)
+    
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        self.threshold = config.get('external_calls_threshold', 5)
+        # Member accesses ('.') and the tokens that end declared names, located
+        # by the engine's shared token scan
+        self.call_rule = TokenRule('FeatureEnvy', texts=((OPERATOR, '.'),))
+        self.declaration_rule = TokenRule('FeatureEnvy declarations',
+                                          texts=[(OPERATOR, text) for text in ('=', ';', ',', ':', ')')])
+        self.token_rules = (self.call_rule, self.declaration_rule)
     
     @property
     def smell_type(self) -> str:
         return "FeatureEnvy"
     
-    def detect(self, file_path: str, content: str) -> List[CodeSmell]:
+    def analyze(self, model: SourceModel) -> List[CodeSmell]:
+        return self.judge(model.file_path, self.measure(model))
+    
+    def measure(self, model: SourceModel) -> FileSymbols:
+        return self.symbols(model)
+    
+    def judge(self, file_path: str, measurements: FileSymbols) -> List[CodeSmell]:
+        index = SymbolIndex()
+        index.add(file_path, measurements)
+        return self.report(index)
+    
+    def symbols(self, model: SourceModel, known_calls: Optional[Dict[int, List[list]]] = None) -> FileSymbols:
+        """Declarations and member calls of one file, for a SymbolIndex (see FileSymbols.from_model)"""
+        return FileSymbols.from_model(model, model.token_sites(self.call_rule),
+                                      model.token_sites(self.declaration_rule), known_calls)
+    
+    def report(self, index: SymbolIndex) -> List[CodeSmell]:
+        """Findings for every file of an index, in file order"""
         smells = []
-        threshold = self.config.get('external_calls_threshold', 5)
+        threshold = self.threshold
         
-        classes = self._extract_classes(content)
-        
-        for cls in classes:
-            for method in cls['methods']:
-                external_calls = self._count_external_calls(method['content'], cls['name'])
+        for file_id, (file_path, symbols) in enumerate(zip(index.files, index.symbols)):
+            for type_index, name, start_line, end_line, calls in symbols.methods:
+                external_calls = self._count_external_calls(index, file_id, type_index, calls)
                 
                 if external_calls > threshold:
                     smell = CodeSmell(
                         smell_type=self.smell_type,
                         file_path=file_path,
-                        start_line=method['start_line'],
-                        end_line=method['end_line'],
-                        description=f"Method '{method['name']}' shows feature envy ({external_calls} external calls > {threshold})",
+                        start_line=start_line,
+                        end_line=end_line,
+                        description="Method '{}' shows feature envy ({} external calls > {})",
+                        description_args=(name, external_calls, threshold),
                         severity="Medium",
                         suggestion="Consider moving this method to the class it's most interested in, or refactor to reduce dependencies"
                     )
@@ -158,27 +354,34 @@ class FeatureEnvyDetector(BaseDetector):
         
         return smells
     
-    def _count_external_calls(self, method_content: str, current_class: str) -> int:
-        """Count calls to external classes/objects"""
+    def _count_external_calls(self, index: SymbolIndex, file_id: int, type_index: int,
+                              calls: List[list]) -> int:
+        """Count calls on receivers whose type is another class"""
         external_calls = 0
+        own = index.own_types(file_id, type_index)
         
-        # Patterns for method calls on external objects
-        patterns = [
-            r'(\w+)\.(\w+)\(',  # object.method()
-            r'(\w+)\.get(\w+)\(',  # object.getProperty()
-            r'(\w+)\.set(\w+)\(',  # object.setProperty()
-        ]
-        
-        lines = method_content.split('\n')
-        for line in lines:
-            for pattern in patterns:
-                matches = re.findall(pattern, line)
-                for match in matches:
-                    object_name = match[0]
-                    # Skip calls to 'this', 'super', or current class
-                    if object_name not in ['this', 'super', current_class.lower(), 'System']:
-                        # Skip local variables that are likely primitives
-                        if not re.match(r'^(i|j|k|count|index|temp|result)$', object_name):
-                            external_calls += 1
+        for kind, name, member, count in calls:
+            context = file_id
+            if kind == NAME:
+                # Not a local: a field of the class (maybe inherited), or a class for static calls
+                found = index.visible_field(own, name)
+                if found is not None:
+                    name, context = found
+                elif not name[:1].isupper():
+                    continue
+            elif kind == MEMBER or kind == NAME_MEMBER:
+                if kind == NAME_MEMBER:
+                    # owner.name(... on a field of the class (maybe inherited)
+                    found = index.visible_field(own, name)
+                    if found is None:
+                        continue
+                    name, context = found
+                owner = index.resolve(name, context)
+                found = index.field_type(owner, member) if owner is not None else None
+                if found is None:
+                    continue
+                name, context = found
+            if index.is_external(name, context, own):
+                external_calls += count
         
-        return external_calls
\ No newline at end of file
+        return external_calls
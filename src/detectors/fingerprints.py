@@ -0,0 +1,59 @@
+from typing import List
+import zlib
+
+# Rabin-Karp parameters: a Mersenne prime modulus keeps collisions negligible
+HASH_MODULUS = (1 << 61) - 1
+HASH_BASE = 1_000_003
+
+
+def line_hash(text: str) -> int:
+    """Stable hash of one normalized line (identical across processes and runs)"""
+    return zlib.crc32(text.encode('utf-8'))
+
+
+def window_hashes(hashes: List[int], k: int) -> List[int]:
+    """Rolling Rabin-Karp hash of every window of k consecutive line hashes
+
+    Entry i covers hashes[i:i + k]; runs in O(len(hashes)) regardless of k.
+    """
+    n = len(hashes)
+    if k <= 0 or n < k:
+        return []
+    mod = HASH_MODULUS
+    base = HASH_BASE
+    top = pow(base, k - 1, mod)
+
+    h = 0
+    for value in hashes[:k]:
+        h = (h * base + value) % mod
+    result = [h]
+    for i in range(k, n):
+        h = ((h - hashes[i - k] * top) * base + hashes[i]) % mod
+        result.append(h)
+    return result
+
+
+
+def winnow(hashes: List[int], w: int) -> List[int]:
+    """Indices of the fingerprints selected by winnowing with window size w
+
+    In every run of w consecutive hashes the rightmost minimum is kept, so
+    any shared run of at least w hashes yields a shared fingerprint while
+    only about 2/(w+1) of all hashes are stored.
+    """
+    n = len(hashes)
+    if n == 0:
+        return []
+    if w <= 1:
+        return list(range(n))
+    w = min(w, n)
+
+    selected: List[int] = []
+    for start in range(n - w + 1):
+        best = start
+        for i in range(start + 1, start + w):
+            if hashes[i] <= hashes[best]:
+                best = i
+        if not selected or selected[-1] != best:
+            selected.append(best)
+    return selected
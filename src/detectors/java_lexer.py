@@ -0,0 +1,127 @@
+from typing import Iterator, List, NamedTuple
+import re
+import sys
+
+# Token kinds
+IDENT = 'IDENT'
+KEYWORD = 'KEYWORD'
+NUMBER = 'NUMBER'
+STRING = 'STRING'
+CHAR = 'CHAR'
+OPERATOR = 'OP'
+COMMENT = 'COMMENT'
+
+JAVA_KEYWORDS = frozenset("""
+    abstract assert boolean break byte case catch char class const continue
+    default do double else enum extends final finally float for goto if
+    implements import instanceof int interface long native new package
+    private protected public return short static strictfp super switch
+    synchronized this throw throws transient try void volatile while
+    true false null
+""".split())
+
+
+class Token(NamedTuple):
+    """A single lexical token with its position in the source"""
+    kind: str
+    text: str
+    offset: int  # 0-based character offset into the source
+    line: int    # 1-based line of the first character
+    column: int  # 0-based column of the first character
+
+    @property
+    def end(self) -> int:
+        return self.offset + len(self.text)
+
+
+# One master pattern; alternatives are tried left to right at each position,
+# so the whole file is tokenized in a single linear scan.
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>[ \t\f\r]+)
+  | (?P<nl>\n)
+  | (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*.*?(?:\*/|\Z))
+  | (?P<text_block>\"\"\"(?:\\.|[^\\])*?(?:\"\"\"|\Z))
+  | (?P<string>"(?:\\.|[^"\\\n])*"?)
+  | (?P<char>'(?:\\.|[^'\\\n])*'?)
+  | (?P<number>
+        0[xX][0-9A-Fa-f_]*(?:\.[0-9A-Fa-f_]*)?(?:[pP][+\-]?\d+)?[lLfFdD]?
+      | 0[bB][01_]+[lL]?
+      | (?:\d[\d_]*(?:\.[\d_]*)?|\.\d[\d_]*)(?:[eE][+\-]?\d[\d_]*)?[fFdDlL]?
+    )
+  | (?P<ident>(?:[^\W\d]|\$)[\w$]*)
+  | (?P<op>>>>=|<<=|>>=|>>>|\.\.\.|->|::|\+\+|--|&&|\|\||[=!<>+\-*/%&|^]=|<<|>>|.)
+""", re.VERBOSE | re.DOTALL)
+
+_KIND_BY_GROUP = {
+    'line_comment': COMMENT,
+    'block_comment': COMMENT,
+    'text_block': STRING,
+    'string': STRING,
+    'char': CHAR,
+    'number': NUMBER,
+    'op': OPERATOR,
+}
+
+
+# Skims a brace block without producing tokens: strings, char literals and
+# comments are matched as in _TOKEN_RE, so braces inside them are never counted
+_BLOCK_RE = re.compile(r"""
+    [^{}"'/]+
+  | //[^\n]*
+  | /\*.*?(?:\*/|\Z)
+  | \"\"\"(?:\\.|[^\\])*?(?:\"\"\"|\Z)
+  | "(?:\\.|[^"\\\n])*"?
+  | '(?:\\.|[^'\\\n])*'?
+  | [{}/]
+""", re.VERBOSE | re.DOTALL)
+
+
+def tokenize(content: str) -> List[Token]:
+    """Split Java source into tokens (whitespace dropped, comments kept)"""
+    return list(iter_tokens(content))
+
+
+def iter_tokens(content: str, position: int = 0, line: int = 1, line_start: int = 0) -> Iterator[Token]:
+    """Tokens of content from position on, which lies on line (starting at offset line_start)"""
+    intern = sys.intern
+
+    for match in _TOKEN_RE.finditer(content, position):
+        group = match.lastgroup
+        if group == 'ws':
+            continue
+        offset = match.start()
+        if group == 'nl':
+            line += 1
+            line_start = offset + 1
+            continue
+
+        text = match.group()
+        if group == 'ident':
+            kind = KEYWORD if text in JAVA_KEYWORDS else IDENT
+            # Names repeat throughout a file; share one string per distinct name
+            text = intern(text)
+        else:
+            kind = _KIND_BY_GROUP[group]
+            if kind == OPERATOR or kind == NUMBER:
+                text = intern(text)
+        yield Token(kind, text, offset, line, offset - line_start)
+
+        # Comments and text blocks may span several lines
+        if kind in (COMMENT, STRING) and '\n' in text:
+            line += text.count('\n')
+            line_start = offset + text.rindex('\n') + 1
+
+
+def find_block_end(content: str, position: int) -> int:
+    """Offset of the '}' closing a block whose body starts at position; -1 if it is never closed"""
+    depth = 1
+    for match in _BLOCK_RE.finditer(content, position):
+        text = match.group()
+        if text == '{':
+            depth += 1
+        elif text == '}':
+            depth -= 1
+            if not depth:
+                return match.start()
+    return -1
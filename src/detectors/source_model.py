@@ -0,0 +1,602 @@
+from typing import List, Any, Callable, Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+from array import array
+
+from .java_lexer import (Token, tokenize, iter_tokens, find_block_end,
+                         IDENT, KEYWORD, OPERATOR, COMMENT, NUMBER, STRING, CHAR)
+from .token_rules import TokenRule, TokenScanner
+
+# Analyses a detector can declare that it needs (see BaseDetector.requires)
+TOKEN_STREAM = 'token_stream'          # code_tokens of the whole file
+SIGNATURES = 'signatures'              # methods: names, lines, parameter counts, extents
+METHOD_BODIES = 'method_bodies'        # token ranges of method bodies within code_tokens
+LINE_COUNTS = 'line_counts'            # non-empty line counts of methods and classes
+CLASS_SUMMARIES = 'class_summaries'    # outermost classes with their methods
+NORMALIZED_LINES = 'normalized_lines'  # code_lines and code_line_shapes
+# Analyses each analysis is derived from
+ANALYSIS_DEPENDENCIES = {
+    TOKEN_STREAM: (),
+    SIGNATURES: (),
+    METHOD_BODIES: (SIGNATURES, TOKEN_STREAM),
+    LINE_COUNTS: (),
+    CLASS_SUMMARIES: (SIGNATURES,),
+    NORMALIZED_LINES: (TOKEN_STREAM,),
+}
+ALL_ANALYSES = frozenset(ANALYSIS_DEPENDENCIES)
+
+
+def resolve_analyses(names: Iterable[str]) -> FrozenSet[str]:
+    """The given analyses plus everything they are derived from"""
+    resolved = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name in resolved:
+            continue
+        if name not in ANALYSIS_DEPENDENCIES:
+            raise ValueError(f"Unknown analysis: {name}")
+        resolved.add(name)
+        pending.extend(ANALYSIS_DEPENDENCIES[name])
+    return frozenset(resolved)
+
+# Keywords that open a class-like body
+CLASS_KEYWORDS = {'class', 'interface', 'enum'}
+# Tokens that may directly precede a method name (return type or modifier)
+MODIFIERS = {
+    'public', 'private', 'protected', 'static', 'final', 'abstract',
+    'synchronized', 'native', 'strictfp', 'default', 'void',
+    'boolean', 'byte', 'char', 'short', 'int', 'long', 'float', 'double'
+}
+STATEMENT_BOUNDARIES = {';', '{', '}'}
+# Placeholder for names and values in line shapes (a constant and a literal swap freely)
+SHAPE_BY_KIND = {IDENT: 'V', NUMBER: 'V', STRING: 'V', CHAR: 'V'}
+
+
+class MethodSpan:
+    """A method or constructor declaration, located by lines and code token indices
+
+    Only positions are stored; the source text is sliced from the model
+    when content is asked for, and line_count is computed on first use.
+    """
+
+    __slots__ = ('name', 'start_line', 'end_line', 'parameter_count',
+                 'first_token', 'body_token', 'last_token', '_model', '_line_count')
+
+    def __init__(self, model: 'SourceModel', name: str, start_line: int, end_line: int,
+                 parameter_count: int, first_token: int, body_token: int, last_token: int):
+        self._model = model
+        self.name = name
+        self.start_line = start_line  # line of the method name
+        self.end_line = end_line
+        self.parameter_count = parameter_count
+        self.first_token = first_token  # index of the name in code_tokens
+        self.body_token = body_token    # index of the '{' or ';' ending the signature
+        self.last_token = last_token    # index of the closing '}'
+        self._line_count: Optional[int] = None
+
+    @property
+    def content(self) -> str:
+        return self._model.line_text(self.start_line, self.end_line)
+
+    @property
+    def line_count(self) -> int:
+        """Non-empty lines from the name line to the closing brace"""
+        if self._line_count is None:
+            self._line_count = self._model.count_lines(self.start_line, self.end_line)
+        return self._line_count
+
+    def __getitem__(self, key: str) -> Any:
+        # Mapping-style access, as for the dicts methods used to be
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"MethodSpan({self.name!r}, lines {self.start_line}-{self.end_line})"
+
+
+class ClassSpan:
+    """A class, interface, enum or record declaration; see MethodSpan"""
+
+    __slots__ = ('name', 'kind', 'start_line', 'end_line', 'first_token', 'last_token',
+                 'outermost', 'methods', '_model', '_line_count')
+
+    def __init__(self, model: 'SourceModel', name: str, kind: str, start_line: int, end_line: int,
+                 first_token: int, last_token: int, outermost: bool):
+        self._model = model
+        self.name = name
+        self.kind = kind  # 'class', 'interface', 'enum' or 'record'
+        self.start_line = start_line
+        self.end_line = end_line
+        self.first_token = first_token
+        self.last_token = last_token
+        self.outermost = outermost
+        self.methods: List[MethodSpan] = []  # contained methods, nested types included
+        self._line_count: Optional[int] = None
+
+    @property
+    def content(self) -> str:
+        return self._model.line_text(self.start_line, self.end_line)
+
+    @property
+    def line_count(self) -> int:
+        if self._line_count is None:
+            self._line_count = self._model.count_lines(self.start_line, self.end_line)
+        return self._line_count
+
+    @property
+    def method_count(self) -> int:
+        return len(self.methods)
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"ClassSpan({self.name!r}, lines {self.start_line}-{self.end_line})"
+
+
+class _OutlineTokens:
+    """Code tokens of a file, lexed on demand, where a block can be skipped unlexed"""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.tokens: List[Token] = []
+        self._source = self._code_tokens(0, 1, 0)
+
+    def _code_tokens(self, position: int, line: int, line_start: int) -> Iterator[Token]:
+        return (t for t in iter_tokens(self.content, position, line, line_start) if t.kind != COMMENT)
+
+    def has(self, k: int) -> bool:
+        """True if there is a k-th token, lexing up to it if necessary"""
+        tokens = self.tokens
+        while len(tokens) <= k:
+            token = next(self._source, None)
+            if token is None:
+                return False
+            tokens.append(token)
+        return True
+
+    def block_end(self, i: int) -> Tuple[int, int]:
+        """(offset, line) of the '}' closing the block that tokens[i] opens; offset -1 if never closed"""
+        content = self.content
+        brace = self.tokens[i]
+        close = find_block_end(content, brace.end)
+        if close < 0:
+            return close, -1
+        return close, brace.line + content.count('\n', brace.offset, close)
+
+    def skip_block(self, i: int, end: Optional[Tuple[int, int]] = None):
+        """Continue right at the '}' closing the block that tokens[i] opens (end: its block_end)"""
+        close, line = end or self.block_end(i)
+        del self.tokens[i + 1:]
+        if close < 0:
+            self._source = iter(())
+            return
+        self._source = self._code_tokens(close, line, self.content.rfind('\n', 0, close) + 1)
+
+
+class SourceModel:
+    """Structural model of a single Java file, built once and shared by all detectors
+
+    The file is tokenized once by the Java lexer; every other part of the
+    model (methods, classes, code lines) is derived from that token stream
+    lazily the first time a detector asks for it and then reused, so a file
+    is scanned at most once no matter how many detectors are active.
+
+    analyses names what will be asked of the model (default: everything).
+    When the token stream is not among them, methods and classes come from
+    an outline scan that skips method bodies without tokenizing them; their
+    token indices then refer to that outline, not to code_tokens.
+
+    token_scanner holds the token rules of all active detectors; the first
+    token_sites() call runs it over code_tokens once for all of them.
+
+    skip_body makes the token stream partial: it is asked about every method
+    body (with the line of its closing brace) before the body is lexed, and
+    bodies it returns True for are left out of code_tokens, like in the
+    outline scan. They are listed in skipped_methods. skipped_lines gives
+    the (line, text, shape) code lines of a skipped method, which complete
+    code_lines; without it code_lines lacks the skipped bodies too.
+    """
+
+    def __init__(self, file_path: str, content: str, analyses: Optional[Iterable[str]] = None,
+                 token_scanner: Optional[TokenScanner] = None,
+                 skip_body: Optional[Callable[['MethodSpan', int], bool]] = None,
+                 skipped_lines: Optional[Callable[['MethodSpan'], List[Tuple[int, str, str]]]] = None):
+        self.file_path = file_path
+        self.content = content
+        self.analyses = ALL_ANALYSES if analyses is None else resolve_analyses(analyses)
+        self.token_scanner = token_scanner
+        self.skip_body = skip_body if TOKEN_STREAM in self.analyses else None
+        self.skipped_methods: List[MethodSpan] = []
+        self.skipped_lines = skipped_lines
+        self._token_sites: Dict[TokenRule, List[int]] = {}
+        self._lines: Optional[List[str]] = None
+        self._line_starts: Optional[array] = None
+        self._nonblank_prefix: Optional[array] = None
+        self._tokens: Optional[List[Token]] = None
+        self._code_tokens: Optional[List[Token]] = None
+        self._code_lines: Optional[List[Tuple[int, str]]] = None
+        self._code_line_shapes: Optional[List[str]] = None
+        self._methods: Optional[List[MethodSpan]] = None
+        self._classes: Optional[List[ClassSpan]] = None
+        self._types: Optional[List[ClassSpan]] = None
+
+    @property
+    def lines(self) -> List[str]:
+        """Raw source lines (without line terminators); prefer line_text, which copies less"""
+        if self._lines is None:
+            self._lines = self.content.split('\n')
+        return self._lines
+
+    @property
+    def line_starts(self) -> array:
+        """Offset of the first character of every line, plus a final entry past the end"""
+        if self._line_starts is None:
+            content = self.content
+            starts = array('i', [0])
+            find = content.find
+            position = find('\n')
+            while position != -1:
+                starts.append(position + 1)
+                position = find('\n', position + 1)
+            starts.append(len(content) + 1)
+            self._line_starts = starts
+        return self._line_starts
+
+    @property
+    def line_total(self) -> int:
+        """Number of lines in the file"""
+        return len(self.line_starts) - 1
+
+    def line_text(self, start_line: int, end_line: int) -> str:
+        """Lines start_line..end_line (1-based, inclusive), the first one stripped"""
+        starts = self.line_starts
+        end_line = min(end_line, self.line_total)
+        first = self.content[starts[start_line - 1]:starts[start_line] - 1].strip()
+        if end_line <= start_line:
+            return first
+        return first + '\n' + self.content[starts[start_line]:starts[end_line] - 1]
+
+    @property
+    def tokens(self) -> List[Token]:
+        """Full token stream of the file, comments included"""
+        if self._tokens is None:
+            self._tokens = tokenize(self.content)
+        return self._tokens
+
+    @property
+    def code_tokens(self) -> List[Token]:
+        """Token stream without comments"""
+        if self._code_tokens is None:
+            if self.skip_body is not None:
+                # The structure scan decides which bodies are lexed
+                self._scan_structure()
+            else:
+                self._code_tokens = [t for t in self.tokens if t.kind != COMMENT]
+        return self._code_tokens
+
+    def token_sites(self, rule: TokenRule) -> List[int]:
+        """Ascending indices into code_tokens of the tokens matched by rule"""
+        sites = self._token_sites.get(rule)
+        if sites is None:
+            scanner = self.token_scanner
+            if scanner is None or rule not in scanner:
+                scanner = TokenScanner([rule])
+            self._token_sites.update(scanner.scan(self.code_tokens))
+            sites = self._token_sites[rule]
+        return sites
+
+    def lex(self) -> int:
+        """Tokenize as far as the model's analyses need; the number of tokens produced
+
+        That is the whole code token stream, or just the outline of classes
+        and method signatures when no analysis needs the tokens themselves.
+        """
+        if TOKEN_STREAM in self.analyses:
+            return len(self.code_tokens)
+        if SIGNATURES in self.analyses:
+            return len(self.methods)
+        return 0
+
+    @property
+    def code_lines(self) -> List[Tuple[int, str]]:
+        """(line number, text) for every line holding code, with comments removed"""
+        if self._code_lines is None:
+            self._build_code_lines()
+        return self._code_lines
+
+    @property
+    def code_line_shapes(self) -> List[str]:
+        """Shape of each entry in code_lines: its tokens, with every name and value as 'V'
+
+        Lines that differ only in names and values share a shape.
+        """
+        if self._code_line_shapes is None:
+            self._build_code_lines()
+        return self._code_line_shapes
+
+    def _build_code_lines(self):
+        code_lines = []
+        shapes = []
+        content = self.content
+        first = last = None
+        shape = []
+        for token in self.code_tokens:
+            if first is None or token.line != first.line:
+                if first is not None:
+                    code_lines.append((first.line, content[first.offset:last.end]))
+                    shapes.append(' '.join(shape))
+                first = token
+                shape = []
+            last = token
+            shape.append(SHAPE_BY_KIND.get(token.kind, token.text))
+        if first is not None:
+            code_lines.append((first.line, content[first.offset:last.end]))
+            shapes.append(' '.join(shape))
+        if self.skipped_methods and self.skipped_lines is not None:
+            code_lines, shapes = self._complete_code_lines(code_lines, shapes)
+        self._code_lines = code_lines
+        self._code_line_shapes = shapes
+
+    def _complete_code_lines(self, code_lines: List[Tuple[int, str]],
+                             shapes: List[str]) -> Tuple[List[Tuple[int, str]], List[str]]:
+        """Code lines of the partial token stream with the lines of skipped methods put in from skipped_lines"""
+        merged_lines = []
+        merged_shapes = []
+        k = 0
+        for method in self.skipped_methods:
+            while k < len(code_lines) and code_lines[k][0] < method.start_line:
+                merged_lines.append(code_lines[k])
+                merged_shapes.append(shapes[k])
+                k += 1
+            # The partial lines of the method give way to its complete ones
+            while k < len(code_lines) and code_lines[k][0] <= method.end_line:
+                k += 1
+            for line, text, shape in self.skipped_lines(method):
+                merged_lines.append((line, text))
+                merged_shapes.append(shape)
+        merged_lines.extend(code_lines[k:])
+        merged_shapes.extend(shapes[k:])
+        return merged_lines, merged_shapes
+
+    def count_lines(self, start_line: int, end_line: int) -> int:
+        """Count non-empty lines in the inclusive 1-based range [start_line, end_line]"""
+        if self._nonblank_prefix is None:
+            content = self.content
+            starts = self.line_starts
+            prefix = array('i', [0])
+            total = 0
+            for line in range(len(starts) - 1):
+                text = content[starts[line]:starts[line + 1] - 1]
+                if text and not text.isspace():
+                    total += 1
+                prefix.append(total)
+            self._nonblank_prefix = prefix
+        end_line = min(end_line, self.line_total)
+        if end_line < start_line:
+            return 0
+        return self._nonblank_prefix[end_line] - self._nonblank_prefix[start_line - 1]
+
+    @property
+    def methods(self) -> List[MethodSpan]:
+        """All method and constructor declarations in the file, in source order"""
+        if self._methods is None:
+            self._scan_structure()
+        return self._methods
+
+    @property
+    def classes(self) -> List[ClassSpan]:
+        """Outermost class declarations, each with the methods it contains"""
+        if self._classes is None:
+            self._scan_structure()
+        return self._classes
+
+    @property
+    def types(self) -> List[ClassSpan]:
+        """Every class, interface, enum and record declaration, nested ones included, in source order
+
+        Only the outermost classes (see classes) have their methods attached.
+        """
+        if self._types is None:
+            self._scan_structure()
+        return self._types
+
+    def _scan_structure(self):
+        """Find classes and methods with one pass over the code tokens
+
+        Braces are matched on tokens, so braces inside strings, char literals
+        and comments never affect scope ends. Without the token stream among
+        the model's analyses, tokens are lexed on demand and every method
+        body is skimmed for its closing brace instead of being tokenized.
+        With skip_body, only the bodies it turns down are skimmed, and the
+        resulting partial stream becomes code_tokens.
+        """
+        skip_body = self.skip_body
+        if (TOKEN_STREAM in self.analyses and skip_body is None) or self._code_tokens is not None:
+            tokens = self.code_tokens
+            outline = None
+            more: Callable[[int], bool] = lambda k: False
+        else:
+            outline = _OutlineTokens(self.content)
+            tokens = outline.tokens
+            more = outline.has
+        methods: List[MethodSpan] = []
+        types: List[ClassSpan] = []
+        line_total = self.line_total
+
+        # Each open brace pushes a frame [kind, record, enum_constants_pending]
+        # where kind is 'class', 'method' or 'block'
+        stack: List[list] = []
+        method_depth = 0
+        type_depth = 0
+        pending_type: Optional[ClassSpan] = None
+        pending_method: Optional[MethodSpan] = None
+        # State of the current member declaration inside a class body
+        paren_depth = 0
+        seen_assign = False
+
+        i = 0
+        while i < len(tokens) or more(i):
+            token = tokens[i]
+            text = token.text
+            is_op = token.kind == OPERATOR
+
+            if is_op and text == '{':
+                if pending_method is not None:
+                    # Until its closing brace is seen, a body runs to the end of the file
+                    pending_method.end_line = line_total
+                    stack.append(['method', pending_method, False])
+                    method_depth += 1
+                    pending_method = None
+                    if skip_body is None:
+                        if outline is not None:
+                            outline.skip_block(i)
+                    elif outline is not None:
+                        end = outline.block_end(i)
+                        method = stack[-1][1]
+                        if end[0] >= 0 and skip_body(method, end[1]):
+                            outline.skip_block(i, end)
+                            self.skipped_methods.append(method)
+                elif pending_type is not None:
+                    stack.append(['class', pending_type, pending_type.kind == 'enum'])
+                    type_depth += 1
+                    pending_type = None
+                else:
+                    stack.append(['block', None, False])
+                paren_depth = 0
+                seen_assign = False
+            elif is_op and text == '}':
+                if stack:
+                    kind, record, _ = stack.pop()
+                    if kind == 'method':
+                        method_depth -= 1
+                    elif kind == 'class':
+                        type_depth -= 1
+                    if record is not None:
+                        record.end_line = token.line
+                        record.last_token = i
+                paren_depth = 0
+                seen_assign = False
+            elif method_depth == 0 and self._declares_type(tokens, i, more):
+                pending_type = ClassSpan(self, tokens[i + 1].text, text, token.line, line_total,
+                                         i, -1, type_depth == 0)
+                types.append(pending_type)
+                i += 2
+                continue
+            elif stack and stack[-1][0] == 'class':
+                if is_op and text == ';':
+                    # Enum constants end at the first member-level ';'
+                    stack[-1][2] = False
+                    paren_depth = 0
+                    seen_assign = False
+                elif is_op and text == '(':
+                    paren_depth += 1
+                elif is_op and text == ')':
+                    paren_depth -= 1
+                elif is_op and text == '=' and paren_depth == 0:
+                    seen_assign = True
+                elif (token.kind == IDENT and paren_depth == 0 and not seen_assign
+                      and not stack[-1][2] and (i + 1 < len(tokens) or more(i + 1))
+                      and tokens[i + 1].text == '(' and self._precedes_method_name(tokens[i - 1])):
+                    method = self._parse_method(tokens, i, more)
+                    if method is not None:
+                        methods.append(method)
+                        i = method.body_token
+                        if tokens[i].text == '{':
+                            pending_method = method
+                        else:
+                            # Abstract / interface method: the signature ends at ';'
+                            i += 1
+                        continue
+
+            i += 1
+
+        # Declarations left open at the end of the file run to its last token
+        for record in types:
+            if record.last_token < 0:
+                record.last_token = len(tokens) - 1
+        for record in methods:
+            if record.last_token < 0:
+                record.last_token = len(tokens) - 1
+        self._methods = methods
+        self._types = types
+        if outline is not None and skip_body is not None:
+            self._code_tokens = tokens
+        self._classes = self._finish_classes(types, methods)
+
+    @staticmethod
+    def _declares_type(tokens: List[Token], i: int, more: Callable[[int], bool]) -> bool:
+        """True if tokens[i] starts a class, interface, enum or record declaration"""
+        token = tokens[i]
+        if not (i + 1 < len(tokens) or more(i + 1)) or tokens[i + 1].kind != IDENT:
+            return False
+        if token.kind == KEYWORD:
+            # Foo.class literals are not declarations
+            return token.text in CLASS_KEYWORDS and not (i > 0 and tokens[i - 1].text == '.')
+        # 'record' is only a keyword in front of a record header
+        return (token.kind == IDENT and token.text == 'record'
+                and (i + 2 < len(tokens) or more(i + 2)) and tokens[i + 2].text in ('(', '<'))
+
+    @staticmethod
+    def _precedes_method_name(prev: Token) -> bool:
+        """True if prev can be the token right before a method or constructor name"""
+        if prev.kind == IDENT:
+            return True
+        if prev.kind == KEYWORD:
+            return prev.text in MODIFIERS
+        return prev.text in STATEMENT_BOUNDARIES or prev.text in ('>', '>>', '>>>', ']')
+
+    def _parse_method(self, tokens: List[Token], i: int, more: Callable[[int], bool]) -> Optional[MethodSpan]:
+        """Parse a method signature whose name is tokens[i]; None if it is not one"""
+        j = i + 2
+        depth = 1
+        angle = 0
+        param_count = 0
+        has_params = False
+        while depth and (j < len(tokens) or more(j)):
+            text = tokens[j].text
+            if text == '(':
+                depth += 1
+            elif text == ')':
+                depth -= 1
+            elif depth == 1:
+                if text == '<':
+                    angle += 1
+                elif text in ('>', '>>', '>>>'):
+                    angle = max(0, angle - len(text))
+                elif text == ',' and angle == 0:
+                    param_count += 1
+            if depth:
+                has_params = True
+            j += 1
+        if depth:
+            return None
+
+        # Optional throws clause
+        if (j < len(tokens) or more(j)) and tokens[j].text == 'throws':
+            j += 1
+            while ((j < len(tokens) or more(j))
+                   and (tokens[j].kind == IDENT or tokens[j].text in ('.', ',', '<', '>', '>>', '?'))):
+                j += 1
+        if not (j < len(tokens) or more(j)) or tokens[j].text not in ('{', ';'):
+            return None
+
+        # last_token stays -1 until the closing brace is found
+        return MethodSpan(self, tokens[i].text, tokens[i].line, tokens[j].line,
+                          param_count + 1 if has_params else 0, i, j, j if tokens[j].text == ';' else -1)
+
+    @staticmethod
+    def _finish_classes(types: List[ClassSpan], methods: List[MethodSpan]) -> List[ClassSpan]:
+        """Keep the outermost classes and attach the methods each one contains"""
+        classes = []
+        m = 0
+        for cls in types:
+            if cls.kind != 'class' or not cls.outermost:
+                continue
+
+            # Methods are in source order; take those inside this class (nested types included)
+            while m < len(methods) and methods[m].first_token < cls.first_token:
+                m += 1
+            while m < len(methods) and methods[m].first_token <= cls.last_token:
+                cls.methods.append(methods[m])
+                m += 1
+            classes.append(cls)
+        return classes
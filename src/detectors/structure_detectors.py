@@ -1,28 +1,41 @@
 from typing import List
 from .base_detector import BaseDetector, CodeSmell
+from .source_model import SourceModel, SIGNATURES, LINE_COUNTS, CLASS_SUMMARIES
 
 class LongMethodDetector(BaseDetector):
     """Detects methods that are too long"""
     
+    requires = (SIGNATURES, LINE_COUNTS)
+    thresholds = ('threshold_lines',)
+    percentile_metrics = {'threshold_lines': ('methods', 'line_count')}
+    
     @property
     def smell_type(self) -> str:
         return "LongMethod"
     
-    def detect(self, file_path: str, content: str) -> List[CodeSmell]:
+    def analyze(self, model: SourceModel) -> List[CodeSmell]:
+        return self.judge(model.file_path, self.measure(model))
+    
+    def measure(self, model: SourceModel) -> List[tuple]:
+        """(name, start line, end line, line count) of every method"""
+        return [(method.name, method.start_line, method.end_line, method.line_count)
+                for method in model.methods]
+    
+    def judge(self, file_path: str, measurements: List[tuple]) -> List[CodeSmell]:
         smells = []
-        threshold = self.config.get('threshold_lines', 30)
-        
-        methods = self._extract_methods(content)
+        threshold = self.threshold_value('threshold_lines', 30)
+        shown = self.shown_threshold('threshold_lines', threshold)
         
-        for method in methods:
-            if method['line_count'] > threshold:
+        for name, start_line, end_line, line_count in measurements:
+            if line_count > threshold:
                 smell = CodeSmell(
                     smell_type=self.smell_type,
                     file_path=file_path,
-                    start_line=method['start_line'],
-                    end_line=method['end_line'],
-                    description=f"Method '{method['name']}' is too long ({method['line_count']} lines, threshold: {threshold})",
-                    severity="High" if method['line_count'] > threshold * 2 else "Medium",
+                    start_line=start_line,
+                    end_line=end_line,
+                    description="Method '{}' is too long ({} lines, threshold: {})",
+                    description_args=(name, line_count, shown),
+                    severity="High" if line_count > threshold * 2 else "Medium",
                     suggestion="Consider breaking this method into smaller, more focused methods"
                 )
                 smells.append(smell)
@@ -32,33 +45,47 @@ class LongMethodDetector(BaseDetector):
 class GodClassDetector(BaseDetector):
     """Detects classes that have too many responsibilities (God/Blob classes)"""
     
+    requires = (CLASS_SUMMARIES, LINE_COUNTS)
+    thresholds = ('threshold_methods', 'threshold_lines')
+    percentile_metrics = {'threshold_methods': ('classes', 'method_count'),
+                          'threshold_lines': ('classes', 'line_count')}
+    
     @property
     def smell_type(self) -> str:
         return "GodClass"
     
-    def detect(self, file_path: str, content: str) -> List[CodeSmell]:
+    def analyze(self, model: SourceModel) -> List[CodeSmell]:
+        return self.judge(model.file_path, self.measure(model))
+    
+    def measure(self, model: SourceModel) -> List[tuple]:
+        """(name, start line, end line, method count, line count) of every class"""
+        return [(cls.name, cls.start_line, cls.end_line, cls.method_count, cls.line_count)
+                for cls in model.classes]
+    
+    def judge(self, file_path: str, measurements: List[tuple]) -> List[CodeSmell]:
         smells = []
-        method_threshold = self.config.get('threshold_methods', 15)
-        line_threshold = self.config.get('threshold_lines', 200)
-        
-        classes = self._extract_classes(content)
+        method_threshold = self.threshold_value('threshold_methods', 15)
+        line_threshold = self.threshold_value('threshold_lines', 200)
+        shown_methods = self.shown_threshold('threshold_methods', method_threshold)
+        shown_lines = self.shown_threshold('threshold_lines', line_threshold)
         
-        for cls in classes:
+        for name, start_line, end_line, method_count, line_count in measurements:
             violations = []
             
-            if cls['method_count'] > method_threshold:
-                violations.append(f"too many methods ({cls['method_count']} > {method_threshold})")
+            if method_count > method_threshold:
+                violations.append(f"too many methods ({method_count} > {shown_methods})")
             
-            if cls['line_count'] > line_threshold:
-                violations.append(f"too many lines ({cls['line_count']} > {line_threshold})")
+            if line_count > line_threshold:
+                violations.append(f"too many lines ({line_count} > {shown_lines})")
             
             if violations:
                 smell = CodeSmell(
                     smell_type=self.smell_type,
                     file_path=file_path,
-                    start_line=cls['start_line'],
-                    end_line=cls['end_line'],
-                    description=f"Class '{cls['name']}' is a God/Blob class: {', '.join(violations)}",
+                    start_line=start_line,
+                    end_line=end_line,
+                    description="Class '{}' is a God/Blob class: {}",
+                    description_args=(name, ', '.join(violations)),
                     severity="High",
                     suggestion="Consider breaking this class into multiple smaller, more focused classes"
                 )
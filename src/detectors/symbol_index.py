@@ -0,0 +1,364 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from .java_lexer import Token, IDENT, KEYWORD
+from .source_model import SourceModel, ClassSpan
+
+PRIMITIVE_TYPES = frozenset(('boolean', 'byte', 'char', 'short', 'int', 'long', 'float', 'double', 'void'))
+# Library types usable without an import (java.lang), or so common that a
+# file importing java.util.* or java.io.* is taken to mean them
+JDK_TYPES = frozenset("""
+    Object String StringBuilder StringBuffer CharSequence Math StrictMath System Runtime Thread
+    Integer Long Short Byte Double Float Character Boolean Number Void Enum Class Iterable
+    Exception RuntimeException Error Throwable IllegalArgumentException IllegalStateException
+    NullPointerException UnsupportedOperationException IndexOutOfBoundsException
+    List ArrayList LinkedList Map HashMap LinkedHashMap TreeMap Set HashSet LinkedHashSet TreeSet
+    Collection Collections Arrays Iterator Optional Objects Queue Deque ArrayDeque PriorityQueue
+    Stack Vector Random Scanner Date Calendar UUID Stream Collectors
+    LocalDate LocalDateTime LocalTime Instant Duration
+    File Files Path Paths InputStream OutputStream Reader Writer BufferedReader PrintStream
+""".split())
+# Packages whose types are never project classes
+JDK_PACKAGES = ('java.', 'javax.', 'jdk.', 'sun.')
+# Declared types that say nothing about the receiver ('var' is inferred)
+UNKNOWN_TYPES = frozenset(('var',))
+# Identifiers that can directly precede a name without declaring it
+NOT_TYPES = frozenset(('yield',))
+# Tokens allowed between the angle brackets of a type
+TYPE_ARGUMENT_TOKENS = frozenset((',', '.', '?', '&', '[', ']', '<', 'extends', 'super'))
+
+# Kinds of recorded member calls. Only locals (parameters included) are
+# resolved per method, so a method's calls depend on its own text alone
+TYPED = 'T'   # receiver is a local declared with type name
+NAME = 'N'    # receiver name is no local: a field (maybe inherited) or a class name
+MEMBER = 'M'  # receiver is field member of a local declared with type name
+NAME_MEMBER = 'NM'  # receiver is field member of name, which is no local
+
+
+class FileSymbols:
+    """What FeatureEnvy needs to know about one file: its types, their fields and its member calls
+
+    Types are kept as written in the source, so a summary depends on its
+    file alone and can be cached with the file's other results;
+    SymbolIndex resolves the names once every file of the run is known.
+    """
+
+    __slots__ = ('package', 'imports', 'types', 'methods')
+
+    def __init__(self, package: str, imports: List[str], types: List[list], methods: List[list]):
+        self.package = package
+        self.imports = imports
+        # [simple name, qualified name, superclass as written or None, enclosing type index or -1, {field: type}]
+        self.types = types
+        # [declaring type index, name, start line, end line, [[kind, name, member or None, count], ...]]
+        # (see the call kinds above)
+        self.methods = methods
+
+    def to_data(self) -> list:
+        """JSON-compatible form (see from_data)"""
+        return [self.package, self.imports, self.types, self.methods]
+
+    @classmethod
+    def from_data(cls, data: list) -> 'FileSymbols':
+        return cls(*data)
+
+    @classmethod
+    def from_model(cls, model: SourceModel, call_sites: List[int], declaration_sites: List[int],
+                   known_calls: Optional[Dict[int, List[list]]] = None) -> 'FileSymbols':
+        """Summarize the methods of the outermost classes of a file
+
+        call_sites are the indices of '.' tokens and declaration_sites those of
+        the tokens that can end a declared name ('=', ';', ',', ':', ')'),
+        both within code_tokens. known_calls gives the calls of methods that
+        are already known, by the index of their name token.
+        """
+        tokens = model.code_tokens
+        spans = model.types
+        package, imports = cls._header(tokens, spans[0].first_token if spans else len(tokens))
+
+        # Enclosing type of each type, from the nesting of their token ranges
+        types: List[list] = []
+        open_types: List[int] = []
+        for index, span in enumerate(spans):
+            while open_types and spans[open_types[-1]].last_token < span.first_token:
+                open_types.pop()
+            outer = open_types[-1] if open_types else -1
+            prefix = types[outer][1] if outer >= 0 else package
+            qualified = f"{prefix}.{span.name}" if prefix else span.name
+            types.append([span.name, qualified, cls._superclass(tokens, span), outer, {}])
+            open_types.append(index)
+        type_starts = [span.first_token for span in spans]
+
+        def declaring_type(position: int) -> int:
+            index = bisect_right(type_starts, position) - 1
+            while index >= 0 and spans[index].last_token < position:
+                index = types[index][3]
+            return index
+
+        # Declarations inside a method are its locals (parameters included), others are fields
+        methods = model.methods
+        method_starts = [method.first_token for method in methods]
+        locals_by_method: Dict[int, Dict[str, str]] = {}
+        for k in declaration_sites:
+            name_index = k - 1
+            if name_index < 1 or tokens[name_index].kind != IDENT:
+                continue
+            type_name = cls._declared_type(tokens, name_index - 1)
+            if type_name is None:
+                continue
+            name = tokens[name_index].text
+            m = bisect_right(method_starts, name_index) - 1
+            if m >= 0 and methods[m].last_token >= name_index:
+                locals_by_method.setdefault(m, {})[name] = type_name
+            else:
+                owner = declaring_type(name_index)
+                if owner >= 0:
+                    types[owner][4][name] = type_name
+
+        summaries = []
+        method_index = {id(method): m for m, method in enumerate(methods)}
+        for cls_span in model.classes:
+            for method in cls_span.methods:
+                type_index = declaring_type(method.first_token)
+                calls = known_calls.get(method.first_token) if known_calls else None
+                if calls is None:
+                    local_types = locals_by_method.get(method_index[id(method)], {})
+                    calls = cls._member_calls(tokens, call_sites, method, local_types)
+                summaries.append([type_index, method.name, method.start_line, method.end_line, calls])
+        return cls(package, imports, types, summaries)
+
+    @staticmethod
+    def _member_calls(tokens: List[Token], call_sites: List[int], method,
+                      local_types: Dict[str, str]) -> List[list]:
+        """Calls of the form receiver.name( in a method, counted per receiver"""
+        counts: Dict[Tuple[str, str, Optional[str]], int] = {}
+        first = bisect_left(call_sites, method.first_token + 1)
+        last = bisect_left(call_sites, method.last_token - 1)
+        for d in call_sites[first:last]:
+            receiver = tokens[d - 1]
+            if receiver.kind != IDENT or tokens[d + 2].text != '(':
+                continue
+            name = receiver.text
+            if tokens[d - 2].text == '.':
+                # owner.receiver.name( -- only simple owners can be resolved
+                owner = tokens[d - 3]
+                if owner.kind == KEYWORD and owner.text == 'this':
+                    key = (NAME, name, None)
+                elif owner.kind == IDENT and tokens[d - 4].text != '.':
+                    owner_type = local_types.get(owner.text)
+                    key = (MEMBER, owner_type, name) if owner_type else (NAME_MEMBER, owner.text, name)
+                else:
+                    continue
+            else:
+                declared = local_types.get(name)
+                key = (TYPED, declared, None) if declared else (NAME, name, None)
+            counts[key] = counts.get(key, 0) + 1
+        return [[kind, name, member, count] for (kind, name, member), count in counts.items()]
+
+    @staticmethod
+    def _declared_type(tokens: List[Token], t: int) -> Optional[str]:
+        """Base type name of a declaration whose type ends at tokens[t]; None if it is no declaration"""
+        if tokens[t].text == '...':
+            t -= 1
+        # Array brackets
+        while t >= 1 and tokens[t].text == ']' and tokens[t - 1].text == '[':
+            t -= 2
+        text = tokens[t].text
+        if text in ('>', '>>', '>>>'):
+            # Type arguments: walk back to the matching '<'
+            depth = len(text)
+            t -= 1
+            while t >= 0 and depth:
+                token = tokens[t]
+                if token.text in ('>', '>>', '>>>'):
+                    depth += len(token.text)
+                elif token.text == '<':
+                    depth -= 1
+                elif not (token.kind == IDENT or token.text in TYPE_ARGUMENT_TOKENS
+                          or token.text in PRIMITIVE_TYPES):
+                    return None
+                t -= 1
+            if depth or t < 0 or tokens[t].kind != IDENT:
+                return None
+            return tokens[t].text
+        token = tokens[t]
+        if token.kind == IDENT:
+            return None if text in NOT_TYPES else text
+        if token.kind == KEYWORD and text in PRIMITIVE_TYPES:
+            return text
+        return None
+
+    @staticmethod
+    def _header(tokens: List[Token], end: int) -> Tuple[str, List[str]]:
+        """Package name and type imports (static imports left out) before the first type"""
+        package = ''
+        imports = []
+        i = 0
+        while i < end:
+            token = tokens[i]
+            if token.kind == KEYWORD and token.text in ('package', 'import'):
+                j = i + 1
+                static = j < end and tokens[j].text == 'static'
+                parts = []
+                while j < end and tokens[j].text != ';':
+                    parts.append(tokens[j].text)
+                    j += 1
+                if token.text == 'package':
+                    package = ''.join(parts)
+                elif not static:
+                    imports.append(''.join(parts))
+                i = j
+            i += 1
+        return package, imports
+
+    @staticmethod
+    def _superclass(tokens: List[Token], span: ClassSpan) -> Optional[str]:
+        """Simple name of the class a class declaration extends, if any"""
+        if span.kind != 'class':
+            return None
+        angle = 0
+        i = span.first_token + 2
+        n = len(tokens)
+        while i < n:
+            text = tokens[i].text
+            if text == '{':
+                return None
+            if text == '<':
+                angle += 1
+            elif text in ('>', '>>', '>>>'):
+                angle -= len(text)
+            elif text == 'extends' and angle <= 0:
+                name = None
+                i += 1
+                while i < n and (tokens[i].kind == IDENT or tokens[i].text == '.'):
+                    if tokens[i].kind == IDENT:
+                        name = tokens[i].text
+                    i += 1
+                return name
+            i += 1
+        return None
+
+
+class SymbolIndex:
+    """Project-wide index of FileSymbols, for resolving FeatureEnvy receivers to types
+
+    Files are added as they are analyzed, and every lookup is a dictionary
+    hit. Type names resolve the way javac does in the common cases: types of
+    the same file, single-type imports, the file's own package and
+    on-demand imports, then a simple name that is unique in the project.
+    """
+
+    def __init__(self):
+        self.files: List[str] = []
+        self.symbols: List[FileSymbols] = []
+        self._types: Dict[str, Tuple[int, int]] = {}  # qualified name -> (file id, type index)
+        self._by_simple: Dict[str, List[str]] = {}
+        # Per file: (package, own types, single-type imports, on-demand import packages)
+        self._contexts: List[Tuple[str, Dict[str, str], Dict[str, str], List[str]]] = []
+        self._own: Dict[Tuple[int, int], Tuple[str, ...]] = {}
+
+    def add(self, file_path: str, symbols: FileSymbols) -> int:
+        """Register one file; returns its file id"""
+        file_id = len(self.files)
+        self.files.append(file_path)
+        self.symbols.append(symbols)
+        own_types = {}
+        for index, (simple, qualified, _, _, _) in enumerate(symbols.types):
+            self._types.setdefault(qualified, (file_id, index))
+            self._by_simple.setdefault(simple, []).append(qualified)
+            own_types.setdefault(simple, qualified)
+        single = {}
+        on_demand = []
+        for name in symbols.imports:
+            if name.endswith('.*'):
+                on_demand.append(name[:-2])
+            else:
+                single[name.rsplit('.', 1)[-1]] = name
+        self._contexts.append((symbols.package, own_types, single, on_demand))
+        return file_id
+
+    def resolve(self, name: str, file_id: int) -> Optional[str]:
+        """Qualified name of the project type that name means in a file; None if it is none"""
+        package, own_types, single, on_demand = self._contexts[file_id]
+        qualified = own_types.get(name)
+        if qualified is not None:
+            return qualified
+        qualified = single.get(name)
+        if qualified is not None:
+            return qualified if qualified in self._types else None
+        candidates = self._by_simple.get(name)
+        if candidates is None:
+            return None
+        qualified = f"{package}.{name}" if package else name
+        if qualified in self._types:
+            return qualified
+        for prefix in on_demand:
+            qualified = f"{prefix}.{name}"
+            if qualified in self._types:
+                return qualified
+        if len(candidates) == 1 and name not in JDK_TYPES:
+            return candidates[0]
+        return None
+
+    def is_library(self, name: str, file_id: int) -> bool:
+        """True if name means a primitive or JDK type in a file"""
+        if name in PRIMITIVE_TYPES or name in JDK_TYPES:
+            return True
+        imported = self._contexts[file_id][2].get(name)
+        return imported is not None and imported.startswith(JDK_PACKAGES)
+
+    def is_external(self, name: str, file_id: int, own: Tuple[str, ...]) -> bool:
+        """True if a receiver of type name (as written in a file) belongs to another class
+
+        Project types other than own count, and so do unknown types, as they
+        may be project classes outside this run; primitives and JDK types do not.
+        """
+        if name in UNKNOWN_TYPES:
+            return False
+        qualified = self.resolve(name, file_id)
+        if qualified is not None:
+            return qualified not in own
+        return not self.is_library(name, file_id)
+
+    def own_types(self, file_id: int, type_index: int) -> Tuple[str, ...]:
+        """A type and its project superclasses, then each enclosing type and its superclasses
+
+        This is the order in which Java looks up a field by its simple name.
+        """
+        key = (file_id, type_index)
+        own = self._own.get(key)
+        if own is None:
+            found: List[str] = []
+            types = self.symbols[file_id].types
+            while type_index >= 0:
+                qualified = types[type_index][1]
+                while qualified is not None and qualified not in found:
+                    found.append(qualified)
+                    declaring_file, index = self._types[qualified]
+                    superclass = self.symbols[declaring_file].types[index][2]
+                    qualified = self.resolve(superclass, declaring_file) if superclass else None
+                type_index = types[type_index][3]
+            own = self._own[key] = tuple(found)
+        return own
+
+    def field_type(self, qualified: str, name: str) -> Optional[Tuple[str, int]]:
+        """(type as written, declaring file id) of a field of a project type or its superclasses"""
+        seen = set()
+        while qualified is not None and qualified not in seen:
+            seen.add(qualified)
+            file_id, index = self._types[qualified]
+            entry = self.symbols[file_id].types[index]
+            declared = entry[4].get(name)
+            if declared is not None:
+                return declared, file_id
+            qualified = self.resolve(entry[2], file_id) if entry[2] else None
+        return None
+
+    def visible_field(self, own: Tuple[str, ...], name: str) -> Optional[Tuple[str, int]]:
+        """(type as written, declaring file id) of the field a simple name means in the own types"""
+        for qualified in own:
+            file_id, index = self._types[qualified]
+            declared = self.symbols[file_id].types[index][4].get(name)
+            if declared is not None:
+                return declared, file_id
+        return None
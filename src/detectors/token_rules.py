@@ -0,0 +1,77 @@
+from itertools import compress, count
+from operator import itemgetter
+from typing import Dict, Iterable, List, Tuple
+
+from .java_lexer import Token
+
+_token_kind = itemgetter(0)
+_token_text = itemgetter(1)
+
+
+class TokenRule:
+    """Tokens a detector wants located: every token of some kinds and some (kind, text) pairs
+
+    Rules are built once per detector; the positions they match are found
+    by a TokenScanner pass shared with the rules of the other detectors.
+    """
+
+    __slots__ = ('name', 'kinds', 'texts')
+
+    def __init__(self, name: str, kinds: Iterable[str] = (), texts: Iterable[Tuple[str, str]] = ()):
+        self.name = name
+        self.kinds = frozenset(kinds)
+        self.texts = frozenset(texts)
+
+    def __repr__(self) -> str:
+        return f"TokenRule({self.name!r})"
+
+
+class TokenScanner:
+    """Finds the matches of several token rules in one pass over a token stream
+
+    The kinds and texts wanted by any rule are merged into two sets, so the
+    pass itself is a set lookup per token done by C-level map/compress; only
+    the (few) candidate tokens it yields are dispatched to their rules.
+    """
+
+    def __init__(self, rules: Iterable[TokenRule]):
+        self.rules: List[TokenRule] = []
+        for rule in rules:
+            if rule not in self.rules:
+                self.rules.append(rule)
+        # kind -> rules matching every token of that kind
+        self._by_kind: Dict[str, List[int]] = {}
+        # text -> (kind, rule) pairs matching tokens with that text
+        self._by_text: Dict[str, List[Tuple[str, int]]] = {}
+        for index, rule in enumerate(self.rules):
+            for kind in rule.kinds:
+                self._by_kind.setdefault(kind, []).append(index)
+            for kind, text in rule.texts:
+                self._by_text.setdefault(text, []).append((kind, index))
+        self._kinds = frozenset(self._by_kind)
+        self._texts = frozenset(self._by_text)
+        # Rules fed by both passes, whose sites need merging into order
+        self._mixed = [index for index, rule in enumerate(self.rules) if rule.kinds and rule.texts]
+
+    def __contains__(self, rule: TokenRule) -> bool:
+        return rule in self.rules
+
+    def scan(self, tokens: List[Token]) -> Dict[TokenRule, List[int]]:
+        """Ascending indices of the tokens matched by each rule"""
+        sites = [[] for _ in self.rules]
+        if self._texts:
+            appends = {text: [(kind, sites[index].append) for kind, index in pairs]
+                       for text, pairs in self._by_text.items()}
+            for i in compress(count(), map(self._texts.__contains__, map(_token_text, tokens))):
+                token = tokens[i]
+                for kind, append in appends[token.text]:
+                    if kind == token.kind:
+                        append(i)
+        if self._kinds:
+            appends = {kind: [sites[index].append for index in indices] for kind, indices in self._by_kind.items()}
+            for i in compress(count(), map(self._kinds.__contains__, map(_token_kind, tokens))):
+                for append in appends[tokens[i].kind]:
+                    append(i)
+        for index in self._mixed:
+            sites[index].sort()
+        return dict(zip(self.rules, sites))
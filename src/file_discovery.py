@@ -0,0 +1,204 @@
+"""
+File discovery
+Finds the source files to analyze under a directory tree
+"""
+
+import os
+import re
+import fnmatch
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+# Build output, dependency and VCS directories that never hold sources worth analyzing
+DEFAULT_EXCLUDE_DIRS = ['.git', '.hg', '.svn', '.idea', '.gradle', 'build', 'target', 'out', 'node_modules']
+# Comments (and blank space) before the first code of a file
+HEADER_COMMENTS = re.compile(rb'\A(?:\xef\xbb\xbf)?(?:\s|//[^\n]*|/\*.*?(?:\*/|\Z))*', re.DOTALL)
+# Markers of generated sources within the header: a @generated tag, or a line
+# like "Code generated by protoc. DO NOT EDIT." (loose phrases such as "do not
+# edit" alone also occur in handwritten files)
+GENERATED_MARKERS = re.compile(rb'@generated\b|(?i:\bgenerated by\b)[^\n]*\bDO NOT EDIT\b')
+
+
+def compile_globs(patterns: Iterable[str]) -> Optional[Pattern]:
+    """Combine glob patterns into one compiled regex; None if there are no patterns"""
+    patterns = [pattern for pattern in patterns if pattern]
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{fnmatch.translate(pattern)})' for pattern in patterns))
+
+
+class FileDiscovery:
+    """Walks directory trees with os.scandir and yields the files to analyze
+
+    File names are matched against precompiled include/exclude globs
+    (patterns containing '/' match the path relative to the walked root).
+    Excluded directories are pruned without being listed, directories and
+    files reached twice through symlinks or hard links are visited once,
+    and generated sources can be skipped by sniffing their header comment.
+    Besides directories, only files whose names match are stat'ed or opened.
+    """
+
+    # Bytes of each file checked for a generated-code marker
+    SNIFF_BYTES = 2048
+
+    def __init__(self, file_extensions: Optional[List[str]] = None,
+                 include_patterns: Optional[List[str]] = None,
+                 exclude_patterns: Optional[List[str]] = None,
+                 exclude_dirs: Optional[List[str]] = None,
+                 skip_generated: bool = True):
+        self.file_extensions = tuple(file_extensions or ['.java'])
+        self._include = compile_globs(include_patterns or [])
+        self._exclude = compile_globs(exclude_patterns or [])
+        # Path-style patterns need the relative path, plain ones just the name
+        self._uses_paths = any('/' in pattern for pattern in (include_patterns or []) + (exclude_patterns or []))
+        exclude_dirs = DEFAULT_EXCLUDE_DIRS if exclude_dirs is None else exclude_dirs
+        self._exclude_dir_names = {name for name in exclude_dirs if not any(c in name for c in '*?[')}
+        self._exclude_dir_globs = compile_globs(name for name in exclude_dirs if name not in self._exclude_dir_names)
+        self.skip_generated = skip_generated
+        # Files left out by iter_files and select because they are generated
+        self.generated_skipped = 0
+
+    @classmethod
+    def from_config(cls, analysis_config: Dict[str, Any]) -> 'FileDiscovery':
+        """Build a discovery from the 'analysis' section of the configuration"""
+        return cls(
+            file_extensions=analysis_config.get('file_extensions', ['.java']),
+            include_patterns=analysis_config.get('include_patterns', []),
+            exclude_patterns=analysis_config.get('exclude_patterns', []),
+            exclude_dirs=analysis_config.get('exclude_dirs'),
+            skip_generated=analysis_config.get('skip_generated', True),
+        )
+
+    def find_files(self, root: str) -> List[str]:
+        """All files to analyze under root (see iter_files)"""
+        return list(self.iter_files(root))
+
+    def iter_files(self, root: str) -> Iterator[str]:
+        """Yield the files to analyze under root, depth first in sorted name order
+
+        Files of a directory come before the contents of its subdirectories.
+        Unreadable directories are skipped.
+        """
+        for path, _ in self.iter_stats(root):
+            if self.skip_generated and self.is_generated(path):
+                self.generated_skipped += 1
+                continue
+            yield path
+
+    def iter_stats(self, root: str) -> Iterator[Tuple[str, os.stat_result]]:
+        """Yield (path, stat) of the files under root whose names match, in iter_files order
+
+        Unlike iter_files no file is opened, so generated sources are
+        included; callers polling a tree use this to find what changed.
+        """
+        seen_dirs: Set[Tuple[int, int]] = set()
+        seen_files: Set[Tuple[int, int]] = set()
+        try:
+            root_identity = self._identity(os.stat(root))
+        except OSError:
+            return
+        if root_identity is not None:
+            seen_dirs.add(root_identity)
+
+        stack = [(root, '')]
+        while stack:
+            directory, relative = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError:
+                continue
+
+            subdirectories = []
+            for entry in entries:
+                name = entry.name
+                try:
+                    if entry.is_dir():
+                        if self.excludes_dir(name):
+                            continue
+                        # Symlinks may lead back into a directory that was already walked
+                        identity = self._identity(entry.stat())
+                        if identity is not None:
+                            if identity in seen_dirs:
+                                continue
+                            seen_dirs.add(identity)
+                        subdirectories.append((entry.path, relative + name + '/'))
+                    elif entry.is_file() and self._matches(name, relative):
+                        stat = entry.stat()
+                        identity = self._identity(stat)
+                        if identity is not None:
+                            if identity in seen_files:
+                                continue
+                            seen_files.add(identity)
+                        yield entry.path, stat
+                except OSError:
+                    # Broken symlink or entry removed while walking
+                    continue
+
+            stack.extend(reversed(subdirectories))
+
+    def select(self, root: str, file_paths: Iterable[str]) -> List[str]:
+        """The files among file_paths that iter_files(root) would yield, spelled as it would
+
+        Applies the same extension, pattern, directory and generated-code
+        filters to a known list of files (e.g. those changed in version
+        control) without walking the tree. Files outside root are dropped.
+        """
+        root_path = os.path.abspath(root)
+        selected = []
+        for file_path in set(os.path.abspath(path) for path in file_paths):
+            relative = os.path.relpath(file_path, root_path)
+            if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+                continue
+            if not self.matches_path(relative):
+                continue
+            if not os.path.isfile(file_path):
+                continue
+            if self.skip_generated and self.is_generated(file_path):
+                self.generated_skipped += 1
+                continue
+            selected.append(os.path.join(root, relative))
+        return sorted(selected, key=lambda path: self.order_key(os.path.relpath(path, root)))
+
+    def matches_path(self, relative: str) -> bool:
+        """True if the name and directories of a path relative to the root pass the filters"""
+        parts = relative.split(os.sep)
+        if any(self.excludes_dir(part) for part in parts[:-1]):
+            return False
+        return self._matches(parts[-1], ''.join(part + '/' for part in parts[:-1]))
+
+    @staticmethod
+    def order_key(relative: str) -> Tuple[Tuple[int, str], ...]:
+        """Sort key putting paths relative to the root in iter_files order"""
+        parts = relative.split(os.sep)
+        return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+    def _matches(self, name: str, relative: str) -> bool:
+        if not name.endswith(self.file_extensions):
+            return False
+        subject = relative + name if self._uses_paths else name
+        if self._include is not None and not self._include.match(subject):
+            return False
+        return self._exclude is None or not self._exclude.match(subject)
+
+    def excludes_dir(self, name: str) -> bool:
+        """True if directories with this name are pruned from the walk"""
+        if name in self._exclude_dir_names:
+            return True
+        return self._exclude_dir_globs is not None and self._exclude_dir_globs.match(name) is not None
+
+    def is_generated(self, file_path: str) -> bool:
+        """True if the comments leading the file carry a generated-code marker (see GENERATED_MARKERS)"""
+        try:
+            with open(file_path, 'rb') as file:
+                head = file.read(self.SNIFF_BYTES)
+        except OSError:
+            return False
+        header = HEADER_COMMENTS.match(head).group()
+        return GENERATED_MARKERS.search(header) is not None
+
+    @staticmethod
+    def _identity(stat: os.stat_result) -> Optional[Tuple[int, int]]:
+        # st_ino is 0 where the platform does not report it (scandir on Windows)
+        if not stat.st_ino:
+            return None
+        return stat.st_dev, stat.st_ino
@@ -0,0 +1,155 @@
+"""
+Git change detection
+Finds the files and line ranges changed in a git work tree
+"""
+
+import os
+import re
+import subprocess
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from detectors.base_detector import CodeSmell
+
+# Hunk header of a --unified=0 diff; only the new side is needed
+HUNK_RE = re.compile(r'@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+class GitError(RuntimeError):
+    """A git command failed, e.g. outside a work tree or for an unknown revision"""
+
+
+def run_git(directory: str, *arguments: str) -> str:
+    """Output of a git command run in directory; raises GitError on failure"""
+    try:
+        result = subprocess.run(['git', '-C', directory, *arguments], capture_output=True,
+                                text=True, encoding='utf-8', errors='surrogateescape')
+    except OSError as e:
+        raise GitError(f"cannot run git: {e}") from e
+    if result.returncode != 0:
+        raise GitError(result.stderr.strip() or f"git {arguments[0]} failed")
+    return result.stdout
+
+
+class ChangeSet:
+    """Files changed in a git work tree, with the lines changed in each
+
+    Built from a single `git diff --unified=0` and a listing of untracked
+    files, so listing the changes costs time in the size of the diff rather
+    than of the repository. Deleted files are left out. Line ranges refer to
+    the new version of each file; a hunk that only deletes lines marks the
+    lines on both sides of the deletion.
+    """
+
+    def __init__(self, ranges: Dict[str, List[Tuple[int, int]]]):
+        # Absolute path -> sorted, disjoint (first line, last line) ranges
+        self.ranges = ranges
+        self._starts = {path: [first for first, _ in spans] for path, spans in ranges.items()}
+
+    @classmethod
+    def from_git(cls, directory: str, since: Optional[str] = None, staged: bool = False) -> 'ChangeSet':
+        """Changes of the work tree containing directory
+
+        With since, the work tree (uncommitted edits included) is compared with
+        the merge base of that revision and HEAD, i.e. what a pull request
+        based on since changes; untracked .java files that are not ignored
+        count as added in full. With staged, the index is compared with HEAD.
+        """
+        top_level = run_git(directory, 'rev-parse', '--show-toplevel').strip()
+        arguments = ['-c', 'core.quotepath=off', 'diff', '--unified=0', '--no-color', '--no-ext-diff',
+                     '--no-prefix', '--find-renames', '--diff-filter=ACMR']
+        if staged:
+            arguments.append('--cached')
+            return cls.parse(run_git(directory, *arguments), top_level)
+        arguments.append(run_git(directory, 'merge-base', since or 'HEAD', 'HEAD').strip())
+        ranges = cls.parse(run_git(directory, *arguments), top_level).ranges
+        # git diff leaves out files that were never added
+        untracked = run_git(top_level, 'ls-files', '--others', '--exclude-standard', '-z', '--', '*.java')
+        for name in filter(None, untracked.split('\0')):
+            path = os.path.normpath(os.path.join(top_level, name))
+            ranges[path] = [(1, cls._line_count(path))]
+        return cls(ranges)
+
+    @classmethod
+    def parse(cls, patch: str, top_level: str) -> 'ChangeSet':
+        """Read a --unified=0 --no-prefix patch whose paths are relative to top_level"""
+        ranges: Dict[str, List[Tuple[int, int]]] = {}
+        current = None
+        lines = iter(patch.splitlines())
+        for line in lines:
+            if line.startswith('@@'):
+                match = HUNK_RE.match(line)
+                if match is None:
+                    continue
+                removed = int(match.group(1) or 1)
+                first = int(match.group(2))
+                added = int(match.group(3) or 1)
+                if current is not None:
+                    current.append((first, first + added - 1) if added else (max(first, 1), first + 1))
+                # Skip the hunk body, whose lines may look like headers
+                for _ in range(removed + added):
+                    body = next(lines, None)
+                    while body is not None and body.startswith('\\'):
+                        body = next(lines, None)
+            elif line.startswith('+++ ') or line.startswith('rename to ') or line.startswith('copy to '):
+                path = line.split(' ', 1)[1] if line.startswith('+++ ') else line.split(' ', 2)[2]
+                if path == '/dev/null':
+                    current = None
+                    continue
+                path = os.path.normpath(os.path.join(top_level, cls._unquote(path)))
+                current = ranges.setdefault(path, [])
+            elif line.startswith('diff --git '):
+                current = None
+        return cls({path: cls._merge(spans) for path, spans in ranges.items()})
+
+    @staticmethod
+    def _unquote(path: str) -> str:
+        # Names with spaces get a trailing tab in ---/+++ lines; names with
+        # control characters, '"' or '\' are quoted C-style
+        path = path[:-1] if path.endswith('\t') else path
+        if len(path) < 2 or path[0] != '"' or path[-1] != '"':
+            return path
+        raw = path[1:-1].encode('utf-8', 'surrogateescape').decode('unicode_escape')
+        return raw.encode('latin-1').decode('utf-8', 'surrogateescape')
+
+    @staticmethod
+    def _line_count(path: str) -> int:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return 1
+        return max(1, data.count(b'\n') + (not data.endswith(b'\n')))
+
+    @staticmethod
+    def _merge(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        merged: List[Tuple[int, int]] = []
+        for first, last in sorted(spans):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else:
+                merged.append((first, last))
+        return merged
+
+    def files(self) -> List[str]:
+        """Absolute paths of the changed files, sorted"""
+        return sorted(self.ranges)
+
+    def __contains__(self, file_path: str) -> bool:
+        return os.path.abspath(file_path) in self.ranges
+
+    def touches(self, file_path: str, start_line: int, end_line: int) -> bool:
+        """True if any changed line of a file lies within start_line..end_line"""
+        path = os.path.abspath(file_path)
+        starts = self._starts.get(path)
+        if not starts:
+            return False
+        # Ranges are disjoint, so only the last one starting by end_line can reach start_line
+        index = bisect_right(starts, end_line) - 1
+        return index >= 0 and self.ranges[path][index][1] >= start_line
+
+    def filter_smells(self, smells: Iterable[CodeSmell]) -> Iterator[CodeSmell]:
+        """Yield the smells whose lines intersect a changed hunk"""
+        for smell in smells:
+            if self.touches(smell.file_path, smell.start_line, smell.end_line):
+                yield smell
@@ -0,0 +1,247 @@
+"""
+GUI views
+Tk list widgets that keep their rows in Python and render only the visible ones
+"""
+
+import tkinter as tk
+from abc import ABC, abstractmethod
+from tkinter import ttk
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+
+class VirtualView(ttk.Frame, ABC):
+    """Base of the virtualized views: a fixed window of height rows over len(self) rows
+
+    Subclasses hold the rows and implement __len__ and _fill(start, end),
+    which puts rows start..end-1 into the widget. Scrolling only moves the
+    window and refills it, so the cost of a view does not grow with its rows.
+    """
+
+    def __init__(self, parent, height: int):
+        super().__init__(parent)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        self.height = height
+        self.offset = 0
+        # Called after every redraw, e.g. to show which rows are visible
+        self.on_render: Optional[Callable[[], None]] = None
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of rows the view holds"""
+        pass
+
+    @abstractmethod
+    def _fill(self, start: int, end: int):
+        """Put rows start..end-1 into the widget"""
+        pass
+
+    def _bind_scrolling(self, widget):
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            widget.bind(sequence, self._on_wheel)
+        widget.bind('<Prior>', lambda event: self.scroll(-self.height))
+        widget.bind('<Next>', lambda event: self.scroll(self.height))
+
+    def scroll(self, rows: int):
+        self.scroll_to(self.offset + rows)
+        return 'break'
+
+    def scroll_to(self, position: int):
+        """Make the position-th row the first visible one (clamped)"""
+        offset = max(0, min(position, len(self) - self.height))
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+
+    def _render(self):
+        self.offset = max(0, min(self.offset, len(self) - self.height))
+        self._fill(self.offset, min(len(self), self.offset + self.height))
+        self._update_scrollbar()
+        if self.on_render is not None:
+            self.on_render()
+
+    def _update_scrollbar(self):
+        count = len(self)
+        if count <= self.height:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / count, min(1.0, (self.offset + self.height) / count))
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(round(float(amount) * len(self)))
+        elif action == 'scroll':
+            self.scroll(int(amount) * (self.height if unit == 'pages' else 1))
+
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            return self.scroll(-3)
+        return self.scroll(3)
+
+
+class VirtualList(VirtualView):
+    """Scrollable, filterable list of strings that renders one screenful at a time
+
+    A plain Listbox creates a Tk item per row and slows down badly past tens
+    of thousands of rows. Here the Listbox only ever holds the visible rows,
+    refilled from the Python list whenever the view scrolls, so appending
+    and filtering cost time in the rows touched rather than in Tk calls.
+    """
+
+    def __init__(self, parent, height: int = 8, **listbox_options):
+        super().__init__(parent, height)
+        self.rows: List[str] = []
+        # Indices of the rows matching the filter; None while no filter is set
+        self.matches: Optional[List[int]] = None
+        self.filter_text = ''
+        self.listbox = tk.Listbox(self, height=height, activestyle='none', exportselection=False,
+                                  **listbox_options)
+        self.listbox.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self._bind_scrolling(self.listbox)
+
+    def __len__(self) -> int:
+        """Number of rows shown, i.e. matching the filter"""
+        return len(self.rows) if self.matches is None else len(self.matches)
+
+    def set_rows(self, rows: Iterable[str]):
+        self.rows = list(rows)
+        self.offset = 0
+        self._refilter()
+
+    def append(self, rows: Iterable[str]):
+        """Add rows at the end; the view is only redrawn if they become visible"""
+        start = len(self.rows)
+        shown_before = len(self)
+        self.rows.extend(rows)
+        if self.matches is not None:
+            needle = self.filter_text
+            self.matches.extend(i for i in range(start, len(self.rows)) if needle in self.rows[i].lower())
+        if shown_before < self.offset + self.height:
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def clear(self):
+        self.set_rows([])
+
+    def set_filter(self, text: str):
+        """Show only the rows containing text (case-insensitive); '' shows all"""
+        self.filter_text = text.lower()
+        self.offset = 0
+        self._refilter()
+
+    def row_index(self, position: int) -> int:
+        """Index into rows of the position-th shown row"""
+        return position if self.matches is None else self.matches[position]
+
+    def selected(self) -> List[int]:
+        """Indices into rows of the selected visible rows"""
+        return [self.row_index(self.offset + i) for i in self.listbox.curselection()]
+
+    def _refilter(self):
+        if self.filter_text:
+            needle = self.filter_text
+            self.matches = [i for i, row in enumerate(self.rows) if needle in row.lower()]
+        else:
+            self.matches = None
+        self._render()
+
+    def _fill(self, start: int, end: int):
+        self.listbox.delete(0, tk.END)
+        if end > start:
+            if self.matches is None:
+                self.listbox.insert(tk.END, *self.rows[start:end])
+            else:
+                self.listbox.insert(tk.END, *(self.rows[i] for i in self.matches[start:end]))
+
+
+class VirtualTable(VirtualView):
+    """Table over a sequence of row keys whose cells are computed only for visible rows
+
+    row_values(key) returns the cell texts of one row; the table itself
+    stores nothing but the key sequence. Clicking a sortable heading calls
+    on_sort(column id), and double-click or Enter calls on_activate(key).
+    """
+
+    def __init__(self, parent, columns: Sequence[Tuple[str, str, int]],
+                 row_values: Callable[[int], Sequence[str]], height: int = 20,
+                 on_sort: Optional[Callable[[str], None]] = None,
+                 on_activate: Optional[Callable[[int], None]] = None,
+                 sortable: Sequence[str] = ()):
+        super().__init__(parent, height)
+        self.keys: Sequence[int] = []
+        self.row_values = row_values
+        self.on_activate = on_activate
+        self.tree = ttk.Treeview(self, columns=[column for column, _, _ in columns], show='headings',
+                                 height=height, selectmode='browse')
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.headings = {column: heading for column, heading, _ in columns}
+        for column, heading, width in columns:
+            command = (lambda column=column: on_sort(column)) if on_sort and column in sortable else ''
+            self.tree.heading(column, text=heading, command=command)
+            self.tree.column(column, width=width, stretch=column == columns[-1][0])
+        self._bind_scrolling(self.tree)
+        self.tree.bind('<Double-1>', self._on_activate)
+        self.tree.bind('<Return>', self._on_activate)
+        self.tree.bind('<Up>', lambda event: self._step(-1))
+        self.tree.bind('<Down>', lambda event: self._step(1))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def set_keys(self, keys: Sequence[int], keep_position: bool = False):
+        """Show these rows; the view returns to the top unless keep_position"""
+        self.keys = keys
+        if not keep_position:
+            self.offset = 0
+        self._render()
+
+    def refresh(self):
+        """Redraw after keys were appended to the shown sequence in place"""
+        if len(self.tree.get_children()) < self.height:
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def mark_sorted(self, column: Optional[str], descending: bool):
+        """Show the sort direction in the headings"""
+        for column_id, heading in self.headings.items():
+            arrow = (' ▼' if descending else ' ▲') if column_id == column else ''
+            self.tree.heading(column_id, text=heading + arrow)
+
+    def selected_key(self) -> Optional[int]:
+        selection = self.tree.selection()
+        return int(selection[0]) if selection else None
+
+    def _fill(self, start: int, end: int):
+        selected = self.selected_key()
+        self.tree.delete(*self.tree.get_children())
+        for position in range(start, end):
+            key = self.keys[position]
+            self.tree.insert('', tk.END, iid=str(key), values=self.row_values(key))
+        if selected is not None and self.tree.exists(str(selected)):
+            self.tree.selection_set(str(selected))
+
+    def _step(self, delta: int):
+        """Arrow keys: move within the window, scrolling it at the edges"""
+        items = self.tree.get_children()
+        if not items:
+            return 'break'
+        focus = self.tree.focus()
+        target = (items.index(focus) if focus in items else -1) + delta
+        if 0 <= target < len(items):
+            item = items[target]
+        else:
+            self.scroll(delta)
+            items = self.tree.get_children()
+            item = items[0] if delta < 0 else items[-1]
+        self.tree.selection_set(item)
+        self.tree.focus(item)
+        return 'break'
+
+    def _on_activate(self, event):
+        key = self.selected_key()
+        if key is not None and self.on_activate is not None:
+            self.on_activate(key)
@@ -0,0 +1,156 @@
+"""
+Metrics store
+Per-method and per-class size metrics of a project in compact columns
+"""
+
+import csv
+import math
+from array import array
+from typing import Dict, Iterable, List, Sequence, TextIO, Tuple
+
+from detectors.source_model import SourceModel
+from smell_table import CodeBook
+
+try:
+    import numpy
+except ImportError:  # optional: faster percentiles and .npz export
+    numpy = None
+
+# Key of the metrics among the measurements the engine keeps per file
+METRICS = '(metrics)'
+# Numeric columns per table, after file, name, start_line and end_line
+COLUMNS = {
+    'methods': ('line_count', 'parameter_count'),
+    'classes': ('method_count', 'line_count'),
+}
+
+
+def file_metrics(model: SourceModel) -> Tuple[List[tuple], List[tuple]]:
+    """(method rows, class rows) of a file: (name, start line, end line, *COLUMNS values)"""
+    methods = [(method.name, method.start_line, method.end_line, method.line_count, method.parameter_count)
+               for method in model.methods]
+    classes = [(cls.name, cls.start_line, cls.end_line, cls.method_count, cls.line_count)
+               for cls in model.classes]
+    return methods, classes
+
+
+class MetricsTable:
+    """One row per method or class, stored column-wise like SmellTable"""
+
+    def __init__(self, files: CodeBook, names: CodeBook, columns: Sequence[str]):
+        self.files = files
+        self.names = names
+        self.file_codes = array('I')
+        self.name_codes = array('I')
+        self.start_lines = array('i')
+        self.end_lines = array('i')
+        self.columns: Dict[str, array] = {column: array('i') for column in columns}
+
+    def __len__(self) -> int:
+        return len(self.file_codes)
+
+    def extend(self, file_path: str, rows: Iterable[tuple]):
+        file_code = self.files.code(file_path)
+        name_code = self.names.code
+        values = list(self.columns.values())
+        for name, start_line, end_line, *numbers in rows:
+            self.file_codes.append(file_code)
+            self.name_codes.append(name_code(name))
+            self.start_lines.append(start_line)
+            self.end_lines.append(end_line)
+            for column, number in zip(values, numbers):
+                column.append(number)
+
+    def column(self, name: str):
+        """A numeric column: a NumPy view of the array when NumPy is available"""
+        values = self.columns[name]
+        if numpy is not None:
+            return numpy.frombuffer(values, dtype=numpy.int32) if values else numpy.zeros(0, numpy.int32)
+        return values
+
+
+class MetricsStore:
+    """Method and class metrics of every measured file
+
+    Rows are appended file by file (see file_metrics) into integer arrays,
+    with file paths and names as codes, so millions of methods take a few
+    dozen bytes each. Percentiles are computed over whole columns, with
+    NumPy when it is installed and by sorting otherwise; both give NumPy's
+    default (linear) interpolation.
+    """
+
+    def __init__(self):
+        self.files = CodeBook()
+        self.names = CodeBook()
+        self.tables = {table: MetricsTable(self.files, self.names, columns) for table, columns in COLUMNS.items()}
+
+    @property
+    def methods(self) -> MetricsTable:
+        return self.tables['methods']
+
+    @property
+    def classes(self) -> MetricsTable:
+        return self.tables['classes']
+
+    def add(self, file_path: str, metrics: Tuple[List[tuple], List[tuple]]):
+        methods, classes = metrics
+        self.methods.extend(file_path, methods)
+        self.classes.extend(file_path, classes)
+
+    def percentile(self, table: str, column: str, percent: float) -> float:
+        """percent-th percentile of a column; infinite (nothing exceeds it) for an empty column"""
+        values = self.tables[table].column(column)
+        if not len(values):
+            return math.inf
+        if numpy is not None:
+            return float(numpy.percentile(values, percent))
+        ordered = sorted(values)
+        position = (len(ordered) - 1) * (percent / 100)
+        low = math.floor(position)
+        high = min(low + 1, len(ordered) - 1)
+        weight = position - low
+        difference = ordered[high] - ordered[low]
+        # Same arithmetic as NumPy's linear interpolation
+        if weight >= 0.5:
+            return float(ordered[high] - difference * (1 - weight))
+        return float(ordered[low] + difference * weight)
+
+    def write_csv(self, stream: TextIO):
+        """Both tables as one CSV, a 'kind' column telling method and class rows apart"""
+        numbers = sorted({column for columns in COLUMNS.values() for column in columns})
+        writer = csv.writer(stream)
+        writer.writerow(['kind', 'file', 'name', 'start_line', 'end_line'] + numbers)
+        for kind, table in (('method', self.methods), ('class', self.classes)):
+            files, names = self.files.values, self.names.values
+            columns = [table.columns.get(column) for column in numbers]
+            for row in range(len(table)):
+                writer.writerow([kind, files[table.file_codes[row]], names[table.name_codes[row]],
+                                 table.start_lines[row], table.end_lines[row]]
+                                + ['' if column is None else column[row] for column in columns])
+
+    def save_npz(self, path: str):
+        """Both tables as NumPy arrays, e.g. 'methods_line_count' and 'methods_file'
+
+        File and name columns are indices into the 'files' and 'names' arrays.
+        Raises RuntimeError when NumPy is not installed.
+        """
+        if numpy is None:
+            raise RuntimeError("writing .npz files requires NumPy")
+        arrays = {'files': numpy.array(self.files.values, dtype=str),
+                  'names': numpy.array(self.names.values, dtype=str)}
+        for name, table in self.tables.items():
+            arrays[f'{name}_file'] = numpy.array(table.file_codes, dtype=numpy.uint32)
+            arrays[f'{name}_name'] = numpy.array(table.name_codes, dtype=numpy.uint32)
+            arrays[f'{name}_start_line'] = numpy.array(table.start_lines, dtype=numpy.int32)
+            arrays[f'{name}_end_line'] = numpy.array(table.end_lines, dtype=numpy.int32)
+            for column, values in table.columns.items():
+                arrays[f'{name}_{column}'] = numpy.array(values, dtype=numpy.int32)
+        numpy.savez_compressed(path, **arrays)
+
+    def save(self, path: str):
+        """Write to path: NumPy .npz if it ends in .npz, CSV otherwise"""
+        if path.endswith('.npz'):
+            self.save_npz(path)
+        else:
+            with open(path, 'w', newline='') as stream:
+                self.write_csv(stream)
@@ -0,0 +1,142 @@
+"""
+Analysis profiler
+Per-detector and per-file timing, summary tables and Chrome trace output
+"""
+
+import os
+import json
+import heapq
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# (name, file_path, start_ns, duration_ns, bytes, findings, pid)
+Span = Tuple[str, Optional[str], int, int, int, int, int]
+
+
+class Profiler:
+    """Collects wall time, calls, bytes and findings per detector and per file
+
+    The engine only calls into a profiler when one is attached, so a run
+    without --profile pays nothing beyond a None check per file. Totals
+    are aggregated as they arrive; individual spans are only kept when a
+    trace is requested. Profilers in pool workers run with forward=True
+    and hand their spans to the parent profiler through drain()/merge().
+    """
+
+    # Number of slowest files listed in the summary
+    TOP_FILES = 10
+
+    def __init__(self, trace: bool = False, forward: bool = False):
+        self.trace = trace
+        self.forward = forward
+        self.detector_totals: Dict[str, List[int]] = {}  # name -> [calls, ns, bytes, findings]
+        self.file_count = 0
+        self.total_ns = 0
+        self._slowest_files: List[Tuple[int, str, int, int]] = []  # heap of (ns, path, bytes, findings)
+        self._trace_events: List[Dict[str, Any]] = []
+        self._forwarded: List[Span] = []
+        self._started_ns = time.perf_counter_ns()
+
+    def profile_file(self, file_path: str, content: str,
+                     steps: List[Tuple[str, Callable[[], Any]]]) -> List[Any]:
+        """Run the steps of one file, timing each of them; returns their results
+
+        A step whose result is a list counts its length as findings.
+        """
+        clock = time.perf_counter_ns
+        pid = os.getpid()
+        size = len(content.encode('utf-8'))
+        results = []
+        file_start = clock()
+        for name, step in steps:
+            start = clock()
+            result = step()
+            duration = clock() - start
+            results.append(result)
+            self._record((name, file_path, start, duration, size,
+                          len(result) if isinstance(result, list) else 0, pid))
+        findings = sum(len(result) for result in results if isinstance(result, list))
+        self._record((None, file_path, file_start, clock() - file_start, size, findings, pid))
+        return results
+
+    def profile_step(self, name: str, step: Callable[[], Any]) -> Any:
+        """Time a project-wide step that does not belong to a single file"""
+        start = time.perf_counter_ns()
+        result = step()
+        self._record((name, None, start, time.perf_counter_ns() - start, 0,
+                      len(result) if isinstance(result, list) else 0, os.getpid()))
+        return result
+
+    def drain(self) -> List[Span]:
+        """Spans recorded since the last call (forwarding profilers only)"""
+        spans = self._forwarded
+        self._forwarded = []
+        return spans
+
+    def merge(self, spans: List[Span]):
+        """Add spans recorded by a forwarding profiler in another process"""
+        for span in spans:
+            self._record(span)
+
+    def _record(self, span: Span):
+        if self.forward:
+            self._forwarded.append(span)
+            return
+        name, file_path, start, duration, size, findings, pid = span
+        if name is None:
+            # Whole-file span
+            self.file_count += 1
+            self.total_ns += duration
+            entry = (duration, file_path, size, findings)
+            if len(self._slowest_files) < self.TOP_FILES:
+                heapq.heappush(self._slowest_files, entry)
+            else:
+                heapq.heappushpop(self._slowest_files, entry)
+        else:
+            totals = self.detector_totals.setdefault(name, [0, 0, 0, 0])
+            totals[0] += 1
+            totals[1] += duration
+            totals[2] += size
+            totals[3] += findings
+            if file_path is None:
+                self.total_ns += duration
+        if self.trace:
+            self._trace_events.append({
+                'name': os.path.basename(file_path) if name is None else name,
+                'cat': 'file' if name is None else 'detector',
+                'ph': 'X',
+                'ts': start / 1000,
+                'dur': duration / 1000,
+                'pid': pid,
+                'tid': pid,
+                'args': {'file': file_path, 'bytes': size, 'findings': findings},
+            })
+
+    def summary(self) -> str:
+        """Summary table of the run, slowest detectors first"""
+        report = []
+        report.append("PROFILE")
+        report.append("=" * 78)
+        report.append(f"{'Detector':<28} {'Calls':>7} {'Time (s)':>10} {'Share':>7} {'MB/s':>9} {'Findings':>10}")
+        report.append("-" * 78)
+        total_ns = self.total_ns or 1
+        for name, (calls, ns, size, findings) in sorted(self.detector_totals.items(),
+                                                         key=lambda item: -item[1][1]):
+            throughput = f"{size / 1e6 / (ns / 1e9):9.2f}" if ns and size else f"{'-':>9}"
+            report.append(f"{name:<28} {calls:>7} {ns / 1e9:>10.3f} {ns / total_ns:>7.1%} {throughput} {findings:>10}")
+        report.append("-" * 78)
+        report.append(f"{'Total (' + str(self.file_count) + ' files)':<28} {'':>7} {self.total_ns / 1e9:>10.3f}")
+        # With --jobs the total adds up time spent in all workers
+        report.append(f"{'Wall clock':<28} {'':>7} {(time.perf_counter_ns() - self._started_ns) / 1e9:>10.3f}")
+
+        if self._slowest_files:
+            report.append("")
+            report.append("Slowest files:")
+            for ns, file_path, size, findings in sorted(self._slowest_files, reverse=True):
+                report.append(f"  {ns / 1e9:8.3f}s  {file_path} ({size} bytes, {findings} findings)")
+        return "\n".join(report)
+
+    def write_trace(self, trace_path: str):
+        """Write the recorded spans as Chrome trace-event JSON (chrome://tracing, Perfetto)"""
+        with open(trace_path, 'w') as file:
+            json.dump({'traceEvents': self._trace_events, 'displayTimeUnit': 'ms'}, file)
@@ -0,0 +1,260 @@
+"""
+Incremental result cache
+Keeps per-file analysis results on disk between runs
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from detectors.base_detector import BaseDetector, CodeSmell
+from detectors.source_model import MethodSpan, SourceModel
+
+
+class ResultCache:
+    """On-disk cache of per-file results, keyed by content hash and config key
+
+    A stat manifest (mtime, size -> content hash) lets unchanged files skip
+    both reading/hashing and analysis. Results are stored per content hash
+    and per config key, so editing a threshold or upgrading a detector
+    simply misses the cache instead of returning stale findings. Files that
+    did change can still reuse the results of their unchanged methods (see
+    MethodResults).
+    """
+
+    FORMAT_VERSION = 5
+    DATABASE_NAME = 'results.sqlite'
+    # Pending writes are committed in batches of this size
+    COMMIT_EVERY = 500
+
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self._db = sqlite3.connect(os.path.join(cache_dir, self.DATABASE_NAME))
+        self._db.execute('CREATE TABLE IF NOT EXISTS manifest ('
+                         'path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, content_hash TEXT)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS results ('
+                         'content_hash TEXT, config_key TEXT, data TEXT, '
+                         'PRIMARY KEY (content_hash, config_key))')
+        self._db.execute('CREATE TABLE IF NOT EXISTS method_results ('
+                         'lines_hash TEXT, config_key TEXT, data TEXT, '
+                         'PRIMARY KEY (lines_hash, config_key))')
+        self._manifest: Optional[Dict[str, Tuple[int, int, str]]] = None
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.methods_reused = 0
+
+    @classmethod
+    def make_config_key(cls, detector_settings: List[Tuple[str, int, Dict[str, Any]]]) -> str:
+        """Fingerprint of the active detectors: (name, version, config) each"""
+        payload = json.dumps([cls.FORMAT_VERSION, detector_settings], sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+    def lookup(self, file_path: str, config_key: str, with_fingerprint: bool,
+               with_symbols: bool = False) -> Tuple[Optional[tuple], Optional[str], Optional[str]]:
+        """Return (entry, content_hash, content) for a file
+
+        entry is (packed smells, fingerprint, symbols) on a hit and None otherwise.
+        content is only returned when the file had to be read, so a miss can
+        be analyzed without reading it again; unreadable files give (None, None, None).
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None, None, None
+
+        manifest = self._load_manifest()
+        known = manifest.get(file_path)
+        if known is not None and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            entry = self._get(known[2], config_key, with_fingerprint, with_symbols)
+            if entry is not None:
+                self.hits += 1
+                return entry, known[2], None
+
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                content = file.read()
+        except (OSError, UnicodeDecodeError):
+            return None, None, None
+
+        content_hash = self.hash_content(content)
+        if known is None or known != (stat.st_mtime_ns, stat.st_size, content_hash):
+            manifest[file_path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+            self._write('INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?)',
+                        (file_path, stat.st_mtime_ns, stat.st_size, content_hash))
+
+        entry = self._get(content_hash, config_key, with_fingerprint, with_symbols)
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry, content_hash, content
+
+    def store(self, content_hash: str, config_key: str, packed_smells: List[tuple],
+              fingerprint: Optional[tuple], symbols: Optional[list] = None):
+        """Remember the results of one analyzed file"""
+        data = json.dumps([packed_smells, fingerprint, symbols], separators=(',', ':'))
+        self._write('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', (content_hash, config_key, data))
+
+    def lookup_method(self, lines_hash: str, config_key: str) -> Optional[list]:
+        """Cached results of a method (see MethodResults), or None"""
+        row = self._db.execute('SELECT data FROM method_results WHERE lines_hash = ? AND config_key = ?',
+                               (lines_hash, config_key)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def store_method(self, lines_hash: str, config_key: str, data: list):
+        """Remember the results of one method"""
+        self._write('INSERT OR REPLACE INTO method_results VALUES (?, ?, ?)',
+                    (lines_hash, config_key, json.dumps(data, separators=(',', ':'))))
+
+    def flush(self):
+        """Commit pending writes to disk"""
+        if self._pending:
+            self._db.commit()
+            self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def _load_manifest(self) -> Dict[str, Tuple[int, int, str]]:
+        if self._manifest is None:
+            rows = self._db.execute('SELECT path, mtime_ns, size, content_hash FROM manifest')
+            self._manifest = {path: (mtime_ns, size, content_hash)
+                              for path, mtime_ns, size, content_hash in rows}
+        return self._manifest
+
+    def _get(self, content_hash: str, config_key: str, with_fingerprint: bool,
+             with_symbols: bool) -> Optional[tuple]:
+        row = self._db.execute('SELECT data FROM results WHERE content_hash = ? AND config_key = ?',
+                               (content_hash, config_key)).fetchone()
+        if row is None:
+            return None
+        packed_smells, fingerprint, symbols = json.loads(row[0])
+        if (with_fingerprint and fingerprint is None) or (with_symbols and symbols is None):
+            return None
+        return [tuple(values) for values in packed_smells], fingerprint, symbols
+
+    def _write(self, statement: str, parameters: tuple):
+        self._db.execute(statement, parameters)
+        self._pending += 1
+        if self._pending >= self.COMMIT_EVERY:
+            self.flush()
+
+
+class MethodResults:
+    """Results of the unchanged methods of a file, reused while the rest is analyzed
+
+    A method is identified by a hash of the full lines it spans, so its
+    results stay valid wherever it moves in its file. Handed to a SourceModel
+    as skip_body, lookup() decides per method body: bodies with cached
+    results are never lexed. merge() then puts the cached findings of
+    method-scoped detectors in place, and collect() gathers the results of
+    the methods that were analyzed, to be stored (see ResultCache.store_method).
+    With with_lines, the normalized code lines of each method are cached as
+    well and handed back through code_lines() (the model's skipped_lines),
+    so whole-file analyses like DuplicatedCode still see every line.
+    """
+
+    def __init__(self, lookup: Callable[[str], Optional[list]], with_lines: bool = False):
+        self._lookup = lookup
+        self.with_lines = with_lines
+        self.model: Optional[SourceModel] = None
+        # First token of each skipped method -> [start line, {detector: smell tuples}, calls, code lines]
+        self.reused: Dict[int, list] = {}
+        # First token of each method with a body -> hash of its lines
+        self._hashes: Dict[int, str] = {}
+        # (lines hash, data) of the analyzed methods, once collected
+        self.fresh: List[Tuple[str, list]] = []
+
+    def lookup(self, method: MethodSpan, end_line: int) -> bool:
+        """True if the method's results are cached, so its body need not be lexed"""
+        starts = self.model.line_starts
+        text = self.model.content[starts[method.start_line - 1]:starts[min(end_line, len(starts) - 1)]]
+        lines_hash = self._hashes[method.first_token] = ResultCache.hash_content(text)
+        data = self._lookup(lines_hash)
+        if data is None or (self.with_lines and data[3] is None):
+            return False
+        self.reused[method.first_token] = data
+        return True
+
+    def known_calls(self) -> Dict[int, List[list]]:
+        """FeatureEnvy calls of the skipped methods, by first token"""
+        self.model.methods  # the structure scan decides which methods are skipped
+        return {first_token: data[2] for first_token, data in self.reused.items() if data[2] is not None}
+
+    def code_lines(self, method: MethodSpan) -> List[Tuple[int, str, str]]:
+        """(line, text, shape) of the code lines of a skipped method, at its current position"""
+        start_line = method.start_line
+        return [(start_line + offset, text, shape) for offset, text, shape in self.reused[method.first_token][3]]
+
+    def merge(self, detector_name: str, detector: BaseDetector, smells: List[CodeSmell]) -> List[CodeSmell]:
+        """A method-scoped detector's findings on the model, completed with those of the skipped methods"""
+        skipped = self.model.skipped_methods
+        if not skipped:
+            return smells
+        # Skipped methods share no lines with other methods; their cached
+        # findings replace whatever the partial token stream gave on their lines
+        ends = [method.end_line for method in skipped]
+        merged = []
+        for smell in smells:
+            index = bisect_left(ends, smell.start_line)
+            if index == len(skipped) or skipped[index].start_line > smell.start_line:
+                merged.append(smell)
+        file_path = self.model.file_path
+        for method in skipped:
+            start_line, by_detector = self.reused[method.first_token][:2]
+            offset = method.start_line - start_line
+            for values in by_detector.get(detector_name, ()):
+                smell = CodeSmell.from_tuple(file_path, values)
+                merged.append(detector.moved(smell, offset) if offset else smell)
+        merged.sort(key=lambda smell: smell.start_line)
+        return merged
+
+    def collect(self, smells_by_detector: Dict[str, List[CodeSmell]],
+                calls: Optional[Dict[int, List[list]]]) -> List[Tuple[str, list]]:
+        """(lines hash, data) of every analyzed method whose results can be reused later
+
+        smells_by_detector holds the findings of the method-scoped detectors,
+        calls the FeatureEnvy calls by first token (None without FeatureEnvy).
+        Methods sharing a line with another method are left out, and with
+        with_lines so are methods whose last code line runs past their end.
+        """
+        methods = self.model.methods
+        lines = {name: [smell.start_line for smell in smells] for name, smells in smells_by_detector.items()}
+        if self.with_lines:
+            code_lines = self.model.code_lines
+            shapes = self.model.code_line_shapes
+            line_numbers = [line for line, _ in code_lines]
+        fresh = []
+        for index, method in enumerate(methods):
+            lines_hash = self._hashes.get(method.first_token)
+            if lines_hash is None or method.first_token in self.reused:
+                continue
+            if ((index and methods[index - 1].end_line >= method.start_line)
+                    or (index + 1 < len(methods) and methods[index + 1].start_line <= method.end_line)):
+                continue
+            by_detector = {}
+            for name, smells in smells_by_detector.items():
+                first = bisect_left(lines[name], method.start_line)
+                last = bisect_right(lines[name], method.end_line)
+                by_detector[name] = [smell.to_tuple() for smell in smells[first:last]]
+            method_lines = None
+            if self.with_lines:
+                first = bisect_left(line_numbers, method.start_line)
+                last = bisect_right(line_numbers, method.end_line)
+                if first < last and line_numbers[last - 1] + code_lines[last - 1][1].count('\n') > method.end_line:
+                    continue
+                method_lines = [(code_lines[k][0] - method.start_line, code_lines[k][1], shapes[k])
+                                for k in range(first, last)]
+            method_calls = calls.get(method.first_token) if calls is not None else None
+            fresh.append((lines_hash, [method.start_line, by_detector, method_calls, method_lines]))
+        return fresh
@@ -0,0 +1,152 @@
+"""
+Smell index
+Filters and sorts the findings of a SmellTable fast enough for interactive browsing
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from smell_table import SmellTable
+
+# Sort rank of the known severities; others sort after them by name
+SEVERITY_ORDER = ['High', 'Medium', 'Low']
+SORT_KEYS = ('severity', 'type', 'file', 'line')
+
+
+class SmellIndex:
+    """Postings and sort keys over a SmellTable
+
+    Each type, file and severity code maps to the ascending rows holding it,
+    so a filter starts from the rows of its most selective criterion instead
+    of scanning the table. Sort keys are single integers per row, built
+    once per column and reused until the table grows. Rows appended to the
+    table after the index was built are taken in by update().
+    """
+
+    def __init__(self, table: SmellTable):
+        self.table = table
+        self.by_type: List[array] = []
+        self.by_file: List[array] = []
+        self.by_severity: List[array] = []
+        self.indexed = 0
+        # Sort column -> (rows indexed when built, key per row / rows in key order)
+        self._keys: Dict[str, Tuple[int, List[int]]] = {}
+        self._orders: Dict[str, Tuple[int, List[int]]] = {}
+        self.update()
+
+    def update(self) -> int:
+        """Index the rows added to the table since the last call; returns how many"""
+        table = self.table
+        start, end = self.indexed, len(table)
+        for postings, book, codes in ((self.by_type, table.types, table.type_codes),
+                                      (self.by_file, table.files, table.file_codes),
+                                      (self.by_severity, table.severities, table.severity_codes)):
+            postings.extend(array('I') for _ in range(len(book) - len(postings)))
+            for row in range(start, end):
+                postings[codes[row]].append(row)
+        self.indexed = end
+        return end - start
+
+    def select(self, types: Optional[Iterable[str]] = None, severities: Optional[Iterable[str]] = None,
+               file_text: str = '', lines: Optional[Tuple[int, int]] = None,
+               sort: Optional[str] = None, descending: bool = False) -> Sequence[int]:
+        """Rows matching every given criterion, in table order or sorted by a SORT_KEYS column
+
+        types and severities restrict to those values, file_text to files whose
+        path contains it (case-insensitive) and lines to findings overlapping
+        the (first, last) line range.
+        """
+        table = self.table
+        criteria = []
+        if types is not None:
+            criteria.append(self._criterion(self.by_type, table.types, table.type_codes, set(types)))
+        if severities is not None:
+            criteria.append(self._criterion(self.by_severity, table.severities, table.severity_codes,
+                                            set(severities)))
+        if file_text:
+            needle = file_text.lower()
+            codes = {code for code, path in enumerate(table.files.values) if needle in path.lower()}
+            criteria.append((sum(len(self.by_file[code]) for code in codes), self.by_file, codes,
+                             table.file_codes))
+
+        if criteria:
+            # Start from the rows of the most selective criterion, check the others per row
+            criteria.sort(key=lambda criterion: criterion[0])
+            _, postings, codes, _ = criteria[0]
+            if len(codes) == 1:
+                rows = array('I', postings[next(iter(codes))])
+            else:
+                rows = sorted(row for code in codes for row in postings[code])
+            for _, _, codes, column in criteria[1:]:
+                rows = [row for row in rows if column[row] in codes]
+        else:
+            rows = range(self.indexed)
+        if lines is not None:
+            first, last = lines
+            starts, ends = table.start_lines, table.end_lines
+            rows = [row for row in rows if starts[row] <= last and ends[row] >= first]
+
+        if sort is None:
+            return rows[::-1] if descending else rows
+        keys = self.sort_keys(sort)
+        if len(rows) * 4 < self.indexed:
+            ordered = sorted(rows, key=keys.__getitem__)
+        else:
+            # Most rows selected: walking the cached order beats sorting them
+            selected = bytearray(self.indexed)
+            for row in rows:
+                selected[row] = 1
+            ordered = [row for row in self._order(sort) if selected[row]]
+        if descending:
+            ordered.reverse()
+        return ordered
+
+    @staticmethod
+    def _criterion(postings: List[array], book, column, values: set) -> tuple:
+        codes = {book.code_of(value) for value in values} - {None}
+        return sum(len(postings[code]) for code in codes), postings, codes, column
+
+    def sort_keys(self, column: str) -> List[int]:
+        """Integer sort key of every row for a SORT_KEYS column, ties broken by file and line"""
+        cached = self._keys.get(column)
+        if cached is not None and cached[0] == self.indexed:
+            return cached[1]
+        table = self.table
+        files = self._ranks(table.files.values)
+        line_bits = max(max(table.end_lines, default=0), 1).bit_length()
+        file_bits = max(len(files), 1).bit_length()
+        # file rank and start line packed below the column's own rank
+        keys = [(files[code] << line_bits) | line for code, line in zip(table.file_codes, table.start_lines)]
+        if column == 'line':
+            keys = [(line << file_bits) | files[code] for code, line in zip(table.file_codes, table.start_lines)]
+        elif column == 'type':
+            ranks = self._ranks(table.types.values)
+            shift = file_bits + line_bits
+            keys = [(ranks[code] << shift) | key for code, key in zip(table.type_codes, keys)]
+        elif column == 'severity':
+            ranks = self._ranks(table.severities.values, SEVERITY_ORDER)
+            shift = file_bits + line_bits
+            keys = [(ranks[code] << shift) | key for code, key in zip(table.severity_codes, keys)]
+        elif column != 'file':
+            raise ValueError(f"unknown sort column: {column}")
+        self._keys[column] = (self.indexed, keys)
+        return keys
+
+    def _order(self, column: str) -> List[int]:
+        """Every row sorted by a column (cached alongside its keys)"""
+        cached = self._orders.get(column)
+        if cached is None or cached[0] != self.indexed:
+            keys = self.sort_keys(column)
+            cached = self._orders[column] = (self.indexed, sorted(range(self.indexed), key=keys.__getitem__))
+        return cached[1]
+
+    @staticmethod
+    def _ranks(values: List[str], leading: Sequence[str] = ()) -> List[int]:
+        """Rank of each code when its values are sorted, leading values first in their given order"""
+        position = {value: index for index, value in enumerate(leading)}
+        order = sorted(range(len(values)), key=lambda code: (position.get(values[code], len(leading)),
+                                                              values[code]))
+        ranks = [0] * len(values)
+        for rank, code in enumerate(order):
+            ranks[code] = rank
+        return ranks
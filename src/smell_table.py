@@ -0,0 +1,154 @@
+"""
+Columnar smell storage
+Keeps large numbers of findings in compact arrays instead of one object each
+"""
+
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from detectors.base_detector import CodeSmell
+
+
+class CodeBook:
+    """Bidirectional mapping between distinct values and small integer codes
+    
+    A typed book tells equal values of different types apart (1, 1.0 and
+    True get their own codes), so each value comes back as it was added.
+    """
+
+    def __init__(self, typed: bool = False):
+        self.values: List[Any] = []
+        self._codes: Dict[Any, int] = {}
+        self.typed = typed
+
+    def code(self, value: Any) -> int:
+        key = (type(value), value) if self.typed else value
+        code = self._codes.get(key)
+        if code is None:
+            code = len(self.values)
+            self._codes[key] = code
+            self.values.append(value)
+        return code
+
+    def code_of(self, value: Any) -> Optional[int]:
+        """Code of a known value, or None (without adding the value)"""
+        return self._codes.get((type(value), value) if self.typed else value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class SmellTable:
+    """Findings stored column-wise, one array entry per finding and column
+
+    Type, file, severity, suggestion and description template are stored
+    as integer codes into per-table code books, and description arguments
+    as codes into a shared value book, so a finding costs a few dozen bytes
+    instead of a CodeSmell object and its strings. Descriptions are only
+    formatted when read. Iterating yields CodeSmell objects on demand.
+    """
+
+    def __init__(self, smells: Optional[Iterable[CodeSmell]] = None):
+        self.types = CodeBook()
+        self.files = CodeBook()
+        self.severities = CodeBook()
+        self.suggestions = CodeBook()
+        self.templates = CodeBook()
+        # Description arguments of any type, kept exactly as given
+        self.values = CodeBook(typed=True)
+        self.type_codes = array('H')
+        self.file_codes = array('I')
+        self.severity_codes = array('H')
+        self.suggestion_codes = array('H')
+        self.template_codes = array('I')
+        self.start_lines = array('i')
+        self.end_lines = array('i')
+        # Description arguments of finding i are value codes arg_codes[arg_starts[i]:arg_starts[i + 1]]
+        self.arg_starts = array('I', [0])
+        self.arg_codes = array('I')
+        if smells is not None:
+            self.extend(smells)
+
+    def append(self, smell: CodeSmell):
+        self.type_codes.append(self.types.code(smell.smell_type))
+        self.file_codes.append(self.files.code(smell.file_path))
+        self.severity_codes.append(self.severities.code(smell.severity))
+        self.suggestion_codes.append(self.suggestions.code(smell.suggestion))
+        self.template_codes.append(self.templates.code(smell.template))
+        self.start_lines.append(smell.start_line)
+        self.end_lines.append(smell.end_line)
+        value_code = self.values.code
+        self.arg_codes.extend(value_code(value) for value in smell.description_args)
+        self.arg_starts.append(len(self.arg_codes))
+
+    def extend(self, smells: Iterable[CodeSmell]):
+        for smell in smells:
+            self.append(smell)
+
+    def __len__(self) -> int:
+        return len(self.type_codes)
+
+    def __iter__(self) -> Iterator[CodeSmell]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i: int) -> CodeSmell:
+        if i < 0:
+            i += len(self)
+        return CodeSmell(self.types.values[self.type_codes[i]], self.files.values[self.file_codes[i]],
+                         self.start_lines[i], self.end_lines[i], self.templates.values[self.template_codes[i]],
+                         self.severities.values[self.severity_codes[i]],
+                         self.suggestions.values[self.suggestion_codes[i]], self.description_args(i))
+
+    def smell_type(self, i: int) -> str:
+        return self.types.values[self.type_codes[i]]
+
+    def file_path(self, i: int) -> str:
+        return self.files.values[self.file_codes[i]]
+
+    def severity(self, i: int) -> str:
+        return self.severities.values[self.severity_codes[i]]
+
+    def suggestion(self, i: int) -> str:
+        return self.suggestions.values[self.suggestion_codes[i]]
+
+    def description_args(self, i: int) -> tuple:
+        values = self.values.values
+        return tuple(values[code] for code in self.arg_codes[self.arg_starts[i]:self.arg_starts[i + 1]])
+
+    def description(self, i: int) -> str:
+        template = self.templates.values[self.template_codes[i]]
+        if self.arg_starts[i] == self.arg_starts[i + 1]:
+            return template
+        return template.format(*self.description_args(i))
+
+    def to_dict(self, i: int) -> Dict[str, Any]:
+        """Same as CodeSmell.to_dict for finding i, without building the CodeSmell"""
+        return {
+            "type": self.smell_type(i),
+            "file": self.file_path(i),
+            "start_line": self.start_lines[i],
+            "end_line": self.end_lines[i],
+            "description": self.description(i),
+            "severity": self.severity(i),
+            "suggestion": self.suggestion(i),
+        }
+
+    def count_by(self, column: str) -> Dict[str, int]:
+        """Number of findings per value of 'type', 'file' or 'severity', without touching rows"""
+        book, codes = {
+            'type': (self.types, self.type_codes),
+            'file': (self.files, self.file_codes),
+            'severity': (self.severities, self.severity_codes),
+        }[column]
+        counts = [0] * len(book)
+        for code in codes:
+            counts[code] += 1
+        return {book.values[code]: count for code, count in enumerate(counts) if count}
+
+    def rows_by_type(self) -> Dict[str, array]:
+        """Finding indices grouped by smell type, types in order of first appearance"""
+        groups = [array('I') for _ in range(len(self.types))]
+        for i, code in enumerate(self.type_codes):
+            groups[code].append(i)
+        return {self.types.values[code]: rows for code, rows in enumerate(groups)}
@@ -0,0 +1,370 @@
+"""
+Watch mode
+Keeps analysis results in memory and refreshes them as files change
+"""
+
+import ctypes
+import os
+import select
+import struct
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Set, TextIO, Tuple
+
+from detector_engine import CodeSmellDetector
+from file_discovery import FileDiscovery
+from smell_table import SmellTable
+
+# inotify event bits, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+# struct inotify_event without its variable-length name
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class PollingWatcher:
+    """Finds changes by walking the tree again every interval seconds
+
+    Works on every platform and file system; wait() returns None, telling
+    the session to compare fresh stat results with the previous ones.
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+
+    def watch(self, root: str, discovery: FileDiscovery):
+        pass
+
+    def wait(self) -> Optional[Set[str]]:
+        """Sleep one interval; None means 'walk the tree again'"""
+        time.sleep(self.interval)
+        return None
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Change notifications from Linux inotify, called through libc with ctypes
+
+    Each directory of the tree gets a watch, so an idle tree costs nothing
+    and a change is seen without walking it. wait() returns the paths named
+    by the events that arrived, an empty set after interval seconds without
+    any, or None when the kernel queue overflowed and events were lost.
+    """
+
+    # Editors save in several steps (write, rename, chmod); let a burst settle
+    SETTLE_SECONDS = 0.05
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        # Watch descriptor -> directory, and back
+        self.directories: Dict[int, str] = {}
+        self._descriptors: Dict[str, int] = {}
+
+    def watch(self, root: str, discovery: FileDiscovery):
+        """Watch root and the directories below it that discovery would walk
+
+        Raises OSError when the per-user watch limit is reached.
+        """
+        seen = set()
+        for directory, subdirectories, _ in os.walk(root, followlinks=True):
+            real = os.path.realpath(directory)
+            if real in seen:
+                subdirectories[:] = []
+                continue
+            seen.add(real)
+            subdirectories[:] = sorted(name for name in subdirectories if not discovery.excludes_dir(name))
+            if directory in self._descriptors:
+                continue
+            descriptor = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if descriptor < 0:
+                error = ctypes.get_errno()
+                if error == 28:  # ENOSPC: fs.inotify.max_user_watches exhausted
+                    raise OSError(error, "inotify watch limit reached")
+                continue
+            self.directories[descriptor] = directory
+            self._descriptors[directory] = descriptor
+
+    def wait(self) -> Optional[Set[str]]:
+        """Paths named by the next burst of events (see class docstring)"""
+        if not select.select([self.fd], [], [], self.interval)[0]:
+            return set()
+        paths: Set[str] = set()
+        overflow = False
+        while True:
+            while True:
+                try:
+                    data = os.read(self.fd, 65536)
+                except BlockingIOError:
+                    break
+                overflow |= self._parse(data, paths)
+            if not select.select([self.fd], [], [], self.SETTLE_SECONDS)[0]:
+                break
+        return None if overflow else paths
+
+    def _parse(self, data: bytes, paths: Set[str]) -> bool:
+        overflow = False
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            directory = self.directories.get(descriptor)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                # The directory is gone (or was unmounted); the kernel dropped its watch
+                del self.directories[descriptor]
+                self._descriptors.pop(directory, None)
+            paths.add(os.path.join(directory, os.fsdecode(name)) if name else directory)
+        return overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(interval: float = 1.0, polling: bool = False):
+    """An InotifyWatcher where the platform offers inotify, else a PollingWatcher"""
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(interval)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(interval)
+
+
+class WatchSession:
+    """Keeps the per-file results of a target in memory and refreshes them as files change
+
+    Every file is analyzed once up front; afterwards only the files that
+    changed are read and analyzed again, and the project-wide steps
+    (FeatureEnvy receivers, cross-file clones) are redone from the kept
+    per-file results. Editing the configuration file rebuilds the engine
+    through build_detector and analyzes everything again, without a restart;
+    when only thresholds changed, the findings are judged again from the
+    measurements kept by the engine, without reading any file.
+    Each update publishes the full report: printed, or atomically replacing
+    the output file.
+    """
+
+    def __init__(self, target: str, build_detector: Callable[[], CodeSmellDetector], watcher,
+                 cross_file: Optional[bool] = None, jobs: int = 1, output: Optional[str] = None,
+                 info: TextIO = sys.stdout):
+        self.target = target
+        self.build_detector = build_detector
+        self.watcher = watcher
+        self.cross_file = cross_file
+        self.jobs = jobs
+        self.output = output
+        self.info = info
+        self.root = target if os.path.isdir(target) else os.path.dirname(target) or '.'
+        self.detector: Optional[CodeSmellDetector] = None
+        self.discovery: Optional[FileDiscovery] = None
+        self._config_stat = None
+        # File path -> (mtime, size) as last seen, and -> iter_file_results item
+        self.stats: Dict[str, Tuple[int, int]] = {}
+        self.results: Dict[str, tuple] = {}
+
+    def run(self):
+        """Analyze the target, then publish a new report after every change until interrupted"""
+        self.reload()
+        try:
+            while True:
+                self.step(self.watcher.wait())
+        finally:
+            self.watcher.close()
+
+    def reload(self, detector: Optional[CodeSmellDetector] = None):
+        """(Re)build the engine from the configuration (unless given) and analyze every file"""
+        started = time.perf_counter()
+        if self.detector is not None:
+            self.detector.enable_cache(None)
+        self.detector = detector or self.build_detector()
+        self.detector.enable_measurements()
+        self.discovery = FileDiscovery.from_config(self.detector.config.get('analysis', {}))
+        self._config_stat = self._stat_config()
+        self.stats.clear()
+        self.results.clear()
+        self._watch_tree()
+        changed, removed = self._scan()
+        self._update(changed, removed, started)
+
+    def step(self, events: Optional[Set[str]]) -> bool:
+        """Apply the outcome of one watcher wait; True if a new report was published"""
+        started = time.perf_counter()
+        if self._stat_config() != self._config_stat:
+            print(f"Configuration changed: {self.detector.config_path}", file=self.info)
+            self._config_stat = self._stat_config()
+            detector = self.build_detector()
+            measurements = self.detector.measurements
+            # Files served from the cache were not measured; they are analyzed again
+            measured = [path for path in self.results if path in measurements]
+            if (detector.active_detectors == self.detector.active_detectors
+                    and self.detector.update_thresholds(detector.config, measured)):
+                detector.enable_cache(None)
+                unmeasured = [path for path in self.results if path not in measurements]
+                rejudged = self.detector.rejudge_results(self.results[path] for path in measured)
+                self.results.update((result[0], result) for result in rejudged)
+                if unmeasured:
+                    print(f"Only thresholds changed: findings judged again, {len(unmeasured)} files "
+                          f"served from the cache analyzed again", file=self.info)
+                    self._update(unmeasured, [], started)
+                else:
+                    print("Only thresholds changed: findings judged again without re-analysis", file=self.info)
+                    self._publish(0, 0, started)
+            else:
+                self.reload(detector)
+            return True
+        if events is not None and not events:
+            return False
+        changes = self._check(events) if events is not None else None
+        if changes is None:
+            # Polling, lost events or a directory added/removed: compare the whole tree
+            self._watch_tree()
+            changes = self._scan()
+        changed, removed = changes
+        if not changed and not removed:
+            return False
+        self._update(changed, removed, started)
+        return True
+
+    def _stat_config(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.detector.config_path)
+        except (OSError, TypeError):
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _watch_tree(self):
+        try:
+            self.watcher.watch(self.root, self.discovery)
+        except OSError as e:
+            print(f"Warning: {e}; falling back to polling", file=self.info)
+            self.watcher.close()
+            self.watcher = PollingWatcher(self.watcher.interval)
+
+    def _scan(self) -> Tuple[List[str], List[str]]:
+        """Walk the target; (changed or added, removed) files since the last walk"""
+        if os.path.isdir(self.target):
+            entries = self.discovery.iter_stats(self.target)
+        else:
+            try:
+                entries = [(self.target, os.stat(self.target))]
+            except OSError:
+                entries = []
+        current = {}
+        changed = []
+        for path, stat in entries:
+            current[path] = (stat.st_mtime_ns, stat.st_size)
+            if self.stats.get(path) != current[path]:
+                changed.append(path)
+        removed = [path for path in self.stats if path not in current]
+        self.stats = current
+        return changed, removed
+
+    def _check(self, paths: Set[str]) -> Optional[Tuple[List[str], List[str]]]:
+        """(changed, removed) files among event paths; None if the tree must be walked again"""
+        changed, removed = [], []
+        for path in paths:
+            path = self._spelled(path)
+            if path is None:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if path in self.stats:
+                    del self.stats[path]
+                    removed.append(path)
+                elif any(known.startswith(path + os.sep) for known in self.stats):
+                    return None
+                continue
+            if os.path.isdir(path):
+                return None
+            # Written per the event even if mtime and size look the same
+            self.stats[path] = (stat.st_mtime_ns, stat.st_size)
+            changed.append(path)
+        return changed, removed
+
+    def _spelled(self, path: str) -> Optional[str]:
+        """An event path spelled as the walk spells it; None if it cannot be analyzed"""
+        if not os.path.isdir(self.target):
+            return self.target if os.path.normpath(path) == os.path.normpath(self.target) else None
+        if path in self.stats:
+            return path
+        if os.path.isdir(path):
+            return None if self.discovery.excludes_dir(os.path.basename(path)) else path
+        relative = os.path.relpath(path, self.target)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            return None
+        if not os.path.exists(path):
+            # Not a known file: only a removed directory holding known files matters
+            return path
+        return path if self.discovery.matches_path(relative) else None
+
+    def _update(self, changed: List[str], removed: List[str], started: float):
+        for path in removed:
+            self.results.pop(path, None)
+            self.detector.measurements.pop(path, None)
+        analyze = []
+        for path in changed:
+            if self.discovery.skip_generated and self.discovery.is_generated(path):
+                self.results.pop(path, None)
+            else:
+                analyze.append(path)
+        for path in analyze:
+            # Unreadable files yield no result; drop what they had
+            self.results.pop(path, None)
+        for result in self.detector.iter_file_results(analyze, self.cross_file, self.jobs):
+            self.results[result[0]] = result
+        self._publish(len(analyze), len(removed), started)
+
+    def _publish(self, analyzed: int, removed: int, started: float):
+        detector = self.detector
+        order = sorted(self.results, key=lambda path: FileDiscovery.order_key(os.path.relpath(path, self.root)))
+        smells = SmellTable(detector.iter_result_smells((self.results[path] for path in order), self.cross_file))
+        elapsed = time.perf_counter() - started
+        print(f"[{time.strftime('%H:%M:%S')}] {analyzed} files analyzed, {removed} removed: "
+              f"{len(smells)} smells in {len(self.results)} files ({elapsed:.2f}s)", file=self.info)
+        jsonl = detector.config.get('output', {}).get('format') == 'jsonl'
+        if self.output is None:
+            if jsonl:
+                detector.write_jsonl_report(smells, sys.stdout)
+            else:
+                print(detector.generate_report(smells))
+            sys.stdout.flush()
+            self.info.flush()
+            return
+        # Readers of the output file never see a half-written report
+        temporary = self.output + '.tmp'
+        try:
+            with open(temporary, 'w') as file:
+                if jsonl:
+                    detector.write_jsonl_report(smells, file)
+                else:
+                    file.write(detector.generate_report(smells))
+            os.replace(temporary, self.output)
+        except OSError as e:
+            print(f"Error writing to file: {e}", file=self.info)
+        self.info.flush()
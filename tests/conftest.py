@@ -0,0 +1,8 @@
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+TEST_FILES_DIR = os.path.join(os.path.dirname(SRC_DIR), 'test-files')
+
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
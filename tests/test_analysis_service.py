@@ -0,0 +1,136 @@
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from analysis_service import AnalysisService, QueueFull, ServiceHandler, create_server
+from detector_engine import CodeSmellDetector
+
+SOURCE = "class A {\n    int f() {\n        return 42 * %d;\n    }\n}\n"
+
+
+@pytest.fixture
+def service():
+    detector = CodeSmellDetector()
+    detector.configure_active_detectors(only=['MagicNumbers'])
+    service = AnalysisService(detector, queue_size=2, cache_entries=2)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def blocked(service):
+    """Holds every analysis until set; counts the analyses started"""
+    release = threading.Event()
+    started = []
+    run = service._run
+
+    def blocked_run(task):
+        started.append(task[0])
+        assert release.wait(5)
+        return run(task)
+
+    service._run = blocked_run
+    yield release, started
+    release.set()
+
+
+def in_background(function, *args):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(function(*args)))
+    thread.start()
+    return thread, results
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 1
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_batch_exceeding_the_queue_is_rejected_whole(service, blocked):
+    release, started = blocked
+    thread, results = in_background(service.analyze, [('A.java', SOURCE % 1)])
+    wait_until(lambda: service.pending == 1)
+
+    with pytest.raises(QueueFull):
+        service.analyze([('B.java', SOURCE % 2), ('C.java', SOURCE % 3)])
+    assert (service.rejected, service.pending) == (1, 1)
+
+    release.set()
+    thread.join(1)
+    assert results[0][0]['path'] == 'A.java' and started == ['A.java']
+
+
+def test_in_flight_content_is_analyzed_once(service, blocked):
+    release, started = blocked
+    first, first_results = in_background(service.analyze, [('A.java', SOURCE % 1)])
+    wait_until(lambda: service.pending == 1)
+    second, second_results = in_background(service.analyze, [('B.java', SOURCE % 1)])
+    wait_until(lambda: service.coalesced == 1)
+
+    release.set()
+    first.join(1)
+    second.join(1)
+    assert started == ['A.java']
+    assert first_results[0][0]['smells'] and second_results[0][0]['path'] == 'B.java'
+    assert [dict(smell, file='B.java') for smell in first_results[0][0]['smells']] == \
+           second_results[0][0]['smells']
+    assert (service.misses, service.coalesced) == (1, 1)
+
+
+def test_least_recently_used_result_is_evicted(service):
+    def cached(n):
+        return service.analyze([('A.java', SOURCE % n)])[0]['cached']
+
+    assert [cached(1), cached(2), cached(1), cached(3)] == [False, False, True, False]
+    # 2 was least recently used when 3 came in; 1 stays
+    assert [cached(1), cached(2)] == [True, False]
+    assert service.metrics()['cache']['entries'] == 2
+
+
+@pytest.fixture
+def server(service):
+    server = create_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01})
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(1)
+
+
+def post(server, body, headers):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=1)
+    connection.putrequest('POST', '/analyze')
+    for name, value in headers.items():
+        connection.putheader(name, value)
+    connection.endheaders(body)
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    connection.close()
+    return response.status, payload
+
+
+def test_analyze_request(server):
+    body = json.dumps({'files': [{'path': 'A.java', 'content': SOURCE % 1}]}).encode()
+    status, payload = post(server, body, {'Content-Length': str(len(body))})
+    assert status == 200 and payload['results'][0]['smells']
+
+
+def test_missing_content_length_is_411(server):
+    assert post(server, None, {})[0] == 411
+
+
+@pytest.mark.parametrize('body, length', [(b'', '-1'), (b'{"files": 3}', '12'), (b'not json', '8')])
+def test_bad_request_is_400(server, body, length):
+    assert post(server, body, {'Content-Length': length})[0] == 400
+
+
+def test_oversized_body_is_413(server, monkeypatch):
+    monkeypatch.setattr(ServiceHandler, 'MAX_BODY_BYTES', 16)
+    body = json.dumps({'files': []}).encode() + b' ' * 16
+    assert post(server, body, {'Content-Length': str(len(body))})[0] == 413
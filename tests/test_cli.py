@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import SRC_DIR, TEST_FILES_DIR
+
+
+def run_cli(*args):
+    return subprocess.run([sys.executable, 'detector_cli.py', TEST_FILES_DIR, *args],
+                          cwd=SRC_DIR, capture_output=True, text=True, timeout=120)
+
+
+def test_json_report_keeps_profile_and_trace_off_stdout(tmp_path):
+    trace = tmp_path / 'trace.json'
+    result = run_cli('--format', 'json', '--profile', '--trace-out', str(trace))
+    assert result.returncode == 0
+    report = json.loads(result.stdout)
+    assert report['total_smells'] == len(report['smells'])
+    assert 'PROFILE' in result.stderr
+    assert f"Trace written to: {trace}" in result.stderr
+
+
+def test_jsonl_stream_keeps_profile_off_stdout():
+    result = run_cli('--format', 'jsonl', '--profile')
+    assert result.returncode == 0
+    assert all(json.loads(line) for line in result.stdout.splitlines())
+    assert 'PROFILE' in result.stderr
+
+
+def test_text_report_prints_profile_on_stdout():
+    result = run_cli('--format', 'summary', '--profile')
+    assert result.returncode == 0
+    assert 'PROFILE' in result.stdout
+
+
+def test_json_report_keeps_metrics_message_off_stdout(tmp_path):
+    metrics = tmp_path / 'metrics.json'
+    result = run_cli('--format', 'json', '--metrics-out', str(metrics))
+    assert result.returncode == 0
+    json.loads(result.stdout)
+    assert f"Metrics written to: {metrics}" in result.stderr
+    assert metrics.exists()
+
+
+def test_json_report_keeps_metrics_error_off_stdout(tmp_path):
+    result = run_cli('--format', 'json', '--metrics-out', str(tmp_path / 'missing' / 'metrics.json'))
+    assert result.returncode == 1
+    json.loads(result.stdout)
+    assert 'Error writing metrics file' in result.stderr
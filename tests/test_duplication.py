@@ -0,0 +1,82 @@
+import glob
+import os
+from difflib import SequenceMatcher
+
+import pytest
+
+from benchmarks.corpus import CorpusSpec, generate_corpus
+from conftest import TEST_FILES_DIR
+from detectors.duplication_detectors import DuplicatedCodeDetector
+from detectors.source_model import SourceModel
+
+MIN_LINES = 3
+THRESHOLD = 0.8
+
+
+def lines_match(line1, line2):
+    return line1 == line2 or SequenceMatcher(None, line1, line2).ratio() >= 0.99
+
+
+def exhaustive_duplicates(lines, line_mapping, min_lines, threshold):
+    """The search _find_duplicates indexes: every later window, nearest first"""
+    duplicates = []
+    processed_blocks = set()
+    covered = [False] * len(lines)
+    n = len(lines)
+    for i in range(n - min_lines + 1):
+        block = tuple(lines[i:i + min_lines])
+        if any(covered[i:i + min_lines]) or block in processed_blocks:
+            continue
+        for j in range(i + min_lines, n - min_lines + 1):
+            if any(covered[j:j + min_lines]):
+                continue
+            similarity = sum(SequenceMatcher(None, a, b).ratio()
+                             for a, b in zip(lines[i:i + min_lines], lines[j:j + min_lines])) / min_lines
+            if similarity < threshold:
+                continue
+            length = min_lines
+            while i + length < j and j + length < n and lines_match(lines[i + length], lines[j + length]):
+                length += 1
+            ti, tj = i, j
+            while length > min_lines and not lines_match(lines[ti], lines[tj]):
+                ti += 1
+                tj += 1
+                length -= 1
+                if ti + length - 1 >= tj:
+                    break
+            if length < min_lines or ti + length - 1 >= tj:
+                continue
+            duplicates.append((line_mapping[ti], line_mapping[ti + length - 1],
+                               line_mapping[tj], line_mapping[tj + length - 1]))
+            covered[ti:ti + length] = [True] * length
+            covered[tj:tj + length] = [True] * length
+            processed_blocks.add(block)
+            break
+    return duplicates
+
+
+def assert_matches_exhaustive(path):
+    with open(path, encoding='utf-8') as f:
+        model = SourceModel(path, f.read())
+    line_mapping = [line for line, _ in model.code_lines]
+    lines = [text for _, text in model.code_lines]
+    detector = DuplicatedCodeDetector({})
+    found = [(d['start_line'], d['end_line'], d['similar_start'], d['similar_end'])
+             for d in detector._find_duplicates(lines, model.code_line_shapes, line_mapping,
+                                                MIN_LINES, THRESHOLD)]
+    assert found == exhaustive_duplicates(lines, line_mapping, MIN_LINES, THRESHOLD)
+
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(TEST_FILES_DIR, '*.java'))),
+                         ids=os.path.basename)
+def test_indexed_search_matches_exhaustive_search_on_test_files(path):
+    assert_matches_exhaustive(path)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_indexed_search_matches_exhaustive_search_on_generated_corpora(seed, tmp_path):
+    spec = CorpusSpec(files=4, lines_per_file=150, methods_per_class=6, nesting=2,
+                      duplication_ratio=0.4, literal_density=0.5, seed=seed)
+    for path in generate_corpus(spec, str(tmp_path)):
+        assert_matches_exhaustive(path)
+
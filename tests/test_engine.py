@@ -0,0 +1,28 @@
+import os
+
+from conftest import TEST_FILES_DIR
+from detector_engine import CodeSmellDetector
+
+
+def test_file_finished_after_restart_keeps_measurements_of_its_own_run():
+    engine = CodeSmellDetector()
+    engine.configure_active_detectors(only=['LongMethod', 'GodClass'])
+    engine.enable_measurements()
+    first_run = engine.measurements
+    path = os.path.join(TEST_FILES_DIR, 'LibrarySystem.java')
+    long_method = engine.detectors['LongMethod']
+    measure = long_method.measure
+
+    def restart_midway(model):
+        # The next run starts while this file is still being analyzed
+        engine.configure_active_detectors(only=['LongMethod'])
+        engine.enable_measurements()
+        return measure(model)
+
+    long_method.measure = restart_midway
+    results = list(engine.iter_file_results([path], jobs=1))
+    del long_method.measure
+
+    assert [result[0] for result in results] == [path]
+    assert set(first_run[path]) >= {'LongMethod', 'GodClass'}
+    assert engine.measurements == {}
@@ -0,0 +1,52 @@
+import os
+import subprocess
+
+from git_changes import ChangeSet
+
+JAVA = "class A {\n    void run() {\n    }\n}\n"
+
+
+def git(directory, *arguments):
+    subprocess.run(['git', '-C', str(directory), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                    *arguments], check=True, capture_output=True)
+
+
+def make_repo(tmp_path):
+    (tmp_path / 'A.java').write_text(JAVA)
+    (tmp_path / '.gitignore').write_text("build/\n")
+    git(tmp_path, 'init', '-q')
+    git(tmp_path, 'add', '.')
+    git(tmp_path, 'commit', '-q', '-m', 'initial')
+    return tmp_path
+
+
+def test_untracked_java_files_count_as_added(tmp_path):
+    repo = make_repo(tmp_path)
+    (repo / 'pkg').mkdir()
+    (repo / 'pkg' / 'New.java').write_text(JAVA + "// tail")
+    (repo / 'notes.txt').write_text("not java\n")
+    (repo / 'build').mkdir()
+    (repo / 'build' / 'Generated.java').write_text(JAVA)
+
+    changes = ChangeSet.from_git(str(repo))
+    new_file = os.path.realpath(repo / 'pkg' / 'New.java')
+    assert [os.path.realpath(path) for path in changes.files()] == [new_file]
+    assert changes.ranges[changes.files()[0]] == [(1, 5)]
+
+
+def test_staged_mode_ignores_untracked_files(tmp_path):
+    repo = make_repo(tmp_path)
+    (repo / 'New.java').write_text(JAVA)
+    assert ChangeSet.from_git(str(repo), staged=True).files() == []
+    git(repo, 'add', 'New.java')
+    assert [os.path.basename(path) for path in ChangeSet.from_git(str(repo), staged=True).files()] == ['New.java']
+
+
+def test_edited_file_reports_changed_lines(tmp_path):
+    repo = make_repo(tmp_path)
+    (repo / 'A.java').write_text(JAVA.replace("    void run() {\n", "    void run(int x) {\n"))
+    changes = ChangeSet.from_git(str(repo))
+    path = changes.files()[0]
+    assert changes.ranges[path] == [(2, 2)]
+    assert changes.touches(path, 1, 3)
+    assert not changes.touches(path, 3, 4)
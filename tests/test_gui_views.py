@@ -0,0 +1,19 @@
+import pytest
+
+gui_views = pytest.importorskip('gui_views')
+
+
+def test_virtual_view_requires_rows_and_fill():
+    assert gui_views.VirtualView.__abstractmethods__ == {'__len__', '_fill'}
+
+    class Incomplete(gui_views.VirtualView):
+        def __len__(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        Incomplete(None, 10)
+
+
+def test_concrete_views_implement_every_abstract_method():
+    assert not gui_views.VirtualList.__abstractmethods__
+    assert not gui_views.VirtualTable.__abstractmethods__
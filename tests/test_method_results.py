@@ -0,0 +1,99 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import TEST_FILES_DIR
+from detector_engine import CodeSmellDetector
+
+# A new method above every existing one, and an edit inside initializeCategoryFines
+ADDED_METHOD = ("    private int limit() {\n"
+                "        return 42 * 7;\n"
+                "    }\n"
+                "\n")
+
+
+def edit_library_system(path):
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    at = lines.index('    public LibrarySystem() {')
+    lines[at:at] = ADDED_METHOD.split('\n')[:-1]
+    content = '\n'.join(lines).replace('"Children", 0.25', '"Children", 0.3')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def new_engine(exclude, cache_dir=None):
+    engine = CodeSmellDetector()
+    engine.configure_active_detectors(exclude=exclude)
+    engine.enable_cache(cache_dir)
+    return engine
+
+
+def smells_of(engine, paths, cross_file=False):
+    return sorted((smell.file_path, smell.to_tuple())
+                  for smell in engine.analyze_files(paths, cross_file=cross_file, jobs=1))
+
+
+@pytest.mark.parametrize('cross_file', [False, True], ids=['single-file', 'cross-file'])
+@pytest.mark.parametrize('exclude', [None, ['DuplicatedCode']], ids=['all', 'no-duplicates'])
+def test_edited_file_with_reused_methods_matches_clean_run(tmp_path, exclude, cross_file):
+    source_dir = tmp_path / 'src'
+    shutil.copytree(TEST_FILES_DIR, str(source_dir))
+    paths = sorted(str(path) for path in source_dir.glob('*.java'))
+    cached = new_engine(exclude, str(tmp_path / 'cache'))
+    smells_of(cached, paths, cross_file)
+
+    edit_library_system(str(source_dir / 'LibrarySystem.java'))
+    reused = smells_of(cached, paths, cross_file)
+
+    assert cached.cache.methods_reused > 0
+    assert reused == smells_of(new_engine(exclude), paths, cross_file)
+
+
+def test_reused_findings_are_moved_with_their_method(tmp_path):
+    path = str(tmp_path / 'Prices.java')
+    method = ("    double discounted(double price) {\n"
+              "        return price * 0.85 - 17;\n"
+              "    }\n")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("class Prices {\n" + method + "}\n")
+    engine = new_engine(['DuplicatedCode'], str(tmp_path / 'cache'))
+    smells_of(engine, [path])
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("class Prices {\n" + ADDED_METHOD + method + "}\n")
+    magic_numbers = engine.detectors['MagicNumbers']
+    offsets = []
+
+    def moved(smell, lines):
+        offsets.append(lines)
+        return type(magic_numbers).moved(magic_numbers, smell, lines)
+
+    magic_numbers.moved = moved
+    reused = smells_of(engine, [path])
+
+    assert engine.cache.methods_reused == 1
+    assert offsets and set(offsets) == {ADDED_METHOD.count('\n')}
+    assert reused == smells_of(new_engine(['DuplicatedCode']), [path])
+
+
+def test_methods_sharing_a_line_are_not_reused(tmp_path):
+    path = str(tmp_path / 'Shared.java')
+    source = ("class Shared {\n"
+              "    void a() { run(42); } void b() { run(43); }\n"
+              "    void c() {\n"
+              "        run(44);\n"
+              "    }\n"
+              "}\n")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    engine = new_engine(['DuplicatedCode'], str(tmp_path / 'cache'))
+    smells_of(engine, [path])
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source + "// edited\n")
+    reused = smells_of(engine, [path])
+
+    assert engine.cache.methods_reused == 1
+    assert reused == smells_of(new_engine(['DuplicatedCode']), [path])
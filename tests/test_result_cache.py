@@ -0,0 +1,128 @@
+import os
+
+import pytest
+
+from detector_engine import CodeSmellDetector
+from result_cache import ResultCache
+
+SOURCE = ("class Prices {\n"
+          "    double discounted(double price) {\n"
+          "        return price * 0.85 - 17;\n"
+          "    }\n"
+          "}\n")
+
+
+@pytest.fixture
+def java_file(tmp_path):
+    path = tmp_path / 'Prices.java'
+    path.write_text(SOURCE)
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    yield cache
+    cache.close()
+
+
+def store_lookup(cache, path, config_key='key'):
+    entry, content_hash, content = cache.lookup(path, config_key, False)
+    cache.store(content_hash, config_key, [('MagicNumbers', 3)], None)
+    return content
+
+
+def touch(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_unchanged_file_is_a_hit_without_reading_it(cache, java_file):
+    store_lookup(cache, java_file)
+    entry, _, content = cache.lookup(java_file, 'key', False)
+    assert entry is not None and content is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_new_mtime_with_same_content_is_a_hit_after_rehashing(cache, java_file):
+    store_lookup(cache, java_file)
+    touch(java_file, os.stat(java_file).st_mtime_ns + 10 ** 9)
+    entry, _, content = cache.lookup(java_file, 'key', False)
+    # The file is read again to check its hash, and the manifest learns the new stat
+    assert entry is not None and content == SOURCE
+    entry, _, content = cache.lookup(java_file, 'key', False)
+    assert entry is not None and content is None
+
+
+def test_content_change_with_same_size_misses(cache, java_file):
+    store_lookup(cache, java_file)
+    stat = os.stat(java_file)
+    with open(java_file, 'w') as f:
+        f.write(SOURCE.replace('0.85', '0.95'))
+    assert os.stat(java_file).st_size == stat.st_size
+    touch(java_file, stat.st_mtime_ns + 10 ** 9)
+    entry, content_hash, content = cache.lookup(java_file, 'key', False)
+    assert entry is None and content == SOURCE.replace('0.85', '0.95')
+    assert content_hash != ResultCache.hash_content(SOURCE)
+
+
+def test_size_change_misses(cache, java_file):
+    store_lookup(cache, java_file)
+    mtime_ns = os.stat(java_file).st_mtime_ns
+    with open(java_file, 'a') as f:
+        f.write('// more\n')
+    touch(java_file, mtime_ns)
+    entry, _, content = cache.lookup(java_file, 'key', False)
+    assert entry is None and content.endswith('// more\n')
+
+
+def test_manifest_persists_across_instances(tmp_path, java_file):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    store_lookup(cache, java_file)
+    cache.close()
+    cache = ResultCache(str(tmp_path / 'cache'))
+    entry, _, content = cache.lookup(java_file, 'key', False)
+    cache.close()
+    assert entry is not None and content is None
+
+
+def config_key(engine):
+    engine.configure_active_detectors()
+    return engine.config_key()
+
+
+def test_threshold_change_misses():
+    engine = CodeSmellDetector()
+    before = config_key(engine)
+    engine.detectors['LongMethod'].config['threshold_lines'] += 1
+    assert config_key(engine) != before
+
+
+def test_detector_version_change_misses(monkeypatch):
+    engine = CodeSmellDetector()
+    before = config_key(engine)
+    monkeypatch.setattr(type(engine.detectors['FeatureEnvy']), 'version', 99)
+    assert config_key(engine) != before
+
+
+def test_format_version_bump_misses(monkeypatch, cache, java_file):
+    settings = [('LongMethod', 1, {'threshold_lines': 30})]
+    key = ResultCache.make_config_key(settings)
+    store_lookup(cache, java_file, key)
+    assert cache.lookup(java_file, key, False)[0] is not None
+    monkeypatch.setattr(ResultCache, 'FORMAT_VERSION', ResultCache.FORMAT_VERSION + 1)
+    bumped = ResultCache.make_config_key(settings)
+    assert bumped != key
+    assert cache.lookup(java_file, bumped, False)[0] is None
+
+
+def test_engine_reanalyzes_after_threshold_change(tmp_path, java_file):
+    engine = CodeSmellDetector()
+    engine.configure_active_detectors()
+    engine.enable_cache(str(tmp_path / 'cache'))
+    engine.analyze_files([java_file], jobs=1)
+    engine.analyze_files([java_file], jobs=1)
+    assert (engine.cache.hits, engine.cache.misses) == (1, 1)
+    engine.detectors['LongMethod'].config['threshold_lines'] = 2
+    engine.analyze_files([java_file], jobs=1)
+    assert engine.cache.misses == 2
+    engine.enable_cache(None)
@@ -0,0 +1,90 @@
+import pytest
+
+from detectors.java_lexer import COMMENT, IDENT, KEYWORD, STRING, find_block_end, tokenize
+from detectors.source_model import SIGNATURES, SourceModel
+
+SOURCE = '''\
+class Orders {
+    private String open = "{ not a block";
+
+    public Map<String, List<Order>>
+            byCustomer(List<Order> orders,
+                       Predicate<Order> keep) {
+        // closing } in a comment
+        String text = "}}";
+        char brace = '}';
+        /* { block comment
+           with } braces */
+        return group(orders, keep);
+    }
+
+    <T extends Comparable<T>> List<T> sorted(Collection<T> items) {
+        return new ArrayList<>(items);
+    }
+
+    void last() {
+        String block = """
+            } text block {
+            """;
+    }
+}
+'''
+
+# Outline only (bodies skimmed by find_block_end) and the full token stream
+ANALYSES = {'outline': [SIGNATURES], 'tokens': None}
+
+
+def methods_of(source, analyses):
+    return [(m.name, m.start_line, m.end_line, m.parameter_count)
+            for m in SourceModel('Orders.java', source, analyses).methods]
+
+
+@pytest.mark.parametrize('analyses', ANALYSES.values(), ids=ANALYSES.keys())
+def test_methods_with_multi_line_signatures_and_generic_types(analyses):
+    assert methods_of(SOURCE, analyses) == [
+        ('byCustomer', 5, 13, 2),
+        ('sorted', 15, 17, 1),
+        ('last', 19, 23, 0),
+    ]
+
+
+@pytest.mark.parametrize('analyses', ANALYSES.values(), ids=ANALYSES.keys())
+def test_class_extent_ignores_braces_in_strings_and_comments(analyses):
+    classes = SourceModel('Orders.java', SOURCE, analyses).classes
+    assert [(c.name, c.start_line, c.end_line, c.method_count) for c in classes] == [('Orders', 1, 24, 3)]
+
+
+def test_tokens_keep_braces_inside_literals_and_comments():
+    tokens = tokenize('a = "}" + \'{\'; // }\n/* { */ b')
+    assert [(t.kind, t.text) for t in tokens if t.kind in (STRING, COMMENT)] == [
+        (STRING, '"}"'), (COMMENT, '// }'), (COMMENT, '/* { */')]
+    assert [t.text for t in tokens if t.text in '{}'] == []
+    assert (tokens[-1].text, tokens[-1].line, tokens[-1].column) == ('b', 2, 8)
+
+
+def test_multi_line_tokens_advance_the_line_count():
+    tokens = tokenize('/* one\ntwo */ x = """\nthree\n"""; y')
+    assert [(t.kind, t.text, t.line) for t in tokens if t.kind in (IDENT, KEYWORD)] == [
+        (IDENT, 'x', 2), (IDENT, 'y', 4)]
+
+
+def test_generic_return_type_tokens():
+    tokens = tokenize('Map<String, List<Integer>>> f')
+    assert [t.text for t in tokens] == ['Map', '<', 'String', ',', 'List', '<', 'Integer', '>>>', 'f']
+
+
+@pytest.mark.parametrize('body, end', [
+    ('}', 0),
+    ('{ { } }}', 7),
+    ('"}" }', 4),
+    ("'}' }", 4),
+    ('// }\n}', 5),
+    ('/* } */ }', 8),
+    ('"""\n}\n""" }', 10),
+    ('{ }', -1),
+    ('/* } never closed', -1),
+])
+def test_find_block_end(body, end):
+    content = 'void f() {' + body
+    expected = end + len('void f() {') if end >= 0 else -1
+    assert find_block_end(content, len('void f() {')) == expected